@@ -0,0 +1,45 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional
+
+from fastapi import HTTPException
+
+
+def encode_cursor(*values: Any) -> str:
+    """把上一页最后一条记录的排序键编码为不透明的分页游标"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """解析分页游标，格式不正确时返回 400"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    return values
+
+
+def decode_id_cursor(cursor: Optional[str]) -> Optional[int]:
+    """解析按 id 分页的游标"""
+    if cursor is None:
+        return None
+    (last_id,) = decode_cursor(cursor, 1)
+    if not isinstance(last_id, int):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    return last_id
+
+
+def decode_time_id_cursor(cursor: Optional[str]):
+    """解析按 (时间, id) 分页的游标"""
+    if cursor is None:
+        return None
+    moment, last_id = decode_cursor(cursor, 2)
+    try:
+        return datetime.fromisoformat(moment), int(last_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.db.crud import environment_crud, environment_variable_crud, spider_environment_crud, spider_crud
 from app.models import Environment, EnvironmentVariable, SpiderEnvironment
-from app.models.database import get_db
+from app.models.database import get_db, get_db_session
+import hashlib
+import json
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -58,6 +61,15 @@ class EnvironmentVariableResponse(EnvironmentVariableBase):
         orm_mode = True
 
 
+class EnvironmentVariableBulkUpsert(BaseModel):
+    variables: List[EnvironmentVariableBase]
+
+
+class EnvironmentVariableBulkResult(BaseModel):
+    created: int
+    updated: int
+
+
 class SpiderEnvironmentCreate(BaseModel):
     spider_id: int
     environment_id: int
@@ -72,20 +84,20 @@ class SpiderEnvironmentResponse(SpiderEnvironmentCreate):
 
 # 环境管理API
 @router.get("/", response_model=List[EnvironmentResponse])
-async def get_environments(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+def get_environments(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
     """获取所有环境，支持分页"""
     return environment_crud.get_multi(db, skip=skip, limit=limit)
 
 
 @router.get("/user/{user_id}", response_model=List[EnvironmentResponse])
-async def get_environments_by_user(user_id: int, db: Session = Depends(get_db)):
+def get_environments_by_user(user_id: int, db: Session = Depends(get_db)):
     """获取特定用户的所有环境"""
     environments = environment_crud.get_by_user(db, user_id)
     return environments
 
 
 @router.get("/{environment_id}", response_model=EnvironmentResponse)
-async def get_environment(environment_id: int, db: Session = Depends(get_db)):
+def get_environment(environment_id: int, db: Session = Depends(get_db)):
     """获取特定环境"""
     environment = environment_crud.get(db, environment_id)
     if not environment:
@@ -94,14 +106,14 @@ async def get_environment(environment_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/", response_model=EnvironmentResponse, status_code=status.HTTP_201_CREATED)
-async def create_environment(environment: EnvironmentCreate, db: Session = Depends(get_db)):
+def create_environment(environment: EnvironmentCreate, db: Session = Depends(get_db)):
     """创建新环境"""
     new_environment = environment_crud.create(db, obj_in=environment.dict())
     return new_environment
 
 
 @router.put("/{environment_id}", response_model=EnvironmentResponse)
-async def update_environment(environment_id: int, environment: EnvironmentUpdate, db: Session = Depends(get_db)):
+def update_environment(environment_id: int, environment: EnvironmentUpdate, db: Session = Depends(get_db)):
     """更新环境"""
     db_environment = environment_crud.get(db, environment_id)
     if not db_environment:
@@ -113,7 +125,7 @@ async def update_environment(environment_id: int, environment: EnvironmentUpdate
 
 
 @router.delete("/{environment_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_environment(environment_id: int, db: Session = Depends(get_db)):
+def delete_environment(environment_id: int, db: Session = Depends(get_db)):
     """删除环境"""
     db_environment = environment_crud.get(db, environment_id)
     if not db_environment:
@@ -126,7 +138,7 @@ async def delete_environment(environment_id: int, db: Session = Depends(get_db))
 
 # 环境变量管理API
 @router.get("/{environment_id}/variables", response_model=List[EnvironmentVariableResponse])
-async def get_environment_variables(environment_id: int, db: Session = Depends(get_db)):
+def get_environment_variables(environment_id: int, db: Session = Depends(get_db)):
     """获取特定环境的所有变量"""
     environment = environment_crud.get(db, environment_id)
     if not environment:
@@ -136,31 +148,134 @@ async def get_environment_variables(environment_id: int, db: Session = Depends(g
     return variables
 
 
+@router.put("/{environment_id}/variables:bulk", response_model=EnvironmentVariableBulkResult)
+def bulk_upsert_environment_variables(environment_id: int, payload: EnvironmentVariableBulkUpsert, db: Session = Depends(get_db)):
+    """按变量名批量创建或更新环境变量，在一个事务中完成"""
+    environment = environment_crud.get(db, environment_id)
+    if not environment:
+        raise HTTPException(status_code=404, detail="环境不存在")
+
+    items = [variable.dict() for variable in payload.variables]
+    return environment_variable_crud.upsert_many(db, environment_id, items)
+
+
+def _export_variables(environment_id: int):
+    # 响应是流式发送的，请求的数据库会话在发送前已关闭，这里使用独立的会话
+    db = get_db_session()
+    try:
+        for variable in environment_variable_crud.iter_by_environment(db, environment_id):
+            row = {
+                "id": variable.id, "environment_id": variable.environment_id,
+                "key": variable.key, "value": variable.value, "is_secret": bool(variable.is_secret),
+            }
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+    finally:
+        db.close()
+
+
+@router.get("/{environment_id}/variables:export")
+def export_environment_variables(environment_id: int, db: Session = Depends(get_db)):
+    """导出环境中的所有变量，每行一个 JSON 对象（NDJSON），流式返回"""
+    environment = environment_crud.get(db, environment_id)
+    if not environment:
+        raise HTTPException(status_code=404, detail="环境不存在")
+
+    return StreamingResponse(
+        _export_variables(environment_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="environment_{environment_id}_variables.ndjson"'},
+    )
+
+
+def _variable_etag(variable: EnvironmentVariable) -> str:
+    digest = hashlib.sha1(f"{variable.id}\0{variable.key}\0{variable.value}\0{bool(variable.is_secret)}".encode("utf-8"))
+    return f'"{digest.hexdigest()}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # 弱比较：忽略 W/ 前缀
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
+def _variable_response(variable: EnvironmentVariable, response: Response, if_none_match: Optional[str]):
+    """返回单个变量并附带 ETag，客户端缓存的版本未变化时返回 304"""
+    etag = _variable_etag(variable)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return variable
+
+
+@router.get("/by-name/{name}/variables/{key}", response_model=EnvironmentVariableResponse)
+def get_environment_variable_by_name(
+    name: str,
+    key: str,
+    response: Response,
+    user_id: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """按环境名称和变量名获取单个变量，支持 If-None-Match 条件请求"""
+    environment = environment_crud.get_by_name(db, name, user_id)
+    if not environment:
+        raise HTTPException(status_code=404, detail="环境不存在")
+
+    variable = environment_variable_crud.get_by_key(db, environment.id, key)
+    if not variable:
+        raise HTTPException(status_code=404, detail="环境变量不存在")
+    return _variable_response(variable, response, if_none_match)
+
+
+@router.get("/{environment_id}/variables/{key}", response_model=EnvironmentVariableResponse)
+def get_environment_variable_by_key(
+    environment_id: int,
+    key: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """按变量名获取单个变量，支持 If-None-Match 条件请求"""
+    variable = environment_variable_crud.get_by_key(db, environment_id, key)
+    if not variable:
+        if not environment_crud.get(db, environment_id):
+            raise HTTPException(status_code=404, detail="环境不存在")
+        raise HTTPException(status_code=404, detail="环境变量不存在")
+    return _variable_response(variable, response, if_none_match)
+
+
 @router.post("/variables", response_model=EnvironmentVariableResponse, status_code=status.HTTP_201_CREATED)
-async def create_environment_variable(variable: EnvironmentVariableCreate, db: Session = Depends(get_db)):
+def create_environment_variable(variable: EnvironmentVariableCreate, db: Session = Depends(get_db)):
     """创建新环境变量"""
     environment = environment_crud.get(db, variable.environment_id)
     if not environment:
         raise HTTPException(status_code=404, detail="环境不存在")
+    if environment_variable_crud.get_by_key(db, variable.environment_id, variable.key):
+        raise HTTPException(status_code=400, detail="环境中已存在同名变量")
     
     new_variable = environment_variable_crud.create(db, obj_in=variable.dict())
     return new_variable
 
 
 @router.put("/variables/{variable_id}", response_model=EnvironmentVariableResponse)
-async def update_environment_variable(variable_id: int, variable: EnvironmentVariableUpdate, db: Session = Depends(get_db)):
+def update_environment_variable(variable_id: int, variable: EnvironmentVariableUpdate, db: Session = Depends(get_db)):
     """更新环境变量"""
     db_variable = environment_variable_crud.get(db, variable_id)
     if not db_variable:
         raise HTTPException(status_code=404, detail="环境变量不存在")
     
     update_data = variable.dict(exclude_unset=True)
+    new_key = update_data.get("key")
+    if new_key and new_key != db_variable.key and environment_variable_crud.get_by_key(db, db_variable.environment_id, new_key):
+        raise HTTPException(status_code=400, detail="环境中已存在同名变量")
     updated_variable = environment_variable_crud.update(db, db_obj=db_variable, obj_in=update_data)
     return updated_variable
 
 
 @router.delete("/variables/{variable_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_environment_variable(variable_id: int, db: Session = Depends(get_db)):
+def delete_environment_variable(variable_id: int, db: Session = Depends(get_db)):
     """删除环境变量"""
     db_variable = environment_variable_crud.get(db, variable_id)
     if not db_variable:
@@ -172,7 +287,7 @@ async def delete_environment_variable(variable_id: int, db: Session = Depends(ge
 
 # 爬虫环境关联API
 @router.get("/spider/{spider_id}", response_model=List[EnvironmentResponse])
-async def get_spider_environments(spider_id: int, db: Session = Depends(get_db)):
+def get_spider_environments(spider_id: int, db: Session = Depends(get_db)):
     """获取特定爬虫关联的所有环境"""
     spider = spider_crud.get(db, spider_id)
     if not spider:
@@ -188,7 +303,7 @@ async def get_spider_environments(spider_id: int, db: Session = Depends(get_db))
 
 
 @router.post("/spider", response_model=SpiderEnvironmentResponse, status_code=status.HTTP_201_CREATED)
-async def link_spider_environment(link: SpiderEnvironmentCreate, db: Session = Depends(get_db)):
+def link_spider_environment(link: SpiderEnvironmentCreate, db: Session = Depends(get_db)):
     """关联爬虫和环境"""
     # 检查爬虫和环境是否存在
     spider = spider_crud.get(db, link.spider_id)
@@ -210,7 +325,7 @@ async def link_spider_environment(link: SpiderEnvironmentCreate, db: Session = D
 
 
 @router.delete("/spider/{spider_id}/environment/{environment_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def unlink_spider_environment(spider_id: int, environment_id: int, db: Session = Depends(get_db)):
+def unlink_spider_environment(spider_id: int, environment_id: int, db: Session = Depends(get_db)):
     """解除爬虫和环境的关联"""
     # 检查爬虫和环境是否存在
     spider = spider_crud.get(db, spider_id)
@@ -1,59 +1,153 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
 from app.models.database import get_db
-from app.models import ExecutionLog
-from app.db.crud import execution_log_crud, spider_crud
-from app.schemas.execution_log import ExecutionLogResponse, ExecutionLogCreate, ExecutionLogUpdate
+from app.db.crud import execution_log_crud, execution_metrics_crud, spider_crud, run_queue_crud, counter_crud
+from app.services.executor import get_executor, update_log
+from app.schemas.execution_log import ExecutionLogResponse, ExecutionLogSummary, ExecutionLogCreate, ExecutionLogUpdate, ExecutionMetricsResponse
+from app.api.pagination import encode_cursor, decode_time_id_cursor
 from pydantic import BaseModel
+from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/api/execution-logs", tags=["execution-logs"])
 
 class logsModel(BaseModel):
-    total: int
-    logs: List[ExecutionLogResponse] 
+    total: Optional[int] = None
+    logs: List[ExecutionLogSummary]
+    next_cursor: Optional[str] = None
+
+# 列表接口可以通过 expand 参数展开的关联对象
+EXPANDABLE_FIELDS = {"spider"}
+
+
+def parse_expand(expand: Optional[str]) -> set:
+    """解析逗号分隔的 expand 参数"""
+    fields = {field.strip() for field in (expand or "").split(",") if field.strip()}
+    unknown = fields - EXPANDABLE_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"不支持展开的字段: {', '.join(sorted(unknown))}")
+    return fields
+
 
 @router.get("/", response_model=logsModel)
-async def get_execution_logs(page: int = 0, limit: int = 10, db: Session = Depends(get_db)) -> Any:
-    """获取执行日志列表，支持分页和倒序排列"""
-    logs = execution_log_crud.get_logs_with_order(db, skip=(page-1)*limit, limit=limit)
-    total = db.query(ExecutionLog).count()
-    return {"total": total, "logs": logs}
-
-@router.get("/count", response_model=Dict[str, int])
-async def get_execution_logs_count(db: Session = Depends(get_db)):
-    """获取执行日志总数"""
-    count = db.query(ExecutionLog).count()
-    return {"total": count}
+def get_execution_logs(
+    page: int = 1,
+    limit: int = Query(10, ge=1),
+    cursor: Optional[str] = None,
+    spider_id: Optional[int] = None,
+    include_total: bool = True,
+    expand: Optional[str] = None,
+    db: Session = Depends(get_db)
+) -> Any:
+    """获取执行日志列表，按开始时间倒序排列，只返回摘要，完整输出通过详情接口获取
+
+    传入上一页返回的 next_cursor 时按游标翻页（忽略 page），翻到再深的位置耗时也不变；
+    include_total 为 false 时不统计总数。expand=spider 时返回每条日志的爬虫信息
+    （整页一次查询），否则 spider 为空。
+    """
+    expand_fields = parse_expand(expand)
+    logs = execution_log_crud.get_page(
+        db, before=decode_time_id_cursor(cursor), skip=(max(page, 1) - 1) * limit, limit=limit + 1,
+        spider_id=spider_id, expand_spider="spider" in expand_fields,
+    )
+    next_cursor = None
+    if len(logs) > limit:
+        logs = logs[:limit]
+        next_cursor = encode_cursor(logs[-1].start_time, logs[-1].id)
+
+    total = None
+    if include_total:
+        key = f"spider_id:{spider_id}" if spider_id is not None else "total"
+        total = counter_crud.get_value(db, "execution_logs", key)
+    return {"total": total, "logs": logs, "next_cursor": next_cursor}
+
+@router.get("/count", response_model=Dict[str, Any])
+def get_execution_logs_count(db: Session = Depends(get_db)):
+    """获取执行日志总数，以及按状态和按爬虫的数量（读取触发器维护的计数）"""
+    return {
+        "total": counter_crud.get_value(db, "execution_logs"),
+        "by_status": counter_crud.get_breakdown(db, "execution_logs", "status"),
+        "by_spider": counter_crud.get_breakdown(db, "execution_logs", "spider_id"),
+    }
+
+@router.get("/metrics/summary", response_model=List[Dict[str, Any]])
+def get_execution_metrics_summary(days: int = 7, db: Session = Depends(get_db)):
+    """按爬虫汇总最近若干天的资源使用情况"""
+    return execution_metrics_crud.summary_by_spider(db, since=datetime.now() - timedelta(days=days))
 
 @router.get("/{log_id}", response_model=ExecutionLogResponse)
-async def get_execution_log(log_id: int, db: Session = Depends(get_db)):
-    """获取执行日志详情"""
-    log = execution_log_crud.get(db, log_id)
+def get_execution_log(log_id: int, db: Session = Depends(get_db)):
+    """获取执行日志详情，包含完整输出"""
+    log = execution_log_crud.get_with_output(db, log_id)
     if not log:
         raise HTTPException(status_code=404, detail="执行日志不存在")
     return log
 
 @router.post("/", response_model=ExecutionLogResponse)
-async def create_execution_log(log: ExecutionLogCreate, db: Session = Depends(get_db)):
+def create_execution_log(log: ExecutionLogCreate, db: Session = Depends(get_db)):
     """创建执行日志"""
     # 检查爬虫是否存在
     spider = spider_crud.get(db, log.spider_id)
     if not spider:
         raise HTTPException(status_code=404, detail="爬虫不存在")
     
-    # 创建执行日志
-    db_log = execution_log_crud.create(db, obj_in=log)
-    return db_log
+    # 创建执行日志，输出追加为压缩的输出块，不写入早期版本的 log_content 列
+    log_data = log.dict()
+    log_content = log_data.pop("log_content", None)
+    db_log = execution_log_crud.create(db, obj_in=log_data)
+    execution_log_crud.append_output(db, db_log.id, log_content=log_content)
+    return execution_log_crud.load_output(db, db_log)
 
 @router.put("/{log_id}", response_model=ExecutionLogResponse)
-async def update_execution_log(log_id: int, log: ExecutionLogUpdate, db: Session = Depends(get_db)):
+def update_execution_log(log_id: int, log: ExecutionLogUpdate, db: Session = Depends(get_db)):
     """更新执行日志"""
     db_log = execution_log_crud.get(db, log_id)
     if not db_log:
         raise HTTPException(status_code=404, detail="执行日志不存在")
     
-    # 更新执行日志
+    # 更新执行日志，输出追加为压缩的输出块，不写入早期版本的 log_content 列
     update_data = log.dict(exclude_unset=True)
-    updated_log = execution_log_crud.update(db, db_obj=db_log, obj_in=update_data)
-    return updated_log
\ No newline at end of file
+    log_content = update_data.pop("log_content", None)
+    status = update_data.get("status")
+    if status and status != "running":
+        # 与执行引擎结束运行时相同：追加最后一段输出，error_message 作为结束时的说明
+        execution_log_crud.append_output(db, log_id, log_content=log_content)
+        execution_log_crud.finish(db, log_id, update_data.pop("status"), message=update_data.pop("error_message", None))
+    else:
+        execution_log_crud.append_output(db, log_id, log_content=log_content, error_message=update_data.pop("error_message", None))
+    if update_data:
+        execution_log_crud.update(db, db_obj=db_log, obj_in=update_data)
+    db.expire(db_log)
+    return execution_log_crud.load_output(db, db_log)
+
+@router.get("/{log_id}/metrics", response_model=ExecutionMetricsResponse)
+def get_execution_log_metrics(log_id: int, db: Session = Depends(get_db)):
+    """获取执行日志对应的资源统计"""
+    metrics = execution_metrics_crud.get_by_log(db, log_id)
+    if not metrics:
+        raise HTTPException(status_code=404, detail="资源统计不存在")
+    return metrics
+
+
+@router.post("/{log_id}/cancel", response_model=Dict[str, Any])
+def cancel_execution_log(log_id: int, db: Session = Depends(get_db)):
+    """取消运行中的爬虫，终止其进程组并把状态标记为 cancelled"""
+    log = execution_log_crud.get(db, log_id)
+    if not log:
+        raise HTTPException(status_code=404, detail="执行日志不存在")
+    if log.status != "running":
+        raise HTTPException(status_code=409, detail=f"执行日志状态为 {log.status}，无法取消")
+
+    # 由本进程的执行引擎负责的运行，直接终止
+    if get_executor().cancel(log_id):
+        return {"id": log_id, "status": "cancelling"}
+
+    # 由工作节点负责的运行，通过运行队列下发取消请求
+    item = run_queue_crud.get_by_log(db, log_id)
+    if item and item.status == "leased":
+        run_queue_crud.request_cancel(db, item.id)
+        return {"id": log_id, "status": "cancelling"}
+
+    # 没有执行者持有的运行（例如服务重启前遗留的记录），直接标记为已取消
+    update_log(db, log_id, "cancelled", error_message="运行已被取消")
+    return {"id": log_id, "status": "cancelled"}
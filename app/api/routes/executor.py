@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import Any, Dict
+from app.core.config import settings
+from app.db.crud import run_queue_crud
+from app.models.database import get_db
+from app.services.executor import get_executor
+from app.services.environment_cache import environment_cache
+
+router = APIRouter(prefix="/api/executor", tags=["executor"])
+
+
+@router.get("/stats", response_model=Dict[str, Any])
+def get_executor_stats(db: Session = Depends(get_db)):
+    """获取执行引擎的并发和队列统计信息"""
+    try:
+        stats = get_executor().stats()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    stats["backend"] = settings.EXECUTION_BACKEND
+    stats["environment_cache"] = environment_cache.stats()
+    if settings.EXECUTION_BACKEND == "queue":
+        stats["run_queue"] = run_queue_crud.count_by_status(db)
+    return stats
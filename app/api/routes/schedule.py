@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.db.crud import schedule_crud, spider_crud
-from app.models import Schedule
+from typing import List, Optional, Dict
+from app.db.crud import schedule_crud, spider_crud, execution_log_crud, counter_crud
 from app.models.database import get_db
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
 from app.services.scheduler import get_scheduler
+from app.core.config import settings
+from app.services.executor import PRIORITY_CLASSES
+from app.services.triggers import validate_cron_expression, fire_histogram
+from app.services.timeline import predict_concurrency
+from app.api.pagination import encode_cursor, decode_id_cursor
 
 router = APIRouter(prefix="/api/schedules", tags=["schedules"])
 
@@ -15,6 +19,12 @@ class ScheduleBase(BaseModel):
     spider_id: Optional[int] = None
     cron_expression: str
     is_active: bool = True
+    misfire_grace_time: Optional[int] = None
+    coalesce: Optional[bool] = True
+    max_instances: Optional[int] = 1
+    timeout_seconds: Optional[int] = None
+    spread_seconds: Optional[int] = None
+    priority: Optional[str] = None
 
 
 class ScheduleCreate(ScheduleBase):
@@ -24,6 +34,17 @@ class ScheduleCreate(ScheduleBase):
 class ScheduleUpdate(BaseModel):
     cron_expression: Optional[str] = None
     is_active: Optional[bool] = None
+    misfire_grace_time: Optional[int] = None
+    coalesce: Optional[bool] = None
+    max_instances: Optional[int] = None
+    timeout_seconds: Optional[int] = None
+    spread_seconds: Optional[int] = None
+    priority: Optional[str] = None
+
+
+class ScheduleBulkUpdate(BaseModel):
+    ids: List[int]
+    changes: ScheduleUpdate
 
 
 class ScheduleResponse(ScheduleBase):
@@ -35,20 +56,118 @@ class ScheduleResponse(ScheduleBase):
         orm_mode = True
 
 class ScheduleListResponse(BaseModel):
-    total: int
+    total: Optional[int] = None
     schedules: List[ScheduleResponse]
+    next_cursor: Optional[str] = None
 
 
 @router.get("/", response_model=ScheduleListResponse)
-async def get_schedules(page: int = 1, limit: int = 10, db: Session = Depends(get_db)):
-    """获取所有调度任务"""
-    schedules = schedule_crud.get_multi(db, skip=(page - 1) * limit, limit=limit)
-    total = db.query(Schedule).count()
-    return {"total": total, "schedules": schedules}
+def get_schedules(
+    page: int = 1,
+    limit: int = Query(10, ge=1),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    db: Session = Depends(get_db)
+):
+    """获取所有调度任务
+
+    传入上一页返回的 next_cursor 时按 id 游标翻页（忽略 page）；include_total 为 false 时不统计总数。
+    """
+    schedules = schedule_crud.get_page(
+        db, after_id=decode_id_cursor(cursor), skip=(max(page, 1) - 1) * limit, limit=limit + 1
+    )
+    next_cursor = None
+    if len(schedules) > limit:
+        schedules = schedules[:limit]
+        next_cursor = encode_cursor(schedules[-1].id)
+
+    total = counter_crud.get_value(db, "schedules") if include_total else None
+    return {"total": total, "schedules": schedules, "next_cursor": next_cursor}
+
+
+@router.get("/fire-histogram")
+def get_fire_histogram(hours: int = 1, bucket_seconds: int = 60, db: Session = Depends(get_db)):
+    """统计未来一段时间内活跃调度任务的触发时间分布，对比错峰前后的峰值"""
+    if hours < 1 or hours > 168:
+        raise HTTPException(status_code=400, detail="hours 取值范围为 1-168")
+    if bucket_seconds < 1 or hours * 3600 // bucket_seconds > 10080:
+        raise HTTPException(status_code=400, detail="bucket_seconds 过小，时间桶数量不能超过 10080")
+    schedules = [schedule for schedule, _ in schedule_crud.get_active_with_spider(db)]
+    start = datetime.now().astimezone()
+    return fire_histogram(schedules, start, start + timedelta(hours=hours), bucket_seconds)
+
+
+@router.get("/timeline")
+def get_timeline(
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db)
+):
+    """查询时间段内的触发计划，并按历史平均运行时长预测同时运行数"""
+    start, end = start.astimezone(), end.astimezone()
+    if end <= start:
+        raise HTTPException(status_code=400, detail="结束时间必须晚于开始时间")
+    timeline = get_scheduler().timeline
+
+    durations = execution_log_crud.average_durations(db, datetime.now() - timedelta(days=30))
+    default_duration = settings.TIMELINE_DEFAULT_DURATION
+    longest = max(list(durations.values()) + [default_duration])
+    # 开始时间之前触发、可能仍在运行的也参与并发预测
+    fires = timeline.query(start - timedelta(seconds=longest), end)
+    peak, peak_at = predict_concurrency(
+        [(fire_time, durations.get(item.spider_id, default_duration)) for fire_time, item in fires], start
+    )
+
+    in_window = [(fire_time, item) for fire_time, item in fires if fire_time >= start]
+    complete_until = timeline.complete_until()
+    return {
+        "from": start,
+        "to": end,
+        "total": len(in_window),
+        "complete": complete_until is not None and complete_until >= end,
+        "complete_until": complete_until,
+        "peak_concurrency": peak,
+        "peak_at": peak_at,
+        "fires": [
+            {
+                "fire_time": fire_time,
+                "schedule_id": item.schedule_id,
+                "spider_id": item.spider_id,
+                "spider_name": item.spider_name,
+                "expected_duration_seconds": durations.get(item.spider_id, default_duration),
+            }
+            for fire_time, item in in_window[:limit]
+        ],
+    }
+
+
+@router.put("/bulk", response_model=Dict[str, int])
+def bulk_update_schedules(bulk: ScheduleBulkUpdate, db: Session = Depends(get_db)):
+    """批量修改调度任务，一条 UPDATE 完成，调度器随后一次性同步受影响的任务"""
+    changes = bulk.changes.dict(exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="没有需要修改的字段")
+    if changes.get("cron_expression") is not None:
+        error = validate_cron_expression(changes["cron_expression"])
+        if error:
+            raise HTTPException(status_code=400, detail=f"cron表达式无效: {error}")
+    if changes.get("priority") and changes["priority"] not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail=f"优先级无效，可选值: {', '.join(PRIORITY_CLASSES)}")
+    updated = schedule_crud.update_many(db, bulk.ids, changes)
+    return {"updated": updated}
+
+
+@router.get("/count", response_model=Dict[str, int])
+def get_schedules_count(db: Session = Depends(get_db)):
+    """获取调度任务总数，以及启用和停用的数量（读取触发器维护的计数）"""
+    active = counter_crud.get_value(db, "schedules", "is_active:1")
+    inactive = counter_crud.get_value(db, "schedules", "is_active:0")
+    return {"total": counter_crud.get_value(db, "schedules"), "active": active, "inactive": inactive}
 
 
 @router.get("/spider/{spider_id}", response_model=List[ScheduleResponse])
-async def get_schedules_by_spider(spider_id: int, db: Session = Depends(get_db)):
+def get_schedules_by_spider(spider_id: int, db: Session = Depends(get_db)):
     """获取特定爬虫的所有调度任务"""
     # 检查爬虫是否存在
     spider = spider_crud.get(db, spider_id)
@@ -60,7 +179,7 @@ async def get_schedules_by_spider(spider_id: int, db: Session = Depends(get_db))
 
 
 @router.get("/{schedule_id}", response_model=ScheduleResponse)
-async def get_schedule(schedule_id: int, db: Session = Depends(get_db)):
+def get_schedule(schedule_id: int, db: Session = Depends(get_db)):
     """获取特定调度任务"""
     schedule = schedule_crud.get(db, schedule_id)
     if not schedule:
@@ -69,86 +188,49 @@ async def get_schedule(schedule_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/", response_model=ScheduleResponse, status_code=status.HTTP_201_CREATED)
-async def create_schedule(schedule: ScheduleCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def create_schedule(schedule: ScheduleCreate, db: Session = Depends(get_db)):
     """创建新调度任务"""
     # 检查爬虫是否存在
     spider = spider_crud.get(db, schedule.spider_id)
     if not spider:
         raise HTTPException(status_code=404, detail="爬虫不存在")
+    error = validate_cron_expression(schedule.cron_expression)
+    if error:
+        raise HTTPException(status_code=400, detail=f"cron表达式无效: {error}")
+    if schedule.priority and schedule.priority not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail=f"优先级无效，可选值: {', '.join(PRIORITY_CLASSES)}")
     
-    # 创建调度任务
+    # 创建调度任务，提交后由数据变更事件同步到调度器
     new_schedule = schedule_crud.create(db, obj_in=schedule.dict())
-    
-    # 在后台添加到调度器
-    background_tasks.add_task(add_job_to_scheduler, new_schedule.id)
-    
     return new_schedule
 
 
 @router.put("/{schedule_id}", response_model=ScheduleResponse)
-async def update_schedule(schedule_id: int, schedule: ScheduleUpdate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def update_schedule(schedule_id: int, schedule: ScheduleUpdate, db: Session = Depends(get_db)):
     """更新调度任务"""
     db_schedule = schedule_crud.get(db, schedule_id)
     if not db_schedule:
         raise HTTPException(status_code=404, detail="调度任务不存在")
+    if schedule.cron_expression is not None:
+        error = validate_cron_expression(schedule.cron_expression)
+        if error:
+            raise HTTPException(status_code=400, detail=f"cron表达式无效: {error}")
+    if schedule.priority and schedule.priority not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail=f"优先级无效，可选值: {', '.join(PRIORITY_CLASSES)}")
     
-    # 更新调度任务
+    # 更新调度任务，提交后由数据变更事件同步到调度器
     update_data = schedule.dict(exclude_unset=True)
     updated_schedule = schedule_crud.update(db, db_obj=db_schedule, obj_in=update_data)
-    
-    # 在后台更新调度器中的任务
-    background_tasks.add_task(update_job_in_scheduler, updated_schedule.id)
-    
     return updated_schedule
 
 
 @router.delete("/{schedule_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_schedule(schedule_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def delete_schedule(schedule_id: int, db: Session = Depends(get_db)):
     """删除调度任务"""
     db_schedule = schedule_crud.get(db, schedule_id)
     if not db_schedule:
         raise HTTPException(status_code=404, detail="调度任务不存在")
     
-    # 在后台从调度器中移除任务
-    remove_job_from_scheduler(schedule_id)
-    # 删除调度任务
+    # 删除调度任务，提交后由数据变更事件从调度器中移除
     schedule_crud.remove(db, id=schedule_id)
     return None
-
-
-# 辅助函数，用于在后台操作调度器
-def add_job_to_scheduler(schedule_id: int):
-    """将任务添加到调度器"""
-    try:
-        scheduler = get_scheduler()
-        scheduler.update_job(schedule_id)
-    except Exception as e:
-        print(f"添加调度任务失败: {str(e)}")
-
-
-def update_job_in_scheduler(schedule_id: int):
-    """更新调度器中的任务"""
-    try:
-        scheduler = get_scheduler()
-        scheduler.update_job(schedule_id)
-    except Exception as e:
-        print(f"更新调度任务失败: {str(e)}")
-
-
-def remove_job_from_scheduler(schedule_id: int):
-    """从调度器中移除任务"""
-    try:
-        scheduler = get_scheduler()
-        scheduler.remove_job(schedule_id)
-    except Exception as e:
-        from app.services.scheduler import logger
-        logger.error(f"移除调度任务失败: {str(e)}")
-        raise
-
-from typing import Dict
-
-@router.get("/count", response_model=Dict[str, int])
-async def get_schedules_count(db: Session = Depends(get_db)):
-    """获取调度任务总数"""
-    count = db.query(Schedule).count()
-    return {"total": count}
\ No newline at end of file
@@ -3,9 +3,12 @@ from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict
 from pathlib import Path
-from app.db.crud import spider_crud
+from app.db.crud import spider_crud, counter_crud
+from app.api.pagination import encode_cursor, decode_id_cursor
 from app.models import Spider
 from app.models.database import get_db
+from app.services.scheduler import OVERLAP_POLICIES
+from app.services.executor import PRIORITY_CLASSES
 from pydantic import BaseModel
 from datetime import datetime
 import os
@@ -37,7 +40,7 @@ def validate_script_path(relative_path):
         return None
 
 @router.post("/upload-script")
-async def upload_spider_script(file: UploadFile = File(...)):
+def upload_spider_script(file: UploadFile = File(...)):
     if not file.filename.endswith('.py'):
         raise HTTPException(status_code=400, detail="只支持Python脚本文件")
     
@@ -50,7 +53,7 @@ async def upload_spider_script(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"上传失败: {str(e)}")
 
 @router.post("/save-script")
-async def save_spider_script(data: dict = Body(...)):
+def save_spider_script(data: dict = Body(...)):
     if not data or 'path' not in data or 'content' not in data:
         raise HTTPException(status_code=400, detail="缺少必要参数")
 
@@ -67,7 +70,7 @@ async def save_spider_script(data: dict = Body(...)):
         raise HTTPException(status_code=500, detail=f'文件操作失败: {str(e)}')
 
 @router.get("/script-content")
-async def get_spider_script(path: str):
+def get_spider_script(path: str):
     try:
         filename = Path(path).name
         script_path = SCRIPT_DIR / filename
@@ -87,6 +90,9 @@ class SpiderBase(BaseModel):
     description: Optional[str] = None
     script_path: str
     is_active: bool = True
+    timeout_seconds: Optional[int] = None
+    priority: Optional[str] = "normal"
+    overlap_policy: Optional[str] = "allow"
 
 
 class SpiderCreate(SpiderBase):
@@ -98,6 +104,9 @@ class SpiderUpdate(BaseModel):
     description: Optional[str] = None
     script_path: Optional[str] = None
     is_active: Optional[bool] = None
+    timeout_seconds: Optional[int] = None
+    priority: Optional[str] = None
+    overlap_policy: Optional[str] = None
 
 
 class TestResult(BaseModel):
@@ -129,33 +138,55 @@ class SpiderResponse(SpiderBase):
         orm_mode = True
 
 class SpiderListResponse(BaseModel):
-    total: int
+    total: Optional[int] = None
     spiders: List[SpiderResponse]
+    next_cursor: Optional[str] = None
 
 @router.get("/", response_model=SpiderListResponse)
-async def get_spiders(
-    page: int = 0,
-    limit: int = 100,
+def get_spiders(
+    page: int = 1,
+    limit: int = Query(100, ge=1),
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     db: Session = Depends(get_db)
 ):
-    """获取爬虫列表，支持分页和搜索"""
+    """获取爬虫列表，支持分页和搜索
+
+    传入上一页返回的 next_cursor 时按 id 游标翻页（忽略 page）；include_total 为 false 时不统计总数。
+    """
+    filters = []
     if search:
         # 如果有搜索关键词，执行模糊搜索
-        spiders = db.query(Spider).filter(
+        filters.append(
             (Spider.name.ilike(f"%{search}%")) |
             (Spider.description.ilike(f"%{search}%"))
-        ).offset((page-1)*limit).limit(limit).all()
-    else:
-        # 否则返回所有爬虫
-        spiders = spider_crud.get_multi(db, skip=(page-1)*limit, limit=limit)
+        )
+    spiders = spider_crud.get_page(
+        db, after_id=decode_id_cursor(cursor), skip=(max(page, 1) - 1) * limit, limit=limit + 1, filters=filters
+    )
+    next_cursor = None
+    if len(spiders) > limit:
+        spiders = spiders[:limit]
+        next_cursor = encode_cursor(spiders[-1].id)
+
+    total = None
+    if include_total:
+        # 没有搜索条件时直接读取计数
+        total = db.query(Spider).filter(*filters).count() if filters else counter_crud.get_value(db, "spiders")
+    return {"total": total, "spiders": spiders, "next_cursor": next_cursor}
+
 
-    total = db.query(Spider).count()
-    return {"total": total, "spiders": spiders}
+@router.get("/count", response_model=Dict[str, int])
+def get_spiders_count(db: Session = Depends(get_db)):
+    """获取爬虫总数，以及启用和停用的数量（读取触发器维护的计数）"""
+    active = counter_crud.get_value(db, "spiders", "is_active:1")
+    inactive = counter_crud.get_value(db, "spiders", "is_active:0")
+    return {"total": counter_crud.get_value(db, "spiders"), "active": active, "inactive": inactive}
 
 
 @router.get("/{spider_id}", response_model=SpiderResponse)
-async def get_spider(spider_id: int, db: Session = Depends(get_db)):
+def get_spider(spider_id: int, db: Session = Depends(get_db)):
     """获取特定爬虫"""
     spider = spider_crud.get(db, spider_id)
     if not spider:
@@ -164,11 +195,15 @@ async def get_spider(spider_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/", response_model=SpiderResponse, status_code=status.HTTP_201_CREATED)
-async def create_spider(spider: SpiderCreate, db: Session = Depends(get_db)):
+def create_spider(spider: SpiderCreate, db: Session = Depends(get_db)):
     """创建新爬虫"""
     # 检查脚本路径是否存在
     if not os.path.exists(spider.script_path):
         raise HTTPException(status_code=400, detail="脚本路径不存在")
+    if spider.overlap_policy and spider.overlap_policy not in OVERLAP_POLICIES:
+        raise HTTPException(status_code=400, detail=f"重叠策略无效，可选值: {', '.join(OVERLAP_POLICIES)}")
+    if spider.priority and spider.priority not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail=f"优先级无效，可选值: {', '.join(PRIORITY_CLASSES)}")
     
     # 创建爬虫
     new_spider = spider_crud.create(db, obj_in=spider.dict())
@@ -179,7 +214,7 @@ async def create_spider(spider: SpiderCreate, db: Session = Depends(get_db)):
 
 
 @router.put("/{spider_id}", response_model=SpiderResponse)
-async def update_spider(spider_id: int, spider: SpiderUpdate, db: Session = Depends(get_db)):
+def update_spider(spider_id: int, spider: SpiderUpdate, db: Session = Depends(get_db)):
     """更新爬虫"""
     db_spider = spider_crud.get(db, spider_id)
     if not db_spider:
@@ -188,6 +223,10 @@ async def update_spider(spider_id: int, spider: SpiderUpdate, db: Session = Depe
     # 如果更新了脚本路径，检查新路径是否存在
     if spider.script_path and not os.path.exists(spider.script_path):
         raise HTTPException(status_code=400, detail="脚本路径不存在")
+    if spider.overlap_policy and spider.overlap_policy not in OVERLAP_POLICIES:
+        raise HTTPException(status_code=400, detail=f"重叠策略无效，可选值: {', '.join(OVERLAP_POLICIES)}")
+    if spider.priority and spider.priority not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail=f"优先级无效，可选值: {', '.join(PRIORITY_CLASSES)}")
     
     # 更新爬虫
     update_data = spider.dict(exclude_unset=True)
@@ -196,14 +235,12 @@ async def update_spider(spider_id: int, spider: SpiderUpdate, db: Session = Depe
     # 如果爬虫被禁用，更新相关调度任务的状态
     if spider.is_active is False:
         from app.db.crud import schedule_crud
-        schedules = schedule_crud.get_by_spider(db, spider_id)
-        for schedule in schedules:
-            schedule_crud.update(db, db_obj=schedule, obj_in={"is_active": False})
+        schedule_crud.deactivate_by_spider(db, spider_id)
     
     return updated_spider
 
 @router.delete("/{spider_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_spider(spider_id: int, db: Session = Depends(get_db)):
+def delete_spider(spider_id: int, db: Session = Depends(get_db)):
     """删除爬虫"""
     db_spider = spider_crud.get(db, spider_id)
     if not db_spider:
@@ -212,10 +249,3 @@ async def delete_spider(spider_id: int, db: Session = Depends(get_db)):
     # 删除爬虫
     spider_crud.remove(db, id=spider_id)
     return None
-
-
-@router.get("/count", response_model=Dict[str, int])
-async def get_spiders_count(db: Session = Depends(get_db)):
-    """获取爬虫总数"""
-    count = db.query(Spider).count()
-    return {"total": count}
\ No newline at end of file
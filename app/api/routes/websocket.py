@@ -1,8 +1,10 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from typing import List, Dict
-from sqlalchemy.orm import Session
-from app.models.database import get_db
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+from typing import List, Dict, Optional
+from app.models.database import get_db_session
 from app.db.crud import execution_log_crud
+from app.services.log_stream import log_broadcaster
+import asyncio
 import json
 
 router = APIRouter(prefix="/api/ws", tags=["websocket"])
@@ -19,6 +21,9 @@ class ConnectionManager:
         await websocket.accept()
         self.active_connections.append(websocket)
         if log_id:
+            # 执行引擎在其他线程中产生日志，通过广播器转发到当前事件循环
+            log_broadcaster.add_listener(asyncio.get_running_loop(), self.send_log_update)
+            log_broadcaster.watch(log_id)
             if log_id not in self.log_connections:
                 self.log_connections[log_id] = []
             self.log_connections[log_id].append(websocket)
@@ -29,36 +34,54 @@ class ConnectionManager:
         if log_id and log_id in self.log_connections:
             if websocket in self.log_connections[log_id]:
                 self.log_connections[log_id].remove(websocket)
+                log_broadcaster.unwatch(log_id)
             if not self.log_connections[log_id]:
                 del self.log_connections[log_id]
     
     async def send_log_update(self, log_id: int, message: dict):
         if log_id in self.log_connections:
-            for connection in self.log_connections[log_id]:
-                await connection.send_text(json.dumps(message))
+            text = json.dumps(message)
+            for connection in list(self.log_connections[log_id]):
+                try:
+                    await connection.send_text(text)
+                except Exception:
+                    self.disconnect(connection, log_id)
 
 # 创建连接管理器实例
 manager = ConnectionManager()
 
+
+def _load_initial_log(log_id: int) -> Optional[dict]:
+    """读取日志的当前内容，在线程池中执行，读取完即释放数据库连接"""
+    db = get_db_session()
+    try:
+        log = execution_log_crud.get_with_output(db, log_id)
+        if not log:
+            return None
+        return {
+            "id": log.id,
+            "spider_id": log.spider_id,
+            "start_time": log.start_time.isoformat() if log.start_time else None,
+            "end_time": log.end_time.isoformat() if log.end_time else None,
+            "status": log.status,
+            "log_content": log.log_content,
+            "error_message": log.error_message
+        }
+    finally:
+        db.close()
+
+
 @router.websocket("/logs/{log_id}")
-async def websocket_log_endpoint(websocket: WebSocket, log_id: int, db: Session = Depends(get_db)):
+async def websocket_log_endpoint(websocket: WebSocket, log_id: int):
     """WebSocket端点，用于实时获取执行日志更新"""
     await manager.connect(websocket, log_id)
     try:
         # 发送初始日志数据
-        log = execution_log_crud.get(db, log_id)
-        if log:
+        data = await run_in_threadpool(_load_initial_log, log_id)
+        if data:
             await websocket.send_text(json.dumps({
                 "type": "initial",
-                "data": {
-                    "id": log.id,
-                    "spider_id": log.spider_id,
-                    "start_time": log.start_time.isoformat() if log.start_time else None,
-                    "end_time": log.end_time.isoformat() if log.end_time else None,
-                    "status": log.status,
-                    "log_content": log.log_content,
-                    "error_message": log.error_message
-                }
+                "data": data
             }))
         
         # 等待客户端消息
@@ -1,10 +1,94 @@
 import os
 import platform
 from pathlib import Path
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     BASE_DIR: Path = Path(__file__).resolve().parent.parent.parent
+
+    # 数据库配置：连接地址，以及连接池大小和允许额外创建的连接数
+    DATABASE_URL: str = "sqlite:///spider_manager.db"
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_MAX_OVERFLOW: int = 20
+    # SQLite 连接参数：日志模式（WAL 允许读写并发）、同步级别、等待锁的毫秒数、
+    # 每个连接的页缓存大小（负数表示 KiB）和内存映射大小（字节，0 表示不使用）
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE: int = -64000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    # 空闲页的回收方式，INCREMENTAL 时可由保留策略任务分步归还空间；已有数据库需要执行一次
+    # python -m app.db.maintenance vacuum 才会切换
+    SQLITE_AUTO_VACUUM: str = "INCREMENTAL"
+
+    # 执行引擎配置：全局并发上限、单个爬虫默认并发上限，以及按爬虫ID覆盖的并发上限
+    EXECUTOR_MAX_CONCURRENCY: int = 8
+    EXECUTOR_PER_SPIDER_LIMIT: int = 1
+    EXECUTOR_SPIDER_LIMITS: Dict[int, int] = {}
+    # 为高优先级运行保留的并发数，普通和低优先级的运行不能占用这部分并发
+    EXECUTOR_HIGH_PRIORITY_RESERVED: int = 1
+
+    # 执行后端："local" 由本进程的执行引擎运行，"queue" 写入运行队列，由 python -m app.worker 启动的工作节点领取
+    EXECUTION_BACKEND: str = "local"
+    # 工作节点配置：租约时长、心跳间隔、空闲时的轮询间隔，以及单个任务的最大尝试次数
+    WORKER_LEASE_SECONDS: int = 60
+    WORKER_HEARTBEAT_INTERVAL: float = 15.0
+    WORKER_POLL_INTERVAL: float = 2.0
+    WORKER_MAX_ATTEMPTS: int = 3
+
+    # 触发时间线：预先计算的时间范围（小时）、每个调度任务最多预先计算的触发次数，
+    # 以及没有历史运行记录时预计的运行时长（秒）
+    TIMELINE_HORIZON_HOURS: int = 48
+    TIMELINE_FIRES_PER_SCHEDULE: int = 500
+    TIMELINE_DEFAULT_DURATION: float = 60.0
+    TIMELINE_REFRESH_INTERVAL: int = 600
+
+    # 重叠策略为 queue_one/coalesce 时，检查被延后的触发能否执行的间隔秒数
+    OVERLAP_CHECK_INTERVAL: float = 5.0
+
+    # 爬虫环境变量缓存的有效期（秒）。API/调度进程中的修改通过数据变更事件立即使缓存失效，
+    # 默认不设有效期；独立的工作节点收不到这些事件，改用 ENV_CACHE_WORKER_TTL。0 表示不缓存
+    ENV_CACHE_TTL: Optional[float] = None
+    ENV_CACHE_WORKER_TTL: float = 600.0
+
+    # 运行超时配置：默认超时秒数（0表示不限制），以及终止进程组时 SIGTERM 到 SIGKILL 之间的等待秒数
+    RUN_DEFAULT_TIMEOUT: int = 0
+    RUN_KILL_GRACE_SECONDS: float = 5.0
+
+    # 爬虫输出流式写入配置：每次读取的字节数、累计多少字节或间隔多少秒写入一次数据库
+    LOG_READ_CHUNK_SIZE: int = 8192
+    LOG_FLUSH_BYTES: int = 64 * 1024
+    LOG_FLUSH_INTERVAL: float = 1.0
+    # 输出块的 zlib 压缩级别（1-9，越大压缩率越高、越耗 CPU）
+    LOG_COMPRESSION_LEVEL: int = 6
+
+    # 执行日志保留策略：最近 LOG_RETENTION_FULL_DAYS 天的日志保留完整输出，更早的日志归档到
+    # LOG_ARCHIVE_DIR 下按月划分的压缩 JSONL 文件后只保留摘要；早于 LOG_RETENTION_SUMMARY_DAYS 天
+    # 的日志从数据库删除。天数为 0 表示不处理。每批处理 LOG_RETENTION_BATCH_SIZE 条，
+    # 每 LOG_RETENTION_INTERVAL_HOURS 小时运行一次
+    LOG_RETENTION_FULL_DAYS: int = 0
+    LOG_RETENTION_SUMMARY_DAYS: int = 0
+    LOG_ARCHIVE_DIR: str = "archives"
+    LOG_RETENTION_BATCH_SIZE: int = 500
+    LOG_RETENTION_INTERVAL_HOURS: float = 24.0
+
+    # 调度器配置：错过触发时间后允许补跑的默认秒数、是否合并多次错过的触发、同一任务的最大并发实例数
+    SCHEDULER_MISFIRE_GRACE_TIME: int = 300
+    SCHEDULER_COALESCE: bool = True
+    SCHEDULER_MAX_INSTANCES: int = 1
+    # 调度未配置 spread_seconds 时使用的错峰窗口秒数，0 表示不错峰
+    SCHEDULER_DEFAULT_SPREAD_SECONDS: int = 0
+    # 收到调度或爬虫的变更事件后，等待多久再批量同步到调度器（合并短时间内的多次提交）
+    SCHEDULER_SYNC_DEBOUNCE: float = 0.2
+
+    # 资源统计配置：是否采集每次运行的CPU、内存和I/O，以及采样间隔秒数
+    RESOURCE_ACCOUNTING: bool = True
+    RESOURCE_SAMPLE_INTERVAL: float = 1.0
+
+    # 预热进程池配置：进程数为0时关闭，每次运行都冷启动新的解释器
+    WARM_POOL_SIZE: int = 0
+    WARM_POOL_PRELOAD: List[str] = ["requests", "bs4", "selenium.webdriver", "undetected_chromedriver"]
     
     # 根据操作系统选择正确的驱动路径
     @property
@@ -3,9 +3,12 @@ from .crud import (
     spider_crud,
     schedule_crud,
     execution_log_crud,
+    execution_metrics_crud,
     environment_crud,
     environment_variable_crud,
-    spider_environment_crud
+    spider_environment_crud,
+    run_queue_crud,
+    counter_crud
 )
 
 __all__ = [
@@ -13,7 +16,10 @@ __all__ = [
     'spider_crud',
     'schedule_crud',
     'execution_log_crud',
+    'execution_metrics_crud',
     'environment_crud',
     'environment_variable_crud',
-    'spider_environment_crud'
+    'spider_environment_crud',
+    'run_queue_crud',
+    'counter_crud'
 ]
\ No newline at end of file
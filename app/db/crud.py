@@ -1,6 +1,13 @@
-from sqlalchemy.orm import Session
-from app.models import User, Spider, Schedule, ExecutionLog, Environment, EnvironmentVariable, SpiderEnvironment
-from typing import List, Optional, Dict, Any, Type, TypeVar, Generic
+import zlib
+from sqlalchemy import func, or_, insert, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, selectinload, noload
+from sqlalchemy.orm.attributes import set_committed_value
+from app.core.config import settings
+from app.db.events import record_change, record_objects, tracks_changes
+from app.models import User, Spider, Schedule, ExecutionLog, ExecutionLogChunk, ExecutionMetrics, Environment, EnvironmentVariable, SpiderEnvironment, RunQueueItem, Counter
+from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, Type, TypeVar, Generic, Tuple, Union
 
 T = TypeVar('T')
 
@@ -18,6 +25,18 @@ class CRUDBase(Generic[T]):
     def get_multi(self, db: Session, *, skip: int = 0, limit: int = 100) -> List[T]:
         return db.query(self.model).offset(skip).limit(limit).all()
 
+    def get_page(self, db: Session, *, after_id: Optional[int] = None, skip: int = 0, limit: int = 100, filters=()) -> List[T]:
+        """按 id 升序分页
+
+        after_id 为上一页最后一条记录的 id 时使用游标分页，直接从主键定位，不随页数变慢；
+        否则按 skip 偏移。
+        """
+        query = db.query(self.model).filter(*filters)
+        if after_id is not None:
+            query = query.filter(self.model.id > after_id)
+            skip = 0
+        return query.order_by(self.model.id).offset(skip).limit(limit).all()
+
     def create(self, db: Session, *, obj_in: Dict[str, Any]) -> T:
         obj = self.model(**obj_in)
         db.add(obj)
@@ -39,6 +58,68 @@ class CRUDBase(Generic[T]):
         db.commit()
         return obj
 
+    # 批量操作每条 UPDATE 的 IN 列表长度上限，避免参数个数超过 SQLite 的限制
+    BULK_CHUNK_SIZE = 500
+
+    def _execute_bulk(self, db: Session, stmt, params=None, returning: bool = False) -> Union[int, List[T]]:
+        # 需要返回对象或需要发布数据变更事件时用 RETURNING 取回写入的行，批量语句不经过 flush
+        if returning or tracks_changes(self.model):
+            objs = db.scalars(stmt.returning(self.model), params).all()
+            record_objects(db, objs)
+            return objs if returning else len(objs)
+        result = db.execute(stmt, params)
+        return len(params) if params is not None else result.rowcount
+
+    def _touch(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """模型有 updated_at 列且未指定时补上当前时间：ON CONFLICT DO UPDATE 不会触发列的 onupdate，批量 UPDATE 也同样显式写入"""
+        if "updated_at" in self.model.__table__.c and "updated_at" not in values:
+            values = {**values, "updated_at": datetime.now()}
+        return values
+
+    def create_many(self, db: Session, objs_in: List[Dict[str, Any]], *, returning: bool = False) -> Union[int, List[T]]:
+        """用批量 INSERT 在一个事务中创建多条记录
+
+        returning 为 True 时通过 RETURNING 取回创建的对象（不再逐个 refresh），否则返回创建的条数。
+        """
+        if not objs_in:
+            return [] if returning else 0
+        created = self._execute_bulk(db, insert(self.model), objs_in, returning)
+        db.commit()
+        return created
+
+    def update_many(self, db: Session, ids: List[int], values: Dict[str, Any], *, returning: bool = False) -> Union[int, List[T]]:
+        """用 UPDATE ... WHERE id IN (...) 在一个事务中把多条记录修改为相同的值
+
+        returning 为 True 时返回修改后的对象，否则返回修改的条数。
+        """
+        if not ids or not values:
+            return [] if returning else 0
+        values = self._touch(values)
+        results = [] if returning else 0
+        for start in range(0, len(ids), self.BULK_CHUNK_SIZE):
+            stmt = update(self.model).where(self.model.id.in_(ids[start:start + self.BULK_CHUNK_SIZE])).values(values)
+            results += self._execute_bulk(db, stmt, returning=returning)
+        db.commit()
+        return results
+
+    def upsert_many(self, db: Session, objs_in: List[Dict[str, Any]], *, index_elements: List[str],
+                    update_fields: List[str], returning: bool = False) -> Union[int, List[T]]:
+        """用 INSERT ... ON CONFLICT DO UPDATE 在一个事务中批量写入
+
+        与 index_elements 对应的唯一索引冲突的行更新 update_fields 中的列，其余行插入。
+        returning 为 True 时返回写入的对象，否则返回写入的条数。
+        """
+        if not objs_in:
+            return [] if returning else 0
+        stmt = sqlite_insert(self.model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_=self._touch({field: stmt.excluded[field] for field in update_fields}),
+        )
+        written = self._execute_bulk(db, stmt, objs_in, returning)
+        db.commit()
+        return written
+
 
 class CRUDUser(CRUDBase[User]):
     """
@@ -58,6 +139,19 @@ class CRUDSpider(CRUDBase[Spider]):
     def get_by_user(self, db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Spider]:
         return db.query(Spider).filter(Spider.user_id == user_id).offset(skip).limit(limit).all()
 
+    def get_run_class(self, db: Session, spider_id: int, schedule_id: Optional[int] = None) -> Optional[Tuple[Optional[int], str, int]]:
+        """获取一次运行的所属用户、优先级类别（调度配置优先于爬虫配置）和用户权重"""
+        row = db.query(Spider.user_id, Spider.priority, User.share_weight).outerjoin(
+            User, User.id == Spider.user_id
+        ).filter(Spider.id == spider_id).first()
+        if row is None:
+            return None
+        user_id, priority, weight = row
+        if schedule_id is not None:
+            schedule_priority = db.query(Schedule.priority).filter(Schedule.id == schedule_id).scalar()
+            priority = schedule_priority or priority
+        return user_id, priority or 'normal', weight or 1
+
     def remove(self, db: Session, *, id: int) -> Spider:
         obj = db.query(self.model).get(id)
         if obj and obj.script_path:
@@ -84,17 +178,259 @@ class CRUDSchedule(CRUDBase[Schedule]):
     def get_active_schedules(self, db: Session) -> List[Schedule]:
         return db.query(Schedule).filter(Schedule.is_active == True).all()
 
+    def get_active_with_spider(self, db: Session) -> List[Tuple[Schedule, Spider]]:
+        """一次查询获取所有活跃调度及其所属的活跃爬虫"""
+        return db.query(Schedule, Spider).join(Spider, Schedule.spider_id == Spider.id).filter(
+            Schedule.is_active == True, Spider.is_active == True
+        ).all()
+
+    def get_with_spider(self, db: Session, schedule_ids, spider_ids) -> List[Tuple[Schedule, Optional[Spider]]]:
+        """一次查询获取指定调度任务以及指定爬虫下的所有调度任务，爬虫不存在时为 None"""
+        conditions = []
+        if schedule_ids:
+            conditions.append(Schedule.id.in_(schedule_ids))
+        if spider_ids:
+            conditions.append(Schedule.spider_id.in_(spider_ids))
+        if not conditions:
+            return []
+        return db.query(Schedule, Spider).outerjoin(Spider, Schedule.spider_id == Spider.id).filter(
+            or_(*conditions)
+        ).all()
+
+    def deactivate_by_spider(self, db: Session, spider_id: int) -> int:
+        """用一条 UPDATE 停用爬虫的所有调度任务"""
+        updated = db.query(Schedule).filter(Schedule.spider_id == spider_id, Schedule.is_active == True).update(
+            {Schedule.is_active: False, Schedule.updated_at: datetime.now()}, synchronize_session=False
+        )
+        record_change(db, "spider", [spider_id])
+        db.commit()
+        return updated
+
+
+def summarize_message(message: Optional[str]) -> Optional[str]:
+    """取说明的第一行非空内容作为列表中显示的摘要"""
+    for line in (message or "").splitlines():
+        line = line.strip()
+        if line:
+            return line[:255]
+    return None
+
 
 class CRUDExecutionLog(CRUDBase[ExecutionLog]):
     """
     执行日志相关的CRUD操作
     """
-    def get_by_spider(self, db: Session, spider_id: int, skip: int = 0, limit: int = 100) -> List[ExecutionLog]:
-        return db.query(ExecutionLog).filter(ExecutionLog.spider_id == spider_id).offset(skip).limit(limit).all()
+    # 超过该长度的 error_message 视为早期版本保存的完整错误输出，整理时移入输出块
+    LEGACY_MESSAGE_LENGTH = 255
+
+    def _query(self, db: Session, expand_spider: bool):
+        """列表查询：expand_spider 为 True 时用一次 IN 查询批量加载整页日志的爬虫，
+        否则不加载爬虫（spider 为 None），避免序列化时逐条懒加载"""
+        loader = selectinload(ExecutionLog.spider) if expand_spider else noload(ExecutionLog.spider)
+        return db.query(ExecutionLog).options(loader)
+
+    def get_by_spider(self, db: Session, spider_id: int, skip: int = 0, limit: int = 100,
+                      expand_spider: bool = False) -> List[ExecutionLog]:
+        """获取爬虫的执行日志，按开始时间倒序排列"""
+        return self._query(db, expand_spider).filter(ExecutionLog.spider_id == spider_id).order_by(
+            ExecutionLog.start_time.desc()
+        ).offset(skip).limit(limit).all()
         
-    def get_logs_with_order(self, db: Session, skip: int = 0, limit: int = 100) -> List[ExecutionLog]:
+    def get_logs_with_order(self, db: Session, skip: int = 0, limit: int = 100, expand_spider: bool = False) -> List[ExecutionLog]:
         """获取执行日志列表，按开始时间倒序排列"""
-        return db.query(ExecutionLog).order_by(ExecutionLog.start_time.desc()).offset(skip).limit(limit).all()
+        return self._query(db, expand_spider).order_by(ExecutionLog.start_time.desc()).offset(skip).limit(limit).all()
+
+    def get_page(self, db: Session, *, before: Optional[Tuple[datetime, int]] = None, skip: int = 0, limit: int = 100,
+                 spider_id: Optional[int] = None, expand_spider: bool = False) -> List[ExecutionLog]:
+        """按 (开始时间, id) 倒序分页
+
+        before 为上一页最后一条记录的 (开始时间, id) 时使用游标分页，从索引直接定位，
+        不随页数变慢；否则按 skip 偏移。
+        """
+        query = self._query(db, expand_spider)
+        if spider_id is not None:
+            query = query.filter(ExecutionLog.spider_id == spider_id)
+        if before is not None:
+            start_time, log_id = before
+            # 第一个条件给出索引的扫描范围，第二个条件处理开始时间相同的记录
+            query = query.filter(
+                ExecutionLog.start_time <= start_time,
+                or_(ExecutionLog.start_time < start_time, ExecutionLog.id < log_id),
+            )
+            skip = 0
+        return query.order_by(ExecutionLog.start_time.desc(), ExecutionLog.id.desc()).offset(skip).limit(limit).all()
+
+    def count_running(self, db: Session, spider_id: int) -> int:
+        return db.query(func.count(ExecutionLog.id)).filter(
+            ExecutionLog.spider_id == spider_id, ExecutionLog.status == 'running'
+        ).scalar()
+
+    def record_status(self, db: Session, spider_id: int, status: str, message: str) -> ExecutionLog:
+        """记录一次未实际运行的触发（如被重叠策略跳过），开始和结束时间相同"""
+        now = datetime.now()
+        return self.create(db, obj_in={
+            "spider_id": spider_id, "start_time": now, "end_time": now, "status": status,
+            "error_message": message, "summary": summarize_message(message),
+        })
+
+    def mark_interrupted(self, db: Session) -> int:
+        """把没有工作节点持有的 running 日志标记为失败（服务重启前未结束的运行）"""
+        leased = db.query(RunQueueItem.execution_log_id).filter(
+            RunQueueItem.status == 'leased', RunQueueItem.execution_log_id != None
+        )
+        updated = db.query(ExecutionLog).filter(
+            ExecutionLog.status == 'running', ~ExecutionLog.id.in_(leased)
+        ).update({
+            ExecutionLog.status: 'failed',
+            ExecutionLog.end_time: datetime.now(),
+            ExecutionLog.error_message: '服务重启，运行中断',
+            ExecutionLog.summary: '服务重启，运行中断',
+        }, synchronize_session=False)
+        db.commit()
+        return updated
+
+    def average_durations(self, db: Session, since: datetime) -> Dict[int, float]:
+        """按爬虫统计 since 之后成功运行的平均耗时（秒）"""
+        duration = (func.julianday(ExecutionLog.end_time) - func.julianday(ExecutionLog.start_time)) * 86400
+        rows = db.query(ExecutionLog.spider_id, func.avg(duration)).filter(
+            ExecutionLog.status == 'success', ExecutionLog.start_time >= since, ExecutionLog.end_time != None
+        ).group_by(ExecutionLog.spider_id).all()
+        return {spider_id: avg for spider_id, avg in rows if avg is not None}
+
+    def finish(self, db: Session, log_id: int, status: str, message: Optional[str] = None) -> None:
+        """结束执行日志，message 为结束时的说明（如超时、取消原因），同时作为列表中的摘要"""
+        values = {ExecutionLog.status: status, ExecutionLog.end_time: datetime.now()}
+        if message:
+            values[ExecutionLog.error_message] = message
+            values[ExecutionLog.summary] = summarize_message(message)
+        db.query(ExecutionLog).filter(ExecutionLog.id == log_id).update(values, synchronize_session=False)
+        db.commit()
+
+    def _compress(self, log_id: int, stream: str, text: str) -> ExecutionLogChunk:
+        data = text.encode('utf-8')
+        return ExecutionLogChunk(
+            execution_log_id=log_id, stream=stream, size=len(data),
+            data=zlib.compress(data, settings.LOG_COMPRESSION_LEVEL),
+        )
+
+    def append_output(self, db: Session, log_id: int, log_content: Optional[str] = None, error_message: Optional[str] = None) -> None:
+        """把一段输出压缩后追加为新的输出块，不读取也不改写已有的输出"""
+        chunks = []
+        for stream, text in (("stdout", log_content), ("stderr", error_message)):
+            if text:
+                chunks.append(self._compress(log_id, stream, text))
+        if not chunks:
+            return
+        db.add_all(chunks)
+        db.commit()
+
+    def load_output(self, db: Session, log: ExecutionLog) -> ExecutionLog:
+        """读取完整输出填入 log.log_content 和 log.error_message
+
+        标准输出为早期版本保存在列中的内容加上各输出块；错误输出为各输出块加上结束时的说明。
+        填入的值不视为修改，不会写回数据库。每个对象只应调用一次。
+        """
+        parts = {"stdout": [log.log_content or ""], "stderr": []}
+        chunks = db.query(ExecutionLogChunk.stream, ExecutionLogChunk.data).filter(
+            ExecutionLogChunk.execution_log_id == log.id
+        ).order_by(ExecutionLogChunk.id)
+        for stream, data in chunks:
+            parts[stream].append(zlib.decompress(data).decode('utf-8'))
+        stderr = "".join(parts["stderr"])
+        if log.error_message:
+            # 结束时的说明另起一行
+            stderr += ("\n" if stderr and not stderr.endswith("\n") else "") + log.error_message
+        set_committed_value(log, "log_content", "".join(parts["stdout"]) or None)
+        set_committed_value(log, "error_message", stderr or None)
+        return log
+
+    def get_with_output(self, db: Session, log_id: int) -> Optional[ExecutionLog]:
+        """获取执行日志及其完整输出"""
+        log = self.get(db, log_id)
+        return self.load_output(db, log) if log else None
+
+    def compact_legacy_output(self, db: Session, batch_size: int = 200) -> int:
+        """把早期版本保存在列中的输出压缩后移入输出块，返回本批处理的日志数
+
+        只处理已结束且还没有输出块的日志，移动后读取到的完整输出不变。
+        """
+        has_chunks = db.query(ExecutionLogChunk.id).filter(ExecutionLogChunk.execution_log_id == ExecutionLog.id).exists()
+        logs = db.query(ExecutionLog).filter(
+            ExecutionLog.status != 'running',
+            or_(ExecutionLog.log_content != None, func.length(ExecutionLog.error_message) > self.LEGACY_MESSAGE_LENGTH),
+            ~has_chunks,
+        ).order_by(ExecutionLog.id).limit(batch_size).all()
+        for log in logs:
+            chunks = []
+            for stream, text in (("stdout", log.log_content), ("stderr", log.error_message)):
+                if text:
+                    chunks.append(self._compress(log.id, stream, text))
+            db.add_all(chunks)
+            log.summary = log.summary or summarize_message(log.error_message)
+            log.log_content = None
+            log.error_message = None
+        db.commit()
+        return len(logs)
+
+    def get_unarchived_before(self, db: Session, before: datetime, limit: int) -> List[ExecutionLog]:
+        """获取开始时间早于 before、已结束且尚未归档的日志，按开始时间顺序，同时加载资源统计"""
+        return db.query(ExecutionLog).options(selectinload(ExecutionLog.metrics)).filter(
+            ExecutionLog.start_time < before, ExecutionLog.archived_at == None, ExecutionLog.status != 'running'
+        ).order_by(ExecutionLog.start_time, ExecutionLog.id).limit(limit).all()
+
+    def mark_archived(self, db: Session, ids: List[int]) -> None:
+        """删除已归档日志的输出，只保留摘要等元数据"""
+        if not ids:
+            return
+        db.query(ExecutionLogChunk).filter(ExecutionLogChunk.execution_log_id.in_(ids)).delete(synchronize_session=False)
+        db.query(ExecutionLog).filter(ExecutionLog.id.in_(ids)).update({
+            ExecutionLog.log_content: None,
+            ExecutionLog.error_message: None,
+            ExecutionLog.archived_at: datetime.now(),
+        }, synchronize_session=False)
+        db.commit()
+
+    def delete_archived_before(self, db: Session, before: datetime, limit: int) -> int:
+        """删除一批开始时间早于 before 的已归档日志及其资源统计和运行队列记录，返回删除的条数"""
+        ids = [log_id for (log_id,) in db.query(ExecutionLog.id).filter(
+            ExecutionLog.start_time < before, ExecutionLog.archived_at != None
+        ).order_by(ExecutionLog.start_time).limit(limit)]
+        if not ids:
+            return 0
+        db.query(ExecutionMetrics).filter(ExecutionMetrics.execution_log_id.in_(ids)).delete(synchronize_session=False)
+        db.query(ExecutionLogChunk).filter(ExecutionLogChunk.execution_log_id.in_(ids)).delete(synchronize_session=False)
+        db.query(RunQueueItem).filter(RunQueueItem.execution_log_id.in_(ids)).delete(synchronize_session=False)
+        db.query(ExecutionLog).filter(ExecutionLog.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        return len(ids)
+
+
+class CRUDExecutionMetrics(CRUDBase[ExecutionMetrics]):
+    """
+    执行资源统计相关的CRUD操作
+    """
+    def get_by_log(self, db: Session, log_id: int) -> Optional[ExecutionMetrics]:
+        return db.query(ExecutionMetrics).filter(ExecutionMetrics.execution_log_id == log_id).first()
+
+    def summary_by_spider(self, db: Session, since: datetime) -> List[Dict[str, Any]]:
+        """按爬虫汇总指定时间之后的资源使用情况，用于容量规划"""
+        rows = db.query(
+            ExecutionLog.spider_id,
+            func.count(ExecutionMetrics.id),
+            func.avg(ExecutionMetrics.wall_time_seconds),
+            func.max(ExecutionMetrics.wall_time_seconds),
+            func.avg(ExecutionMetrics.cpu_user_seconds + ExecutionMetrics.cpu_system_seconds),
+            func.sum(ExecutionMetrics.cpu_user_seconds + ExecutionMetrics.cpu_system_seconds),
+            func.avg(ExecutionMetrics.peak_rss_bytes),
+            func.max(ExecutionMetrics.peak_rss_bytes),
+            func.sum(ExecutionMetrics.io_read_bytes),
+            func.sum(ExecutionMetrics.io_write_bytes),
+        ).join(ExecutionLog, ExecutionMetrics.execution_log_id == ExecutionLog.id).filter(
+            ExecutionLog.start_time >= since
+        ).group_by(ExecutionLog.spider_id).all()
+        keys = ["spider_id", "runs", "avg_wall_time_seconds", "max_wall_time_seconds", "avg_cpu_seconds",
+                "total_cpu_seconds", "avg_peak_rss_bytes", "max_peak_rss_bytes", "total_io_read_bytes", "total_io_write_bytes"]
+        return [dict(zip(keys, row)) for row in rows]
 
 
 class CRUDEnvironment(CRUDBase[Environment]):
@@ -104,6 +440,13 @@ class CRUDEnvironment(CRUDBase[Environment]):
     def get_by_user(self, db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Environment]:
         return db.query(Environment).filter(Environment.user_id == user_id).offset(skip).limit(limit).all()
 
+    def get_by_name(self, db: Session, name: str, user_id: Optional[int] = None) -> Optional[Environment]:
+        """按名称获取环境，名称不唯一时返回最早创建的一个，可按用户限定"""
+        query = db.query(Environment).filter(Environment.name == name)
+        if user_id is not None:
+            query = query.filter(Environment.user_id == user_id)
+        return query.order_by(Environment.id).first()
+
 
 class CRUDEnvironmentVariable(CRUDBase[EnvironmentVariable]):
     """
@@ -112,6 +455,52 @@ class CRUDEnvironmentVariable(CRUDBase[EnvironmentVariable]):
     def get_by_environment(self, db: Session, environment_id: int) -> List[EnvironmentVariable]:
         return db.query(EnvironmentVariable).filter(EnvironmentVariable.environment_id == environment_id).all()
 
+    def get_by_key(self, db: Session, environment_id: int, key: str) -> Optional[EnvironmentVariable]:
+        return db.query(EnvironmentVariable).filter(
+            EnvironmentVariable.environment_id == environment_id, EnvironmentVariable.key == key
+        ).first()
+
+    def iter_by_environment(self, db: Session, environment_id: int, batch_size: int = 500):
+        """按 id 顺序分批读取环境中的变量，用于导出等不需要一次加载全部数据的场景"""
+        return db.query(EnvironmentVariable).filter(
+            EnvironmentVariable.environment_id == environment_id
+        ).order_by(EnvironmentVariable.id).yield_per(batch_size)
+
+    def upsert_many(self, db: Session, environment_id: int, items: List[Dict[str, Any]]) -> Dict[str, int]:
+        """按变量名批量写入环境变量：已存在的更新，不存在的创建，在一个事务中完成
+
+        依赖 (environment_id, key) 唯一索引，已存在的变量只需一次索引查找；
+        同一批中重复的变量名以最后一条为准。
+        """
+        rows = list({item["key"]: {**item, "environment_id": environment_id} for item in items}.values())
+        if not rows:
+            return {"created": 0, "updated": 0}
+        # pysqlite 不会在 SELECT 前发送 BEGIN，先显式开始写事务，使读取最大 id 和写入之间不会插入其他写入；
+        # 已在事务中说明之前有过写入，写锁已经持有
+        connection = db.connection()
+        if not connection.connection.driver_connection.in_transaction:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        # 新插入的行 id 一定大于写入前的最大 id，据此区分 RETURNING 取回的行是创建还是更新
+        max_id = db.query(func.max(EnvironmentVariable.id)).scalar() or 0
+        written = super().upsert_many(
+            db, rows, index_elements=["environment_id", "key"], update_fields=["value", "is_secret"], returning=True
+        )
+        created = sum(1 for variable in written if variable.id > max_id)
+        return {"created": created, "updated": len(written) - created}
+
+    def get_merged_for_spider(self, db: Session, spider_id: int) -> Dict[str, str]:
+        """一次查询获取爬虫关联的所有环境中的变量并合并
+
+        同名变量的优先级：后关联的环境（SpiderEnvironment.id 较大）覆盖先关联的，
+        同一环境内 id 较大的变量覆盖 id 较小的。
+        """
+        rows = db.query(EnvironmentVariable.key, EnvironmentVariable.value).join(
+            SpiderEnvironment, SpiderEnvironment.environment_id == EnvironmentVariable.environment_id
+        ).filter(SpiderEnvironment.spider_id == spider_id).order_by(
+            SpiderEnvironment.id, EnvironmentVariable.id
+        ).all()
+        return {key: value for key, value in rows}
+
 
 class CRUDSpiderEnvironment(CRUDBase[SpiderEnvironment]):
     """
@@ -123,12 +512,132 @@ class CRUDSpiderEnvironment(CRUDBase[SpiderEnvironment]):
     def get_by_environment(self, db: Session, environment_id: int) -> List[SpiderEnvironment]:
         return db.query(SpiderEnvironment).filter(SpiderEnvironment.environment_id == environment_id).all()
 
+    def get_by_spider_and_environment(self, db: Session, spider_id: int, environment_id: int) -> Optional[SpiderEnvironment]:
+        return db.query(SpiderEnvironment).filter(
+            SpiderEnvironment.spider_id == spider_id, SpiderEnvironment.environment_id == environment_id
+        ).first()
+
+
+class CRUDRunQueue(CRUDBase[RunQueueItem]):
+    """
+    运行队列相关的CRUD操作，工作节点通过限时租约领取运行任务
+    """
+    def enqueue(self, db: Session, spider_id: int, schedule_id: Optional[int] = None, priority: int = 1) -> RunQueueItem:
+        return self.create(db, obj_in={
+            "spider_id": spider_id, "schedule_id": schedule_id, "status": "pending", "priority": priority,
+            "enqueued_at": datetime.now()
+        })
+
+    def get_by_log(self, db: Session, log_id: int) -> Optional[RunQueueItem]:
+        return db.query(RunQueueItem).filter(RunQueueItem.execution_log_id == log_id).first()
+
+    def request_cancel(self, db: Session, item_id: int) -> None:
+        db.query(RunQueueItem).filter(RunQueueItem.id == item_id).update(
+            {RunQueueItem.cancel_requested: True}, synchronize_session=False
+        )
+        db.commit()
+
+    def get_cancel_requested(self, db: Session, owner: str, ids: List[int]) -> List[RunQueueItem]:
+        """获取本节点持有的、已被请求取消的任务"""
+        if not ids:
+            return []
+        return db.query(RunQueueItem).filter(
+            RunQueueItem.id.in_(ids), RunQueueItem.lease_owner == owner, RunQueueItem.cancel_requested == True
+        ).all()
+
+    def claim(self, db: Session, owner: str, lease_seconds: int, limit: int) -> List[RunQueueItem]:
+        """领取待执行或租约已过期的任务，优先领取高优先级的任务，通过带条件的 UPDATE 保证同一任务只被一个节点领取"""
+        now = datetime.now()
+        available = (RunQueueItem.status == 'pending') | (
+            (RunQueueItem.status == 'leased') & (RunQueueItem.lease_expires_at < now)
+        )
+        candidates = db.query(RunQueueItem.id).filter(available).order_by(
+            RunQueueItem.priority.desc(), RunQueueItem.enqueued_at, RunQueueItem.id
+        ).limit(limit).all()
+
+        claimed_ids = []
+        for (item_id,) in candidates:
+            updated = db.query(RunQueueItem).filter(RunQueueItem.id == item_id, available).update({
+                RunQueueItem.status: 'leased',
+                RunQueueItem.lease_owner: owner,
+                RunQueueItem.lease_expires_at: now + timedelta(seconds=lease_seconds),
+                RunQueueItem.heartbeat_at: now,
+                RunQueueItem.attempts: func.coalesce(RunQueueItem.attempts, 0) + 1,
+            }, synchronize_session=False)
+            if updated:
+                claimed_ids.append(item_id)
+        db.commit()
+        if not claimed_ids:
+            return []
+        return db.query(RunQueueItem).filter(RunQueueItem.id.in_(claimed_ids)).order_by(RunQueueItem.id).all()
+
+    def heartbeat(self, db: Session, owner: str, ids: List[int], lease_seconds: int) -> int:
+        """延长本节点持有的租约"""
+        if not ids:
+            return 0
+        now = datetime.now()
+        updated = db.query(RunQueueItem).filter(
+            RunQueueItem.id.in_(ids), RunQueueItem.lease_owner == owner, RunQueueItem.status == 'leased'
+        ).update({
+            RunQueueItem.lease_expires_at: now + timedelta(seconds=lease_seconds),
+            RunQueueItem.heartbeat_at: now,
+        }, synchronize_session=False)
+        db.commit()
+        return updated
+
+    def attach_log(self, db: Session, item_id: int, log_id: int) -> None:
+        db.query(RunQueueItem).filter(RunQueueItem.id == item_id).update(
+            {RunQueueItem.execution_log_id: log_id}, synchronize_session=False
+        )
+        db.commit()
+
+    def complete(self, db: Session, item_id: int, status: str) -> None:
+        db.query(RunQueueItem).filter(RunQueueItem.id == item_id).update({
+            RunQueueItem.status: status,
+            RunQueueItem.finished_at: datetime.now(),
+            RunQueueItem.lease_expires_at: None,
+        }, synchronize_session=False)
+        db.commit()
+
+    def count_active(self, db: Session, spider_id: int) -> int:
+        """统计爬虫在队列中待执行或执行中的任务数"""
+        return db.query(func.count(RunQueueItem.id)).filter(
+            RunQueueItem.spider_id == spider_id, RunQueueItem.status.in_(['pending', 'leased'])
+        ).scalar()
+
+    def count_by_status(self, db: Session) -> Dict[str, int]:
+        rows = db.query(RunQueueItem.status, func.count(RunQueueItem.id)).filter(
+            RunQueueItem.status.in_(['pending', 'leased'])
+        ).group_by(RunQueueItem.status).all()
+        return {status: count for status, count in rows}
+
+
+
+class CRUDCounter(CRUDBase[Counter]):
+    """
+    表行数计数，由数据库触发器在写入数据的同一事务中维护，读取是一次主键查找
+    """
+    def get_value(self, db: Session, table_name: str, key: str = "total") -> int:
+        value = db.query(Counter.value).filter(Counter.table_name == table_name, Counter.key == key).scalar()
+        return value or 0
+
+    def get_breakdown(self, db: Session, table_name: str, column: str) -> Dict[str, int]:
+        """按分组列的取值获取计数，不包括计数为 0 的取值"""
+        prefix = f"{column}:"
+        rows = db.query(Counter.key, Counter.value).filter(
+            Counter.table_name == table_name, Counter.key.startswith(prefix, autoescape=True), Counter.value != 0
+        ).all()
+        return {key[len(prefix):]: value for key, value in rows}
+
 
 # 实例化CRUD对象
 user_crud = CRUDUser(User)
 spider_crud = CRUDSpider(Spider)
 schedule_crud = CRUDSchedule(Schedule)
 execution_log_crud = CRUDExecutionLog(ExecutionLog)
+execution_metrics_crud = CRUDExecutionMetrics(ExecutionMetrics)
 environment_crud = CRUDEnvironment(Environment)
 environment_variable_crud = CRUDEnvironmentVariable(EnvironmentVariable)
-spider_environment_crud = CRUDSpiderEnvironment(SpiderEnvironment)
\ No newline at end of file
+spider_environment_crud = CRUDSpiderEnvironment(SpiderEnvironment)
+run_queue_crud = CRUDRunQueue(RunQueueItem)
+counter_crud = CRUDCounter(Counter)
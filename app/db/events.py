@@ -0,0 +1,123 @@
+"""
+数据变更事件
+
+在 Session 提交时收集调度任务、爬虫和环境配置的增删改，提交成功后一次性通知订阅者。
+通过 ORM 对象修改的数据在 flush 时自动记录；批量 UPDATE/DELETE 不经过 flush，
+需要调用 record_change 手动记录。回滚时丢弃未提交的事件。
+"""
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models import Schedule, Spider, Environment, EnvironmentVariable, SpiderEnvironment
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "pending_change_events"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """一次数据变更"""
+    kind: str  # 'schedule'、'spider' 或 'environment'
+    id: int  # 调度任务、爬虫或环境的ID
+    op: str  # 'upsert' 或 'delete'
+    spider_id: Optional[int] = None  # 调度任务或环境关联所属的爬虫ID，删除后仍可据此定位受影响的爬虫
+
+
+class ChangeBus:
+    """变更事件的订阅和分发，订阅者在提交事务的线程中被调用，应尽快返回"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[List[ChangeEvent]], None]] = []
+
+    def subscribe(self, callback: Callable[[List[ChangeEvent]], None]):
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[List[ChangeEvent]], None]):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def publish(self, events: List[ChangeEvent]):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(events)
+            except Exception as e:
+                logger.error(f"分发数据变更事件失败: {str(e)}")
+
+
+change_bus = ChangeBus()
+
+
+def _event_for(obj, op: str) -> Optional[ChangeEvent]:
+    if isinstance(obj, Schedule):
+        return ChangeEvent("schedule", obj.id, op, obj.spider_id)
+    if isinstance(obj, Spider):
+        return ChangeEvent("spider", obj.id, op)
+    if isinstance(obj, Environment):
+        return ChangeEvent("environment", obj.id, op)
+    if isinstance(obj, EnvironmentVariable):
+        return ChangeEvent("environment", obj.environment_id, op)
+    if isinstance(obj, SpiderEnvironment):
+        return ChangeEvent("environment", obj.environment_id, op, obj.spider_id)
+    return None
+
+
+def tracks_changes(model) -> bool:
+    """该模型的增删改是否产生数据变更事件"""
+    return model in (Schedule, Spider, Environment, EnvironmentVariable, SpiderEnvironment)
+
+
+def record_change(db: Session, kind: str, ids, op: str = "upsert", spider_id: Optional[int] = None):
+    """手动记录批量语句产生的变更，随当前事务提交后发布"""
+    pending = db.info.setdefault(PENDING_KEY, [])
+    pending.extend(ChangeEvent(kind, item_id, op, spider_id) for item_id in ids)
+
+
+def record_objects(db: Session, objs, op: str = "upsert"):
+    """记录批量语句通过 RETURNING 取回的对象产生的变更，随当前事务提交后发布"""
+    pending = db.info.setdefault(PENDING_KEY, [])
+    for obj in objs:
+        change = _event_for(obj, op)
+        if change:
+            pending.append(change)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    pending = session.info.setdefault(PENDING_KEY, [])
+    for obj in session.new:
+        change = _event_for(obj, "upsert")
+        if change:
+            pending.append(change)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            change = _event_for(obj, "upsert")
+            if change:
+                pending.append(change)
+    for obj in session.deleted:
+        change = _event_for(obj, "delete")
+        if change:
+            pending.append(change)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        # 去重并保持顺序，同一对象在一个事务中多次修改只通知一次
+        change_bus.publish(list(dict.fromkeys(pending)))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop(PENDING_KEY, None)
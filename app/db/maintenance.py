@@ -0,0 +1,243 @@
+"""
+数据库维护命令
+
+用法:
+    python -m app.db.maintenance check-plans          检查常用查询的执行计划是否使用了预期的索引
+    python -m app.db.maintenance check-queries        检查列表接口序列化一页数据发出的查询条数
+    python -m app.db.maintenance reconcile-counters   按实际行数修正计数表
+    python -m app.db.maintenance compact-logs [--vacuum]
+                                                      把早期版本保存在列中的执行日志输出压缩后移入输出块
+    python -m app.db.maintenance retention [--full-days N] [--summary-days N]
+                                                      按保留策略归档和删除旧的执行日志
+    python -m app.db.maintenance vacuum               重写数据库文件，归还空闲空间并应用 auto_vacuum 设置
+"""
+import argparse
+import logging
+import sys
+from datetime import datetime
+from typing import Callable, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+
+from app.db.crud import execution_log_crud, schedule_crud, spider_environment_crud, environment_variable_crud
+from app.models import ExecutionLog
+from app.schemas.execution_log import ExecutionLogSummary
+from app.models.counter import reconcile_counters
+from app.models.database import init_db, get_db_session, engine
+from app.services.log_retention import LogRetention
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# (说明, 执行查询的函数, 执行计划中至少应出现其中之一的索引)
+PLAN_CHECKS: List[Tuple[str, Callable, Set[str]]] = [
+    ("最近的执行日志", lambda db: execution_log_crud.get_logs_with_order(db, limit=5),
+     {"ix_execution_logs_start_time"}),
+    ("爬虫的执行日志", lambda db: execution_log_crud.get_by_spider(db, 1, limit=5),
+     {"ix_execution_logs_spider_start"}),
+    ("执行日志游标翻页", lambda db: execution_log_crud.get_page(db, before=(datetime.now(), 1), limit=20),
+     {"ix_execution_logs_start_time"}),
+    ("爬虫的执行日志游标翻页", lambda db: execution_log_crud.get_page(db, before=(datetime.now(), 1), limit=20, spider_id=1),
+     {"ix_execution_logs_spider_start"}),
+    ("执行日志的输出块", lambda db: execution_log_crud.load_output(db, ExecutionLog(id=1)),
+     {"ix_execution_log_chunks_log"}),
+    ("爬虫运行中的日志数", lambda db: execution_log_crud.count_running(db, 1),
+     {"ix_execution_logs_status_spider"}),
+    ("爬虫的调度任务", lambda db: schedule_crud.get_by_spider(db, 1),
+     {"ix_schedules_spider_active"}),
+    ("活跃的调度任务", lambda db: schedule_crud.get_active_with_spider(db),
+     {"ix_schedules_active_spider", "ix_schedules_spider_active"}),
+    ("爬虫关联的环境", lambda db: spider_environment_crud.get_by_spider(db, 1),
+     {"ix_spider_environments_spider_environment"}),
+    ("爬虫合并后的环境变量", lambda db: environment_variable_crud.get_merged_for_spider(db, 1),
+     {"ix_spider_environments_spider_environment"}),
+    ("按变量名读取环境变量", lambda db: environment_variable_crud.get_by_key(db, 1, "KEY"),
+     {"ix_environment_variables_environment_key"}),
+]
+
+
+def serialize_logs(logs) -> list:
+    """按列表接口的响应模型序列化执行日志（与 FastAPI 返回响应时一样读取 ORM 对象的属性）"""
+    return [ExecutionLogSummary.model_validate(log, from_attributes=True).model_dump() for log in logs]
+
+
+# (说明, 查询并序列化一页数据的函数, 允许的最多查询条数)，查询条数不应随每页条数增加
+QUERY_COUNT_CHECKS: List[Tuple[str, Callable, int]] = [
+    ("执行日志列表", lambda db: serialize_logs(execution_log_crud.get_page(db, limit=100)), 1),
+    ("执行日志列表（展开爬虫）", lambda db: serialize_logs(execution_log_crud.get_page(db, limit=100, expand_spider=True)), 2),
+    ("爬虫的执行日志（展开爬虫）",
+     lambda db: serialize_logs(execution_log_crud.get_by_spider(db, 1, limit=100, expand_spider=True)), 2),
+]
+
+
+def capture_statements(db, query: Callable) -> List[Tuple[str, tuple]]:
+    """执行查询函数并记录其发出的 SQL 语句和参数"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        query(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def explain(db, statement: str, parameters) -> List[str]:
+    """获取语句的执行计划（EXPLAIN QUERY PLAN 的 detail 列）"""
+    connection = db.connection().connection.driver_connection
+    cursor = connection.cursor()
+    try:
+        rows = cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+    finally:
+        cursor.close()
+    return [row[-1] for row in rows]
+
+
+def check_plans() -> bool:
+    """检查常用查询是否使用了预期的索引，返回是否全部通过"""
+    if engine.dialect.name != "sqlite":
+        logger.error("执行计划检查只支持 SQLite")
+        return False
+
+    db = get_db_session()
+    passed = True
+    try:
+        for name, query, expected in PLAN_CHECKS:
+            plan = []
+            for statement, parameters in capture_statements(db, query):
+                plan.extend(explain(db, statement, parameters))
+            used = {index for index in expected if any(f"INDEX {index}" in line for line in plan)}
+            ok = bool(used)
+            passed = passed and ok
+            print(f"[{'通过' if ok else '失败'}] {name}")
+            for line in plan:
+                print(f"    {line}")
+            if not ok:
+                print(f"    未使用预期的索引: {', '.join(sorted(expected))}")
+    finally:
+        db.rollback()
+        db.close()
+    return passed
+
+
+def check_queries() -> bool:
+    """检查列表数据序列化时发出的查询条数，返回是否全部通过"""
+    db = get_db_session()
+    passed = True
+    try:
+        for name, query, max_statements in QUERY_COUNT_CHECKS:
+            statements = capture_statements(db, query)
+            ok = len(statements) <= max_statements
+            passed = passed and ok
+            print(f"[{'通过' if ok else '失败'}] {name}: {len(statements)} 条查询（最多 {max_statements} 条）")
+            if not ok:
+                for statement, _ in statements:
+                    print(f"    {' '.join(statement.split())[:200]}")
+            # 每项检查都从空的会话开始，不复用上一项已加载的对象
+            db.expunge_all()
+    finally:
+        db.rollback()
+        db.close()
+    return passed
+
+
+def reconcile() -> int:
+    """按实际行数修正计数表，返回修正的计数个数"""
+    with engine.begin() as conn:
+        drift = reconcile_counters(conn)
+    for (table, key), (stored, actual) in sorted(drift.items()):
+        print(f"{table} {key}: {stored} -> {actual}")
+    print(f"已修正 {len(drift)} 个计数" if drift else "计数与实际行数一致")
+    return len(drift)
+
+
+def compact_logs(batch_size: int = 200, vacuum: bool = False) -> int:
+    """分批把早期版本保存在列中的执行日志输出移入压缩的输出块，返回处理的日志数
+
+    每批单独提交，不会长时间持有写锁。删除的内容所占的页面留在数据库文件中供之后复用，
+    vacuum 为 True 时执行 VACUUM 把空间归还给文件系统（会重写整个数据库文件）。
+    """
+    total = 0
+    db = get_db_session()
+    try:
+        while True:
+            count = execution_log_crud.compact_legacy_output(db, batch_size=batch_size)
+            if not count:
+                break
+            total += count
+            logger.info(f"已整理 {total} 条执行日志")
+    finally:
+        db.close()
+
+    if vacuum:
+        vacuum_database()
+    print(f"共整理 {total} 条执行日志")
+    return total
+
+
+def vacuum_database() -> int:
+    """执行 VACUUM 重写整个数据库文件，返回文件缩小的字节数
+
+    同时应用连接上设置的 auto_vacuum 模式。期间数据库不可写，且需要与数据库大小相当的临时空间。
+    """
+    if engine.dialect.name != "sqlite":
+        logger.error("VACUUM 只支持 SQLite")
+        return 0
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        before = conn.exec_driver_sql("PRAGMA page_count").scalar() * conn.exec_driver_sql("PRAGMA page_size").scalar()
+        conn.exec_driver_sql("VACUUM")
+        after = conn.exec_driver_sql("PRAGMA page_count").scalar() * conn.exec_driver_sql("PRAGMA page_size").scalar()
+    print(f"数据库大小: {before} -> {after} 字节")
+    return before - after
+
+
+def run_retention(full_days: Optional[int] = None, summary_days: Optional[int] = None) -> dict:
+    """按保留策略归档和删除旧的执行日志，参数为空时使用配置"""
+    retention = LogRetention(full_days=full_days, summary_days=summary_days)
+    if not retention.enabled:
+        print("未配置保留天数（LOG_RETENTION_FULL_DAYS / LOG_RETENTION_SUMMARY_DAYS），不做处理")
+        return {}
+    report = retention.run()
+    print(
+        f"归档 {report['archived']} 条，删除 {report['deleted']} 条，"
+        f"归还 {report['reclaimed_bytes']} 字节，剩余可复用空间 {report['free_bytes']} 字节"
+    )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库维护命令")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("check-plans", help="检查常用查询的执行计划是否使用了预期的索引")
+    subparsers.add_parser("check-queries", help="检查列表接口序列化一页数据发出的查询条数")
+    subparsers.add_parser("reconcile-counters", help="按实际行数修正计数表")
+    compact_parser = subparsers.add_parser("compact-logs", help="把早期版本保存在列中的执行日志输出压缩后移入输出块")
+    compact_parser.add_argument("--batch-size", type=int, default=200, help="每批处理的日志数")
+    compact_parser.add_argument("--vacuum", action="store_true", help="整理后执行 VACUUM 缩小数据库文件")
+    retention_parser = subparsers.add_parser("retention", help="按保留策略归档和删除旧的执行日志")
+    retention_parser.add_argument("--full-days", type=int, help="保留完整输出的天数，默认使用配置")
+    retention_parser.add_argument("--summary-days", type=int, help="保留摘要的天数，默认使用配置")
+    subparsers.add_parser("vacuum", help="重写数据库文件，归还空闲空间并应用 auto_vacuum 设置")
+    args = parser.parse_args()
+
+    # 确保已有数据库完成迁移（补齐列和索引）
+    init_db()
+    if args.command == "check-plans":
+        sys.exit(0 if check_plans() else 1)
+    elif args.command == "check-queries":
+        sys.exit(0 if check_queries() else 1)
+    elif args.command == "reconcile-counters":
+        reconcile()
+    elif args.command == "compact-logs":
+        compact_logs(args.batch_size, args.vacuum)
+    elif args.command == "retention":
+        run_retention(args.full_days, args.summary_days)
+    elif args.command == "vacuum":
+        vacuum_database()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,11 @@ from .base import Base
 from .user import User
 from .spider import Spider
 from .schedule import Schedule
-from .execution_log import ExecutionLog
+from .execution_log import ExecutionLog, ExecutionLogChunk
+from .execution_metrics import ExecutionMetrics
 from .environment import Environment, EnvironmentVariable, SpiderEnvironment
+from .run_queue import RunQueueItem
+from .counter import Counter
 from .database import init_db, get_db_session, get_db
 
 # 导出所有模型，方便导入
@@ -13,9 +16,13 @@ __all__ = [
     'Spider',
     'Schedule',
     'ExecutionLog',
+    'ExecutionLogChunk',
+    'ExecutionMetrics',
     'Environment',
     'EnvironmentVariable',
     'SpiderEnvironment',
+    'RunQueueItem',
+    'Counter',
     'init_db',
     'get_db_session',
     'get_db'
@@ -0,0 +1,106 @@
+from sqlalchemy import Column, Integer, String, text
+from .base import Base
+
+# 维护计数的表及其分组列，每个表都有 total 计数，每个分组列按取值计数（键为 "列名:取值"）
+COUNTED_TABLES = {
+    'execution_logs': ('status', 'spider_id'),
+    'spiders': ('is_active',),
+    'schedules': ('is_active', 'spider_id'),
+}
+
+
+class Counter(Base):
+    """表行数计数，由数据库触发器在写入数据的同一事务中维护"""
+    __tablename__ = 'counters'
+
+    table_name = Column(String(50), primary_key=True)
+    key = Column(String(100), primary_key=True)  # 'total' 或 '列名:取值'
+    value = Column(Integer, nullable=False, default=0)
+
+
+def _adjust(table: str, key_expr: str, delta: str) -> str:
+    # 先确保计数行存在再更新（不依赖较新 SQLite 才支持的 UPSERT）；取值为 NULL 的行不计入分组
+    return (
+        f"INSERT OR IGNORE INTO counters (table_name, key, value) SELECT '{table}', {key_expr}, 0 WHERE {key_expr} IS NOT NULL;\n"
+        f"  UPDATE counters SET value = value {delta} 1 WHERE table_name = '{table}' AND key = {key_expr};"
+    )
+
+
+def _key_expr(column: str, row: str) -> str:
+    return f"'{column}:' || {row}.{column}"
+
+
+def counter_trigger_ddl():
+    """生成维护计数的触发器，返回 (触发器名, 建立语句) 列表"""
+    triggers = []
+    for table, columns in COUNTED_TABLES.items():
+        insert_body = [_adjust(table, "'total'", "+")] + [_adjust(table, _key_expr(c, "NEW"), "+") for c in columns]
+        delete_body = [_adjust(table, "'total'", "-")] + [_adjust(table, _key_expr(c, "OLD"), "-") for c in columns]
+        triggers.append((
+            f"counters_{table}_insert",
+            f"CREATE TRIGGER counters_{table}_insert AFTER INSERT ON {table} BEGIN\n  " + "\n  ".join(insert_body) + "\nEND",
+        ))
+        triggers.append((
+            f"counters_{table}_delete",
+            f"CREATE TRIGGER counters_{table}_delete AFTER DELETE ON {table} BEGIN\n  " + "\n  ".join(delete_body) + "\nEND",
+        ))
+        for column in columns:
+            # 只在分组列确实改变时触发，追加日志内容等其他更新不产生额外写入
+            body = [_adjust(table, _key_expr(column, "OLD"), "-"), _adjust(table, _key_expr(column, "NEW"), "+")]
+            triggers.append((
+                f"counters_{table}_update_{column}",
+                f"CREATE TRIGGER counters_{table}_update_{column} AFTER UPDATE OF {column} ON {table} "
+                f"WHEN OLD.{column} IS NOT NEW.{column} BEGIN\n  " + "\n  ".join(body) + "\nEND",
+            ))
+    return triggers
+
+
+def install_counter_triggers(conn) -> bool:
+    """创建缺少的计数触发器，有新建的触发器时重新统计计数并返回 True"""
+    existing = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'"))}
+    created = False
+    for name, ddl in counter_trigger_ddl():
+        if name not in existing:
+            conn.execute(text(ddl))
+            created = True
+    if created:
+        reconcile_counters(conn)
+    return created
+
+
+def actual_counts(conn):
+    """直接统计各表的实际行数，返回 {(表名, 键): 行数}"""
+    counts = {}
+    for table, columns in COUNTED_TABLES.items():
+        counts[(table, 'total')] = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+        for column in columns:
+            rows = conn.execute(text(
+                f"SELECT {column}, COUNT(*) FROM {table} WHERE {column} IS NOT NULL GROUP BY {column}"
+            ))
+            for value, count in rows:
+                counts[(table, f"{column}:{value}")] = count
+    return counts
+
+
+def reconcile_counters(conn):
+    """按实际行数修正计数，返回修正前后不一致的 {(表名, 键): (计数, 实际行数)}"""
+    # 先执行一次写操作取得写锁，统计期间其他连接的写入无法提交，统计结果与计数一致
+    conn.execute(text("UPDATE counters SET value = value WHERE 0"))
+    actual = actual_counts(conn)
+    stored = {
+        (table, key): value
+        for table, key, value in conn.execute(text("SELECT table_name, key, value FROM counters"))
+    }
+    drift = {}
+    for counter_key in stored.keys() | actual.keys():
+        stored_value, actual_value = stored.get(counter_key, 0), actual.get(counter_key, 0)
+        if stored_value != actual_value:
+            drift[counter_key] = (stored_value, actual_value)
+
+    conn.execute(text("DELETE FROM counters"))
+    for (table, key), value in actual.items():
+        conn.execute(
+            text("INSERT INTO counters (table_name, key, value) VALUES (:table, :key, :value)"),
+            {"table": table, "key": key, "value": value},
+        )
+    return drift
@@ -1,21 +1,118 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, Session
+import logging
 import os
+from app.core.config import settings
 from .base import Base
+from .counter import install_counter_triggers
+
+logger = logging.getLogger(__name__)
 
 # 数据库URL
-DATABASE_URL = "sqlite:///spider_manager.db"
+DATABASE_URL = settings.DATABASE_URL
+
+
+def _create_engine(url: str):
+    """创建数据库引擎，SQLite 连接允许跨线程使用（每个会话同一时间只在一个线程中使用）"""
+    database_url = make_url(url)
+    pool_args = {"pool_size": settings.DATABASE_POOL_SIZE, "max_overflow": settings.DATABASE_MAX_OVERFLOW}
+    if database_url.get_backend_name() != "sqlite":
+        return create_engine(url, pool_pre_ping=True, **pool_args)
+
+    if database_url.database in (None, "", ":memory:"):
+        # 内存数据库每个连接都是独立的库，使用 SQLAlchemy 默认的单连接池
+        pool_args = {}
+    sqlite_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000},
+        **pool_args,
+    )
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            # auto_vacuum 只对新建的数据库或之后执行 VACUUM 时生效，需要在建表之前设置
+            cursor.execute(f"PRAGMA auto_vacuum={settings.SQLITE_AUTO_VACUUM}")
+            cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+            cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+            cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+            cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        finally:
+            cursor.close()
+
+    return sqlite_engine
+
 
 # 创建数据库引擎
-engine = create_engine(DATABASE_URL)
+engine = _create_engine(DATABASE_URL)
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
 def init_db():
-    """初始化数据库，创建所有表"""
+    """初始化数据库，创建所有表、补齐已有表缺少的列和索引，并安装计数触发器"""
     Base.metadata.create_all(bind=engine)
+    migrate_db()
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            if install_counter_triggers(conn):
+                logger.info("已创建计数触发器并完成计数统计")
+    else:
+        logger.warning("计数触发器只支持 SQLite，计数接口的结果不会更新")
+
+
+def _column_default_sql(column):
+    """把模型中的简单默认值转换为 SQL 默认值，使已有数据行获得相同的默认值"""
+    default = column.default
+    if default is None or not default.is_scalar:
+        return ""
+    value = default.arg
+    if isinstance(value, bool):
+        return f" DEFAULT {int(value)}"
+    if isinstance(value, (int, float)):
+        return f" DEFAULT {value}"
+    if isinstance(value, str):
+        return " DEFAULT '{}'".format(value.replace("'", "''"))
+    return ""
+
+
+def _dedupe_environment_variables(conn):
+    """删除同一环境中重复的变量名，只保留最后写入（id 最大）的一条，以便建立唯一索引"""
+    conn.execute(text(
+        "DELETE FROM environment_variables WHERE id NOT IN "
+        "(SELECT MAX(id) FROM environment_variables GROUP BY environment_id, key)"
+    ))
+
+
+def migrate_db():
+    """为已有数据库补齐模型中新增的列和索引（create_all 不会修改已存在的表）"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}{_column_default_sql(column)}'
+                ))
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                if table.name == "environment_variables" and index.unique:
+                    _dedupe_environment_variables(conn)
+                # 数据量大时建索引需要一些时间
+                logger.info(f"正在创建索引 {index.name}")
+                index.create(conn)
 
 
 def get_db_session():
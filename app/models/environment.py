@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .base import Base
@@ -6,6 +6,9 @@ from .base import Base
 
 class Environment(Base):
     __tablename__ = 'environments'
+    __table_args__ = (
+        Index('ix_environments_name_user', 'name', 'user_id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
@@ -22,6 +25,10 @@ class Environment(Base):
 
 class EnvironmentVariable(Base):
     __tablename__ = 'environment_variables'
+    __table_args__ = (
+        # 同一环境内变量名唯一，按变量名读取和批量写入都走该索引
+        Index('ix_environment_variables_environment_key', 'environment_id', 'key', unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     environment_id = Column(Integer, ForeignKey('environments.id'))
@@ -35,6 +42,11 @@ class EnvironmentVariable(Base):
 
 class SpiderEnvironment(Base):
     __tablename__ = 'spider_environments'
+    __table_args__ = (
+        # 按爬虫查找关联的环境，以及合并爬虫环境变量时的连接
+        Index('ix_spider_environments_spider_environment', 'spider_id', 'environment_id'),
+        Index('ix_spider_environments_environment', 'environment_id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     spider_id = Column(Integer, ForeignKey('spiders.id'))
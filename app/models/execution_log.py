@@ -1,19 +1,46 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index, LargeBinary
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from .base import Base
 
 
 class ExecutionLog(Base):
     __tablename__ = 'execution_logs'
+    __table_args__ = (
+        # 全部日志按开始时间倒序分页（看板的最近运行）
+        Index('ix_execution_logs_start_time', 'start_time'),
+        # 单个爬虫的日志按开始时间倒序分页
+        Index('ix_execution_logs_spider_start', 'spider_id', 'start_time'),
+        # 按状态查找运行中的日志（重叠策略检查、重启后标记中断）
+        Index('ix_execution_logs_status_spider', 'status', 'spider_id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     spider_id = Column(Integer, ForeignKey('spiders.id'))
     start_time = Column(DateTime, nullable=False)
     end_time = Column(DateTime, nullable=True)
-    status = Column(String(20), nullable=False)  # 'success', 'failed', 'running'
-    log_content = Column(Text, nullable=True)
-    error_message = Column(Text, nullable=True)
+    status = Column(String(20), nullable=False)  # 'success', 'failed', 'running', 'timeout', 'cancelled', 'skipped', 'coalesced'
+    # 输出内容不随日志行加载，需要时通过 execution_log_crud.load_output 读取；
+    # 运行输出压缩后保存在 execution_log_chunks 中，这两列只保存早期版本写入的输出和结束时的说明
+    log_content = deferred(Column(Text, nullable=True))
+    error_message = deferred(Column(Text, nullable=True))
+    summary = Column(String(255), nullable=True)  # 列表中显示的简短说明，如失败原因
+    archived_at = Column(DateTime, nullable=True)  # 输出归档并从数据库删除的时间，之后只保留摘要
 
     # 关联关系
-    spider = relationship('Spider', back_populates='execution_logs')
\ No newline at end of file
+    spider = relationship('Spider', back_populates='execution_logs')
+    metrics = relationship('ExecutionMetrics', back_populates='execution_log', uselist=False)
+
+
+class ExecutionLogChunk(Base):
+    """执行日志的一段输出，每次写入追加一块，按 id 顺序拼接得到完整输出"""
+    __tablename__ = 'execution_log_chunks'
+    __table_args__ = (
+        Index('ix_execution_log_chunks_log', 'execution_log_id', 'id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    execution_log_id = Column(Integer, ForeignKey('execution_logs.id'), nullable=False)
+    stream = Column(String(10), nullable=False)  # 'stdout' 或 'stderr'
+    data = Column(LargeBinary, nullable=False)  # zlib 压缩的 UTF-8 文本
+    size = Column(Integer, nullable=False)  # 压缩前的字节数
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, Float, BigInteger, ForeignKey
+from sqlalchemy.orm import relationship
+from .base import Base
+
+
+class ExecutionMetrics(Base):
+    __tablename__ = 'execution_metrics'
+
+    id = Column(Integer, primary_key=True, index=True)
+    execution_log_id = Column(Integer, ForeignKey('execution_logs.id'), unique=True, index=True)
+    wall_time_seconds = Column(Float, nullable=True)
+    cpu_user_seconds = Column(Float, nullable=True)
+    cpu_system_seconds = Column(Float, nullable=True)
+    peak_rss_bytes = Column(BigInteger, nullable=True)  # 整个进程树（含浏览器子进程）的RSS峰值
+    peak_process_count = Column(Integer, nullable=True)
+    io_read_bytes = Column(BigInteger, nullable=True)
+    io_write_bytes = Column(BigInteger, nullable=True)
+    sample_count = Column(Integer, nullable=True)
+
+    # 关联关系
+    execution_log = relationship('ExecutionLog', back_populates='metrics')
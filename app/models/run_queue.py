@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from .base import Base
+
+
+class RunQueueItem(Base):
+    __tablename__ = 'run_queue'
+
+    id = Column(Integer, primary_key=True, index=True)
+    spider_id = Column(Integer, ForeignKey('spiders.id'))
+    schedule_id = Column(Integer, ForeignKey('schedules.id'), nullable=True)
+    execution_log_id = Column(Integer, ForeignKey('execution_logs.id'), nullable=True)
+    status = Column(String(20), nullable=False, default='pending')  # 'pending', 'leased', 'done', 'failed'
+    priority = Column(Integer, default=1)  # 优先级，数值越大越先被领取
+    enqueued_at = Column(DateTime, default=datetime.now)
+    lease_owner = Column(String(100), nullable=True)  # 持有租约的工作节点
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0)
+    cancel_requested = Column(Boolean, default=False)  # 由持有租约的工作节点在心跳时检查
+    finished_at = Column(DateTime, nullable=True)
+
+    # 关联关系
+    spider = relationship('Spider')
+    execution_log = relationship('ExecutionLog')
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .base import Base
@@ -6,11 +6,23 @@ from .base import Base
 
 class Schedule(Base):
     __tablename__ = 'schedules'
+    __table_args__ = (
+        # 按爬虫查找调度任务，以及停用爬虫时停用其活跃的调度任务
+        Index('ix_schedules_spider_active', 'spider_id', 'is_active'),
+        # 调度器启动时加载所有活跃的调度任务
+        Index('ix_schedules_active_spider', 'is_active', 'spider_id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     spider_id = Column(Integer, ForeignKey('spiders.id'))
     cron_expression = Column(String(100), nullable=False)  # cron表达式
     is_active = Column(Boolean, default=True)
+    misfire_grace_time = Column(Integer, nullable=True)  # 错过触发时间后允许补跑的秒数，为空时使用全局配置
+    coalesce = Column(Boolean, default=True)  # 错过多次触发时是否只补跑一次
+    max_instances = Column(Integer, default=1)  # 同一调度任务允许同时触发的实例数
+    timeout_seconds = Column(Integer, nullable=True)  # 由该调度触发的运行的超时时间，优先于爬虫配置
+    spread_seconds = Column(Integer, nullable=True)  # 错峰窗口秒数，按调度ID确定性地后移启动时间，为空时使用全局配置
+    priority = Column(String(10), nullable=True)  # 由该调度触发的运行的优先级类别，为空时使用爬虫配置
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
@@ -11,6 +11,9 @@ class Spider(Base):
     description = Column(Text, nullable=True)
     script_path = Column(String(255), nullable=False)  # 爬虫脚本的路径
     is_active = Column(Boolean, default=True)
+    timeout_seconds = Column(Integer, nullable=True)  # 单次运行的超时时间，为空时使用全局配置
+    priority = Column(String(10), default='normal')  # 优先级类别：'high', 'normal', 'low'
+    overlap_policy = Column(String(20), default='allow')  # 上一次运行未结束时的触发策略：'allow', 'skip', 'queue_one', 'coalesce'
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
     user_id = Column(Integer, ForeignKey('users.id'))
@@ -12,6 +12,7 @@ class User(Base):
     password = Column(String(100), nullable=False)  # 存储哈希后的密码
     email = Column(String(100), unique=True, index=True)
     is_active = Column(Boolean, default=True)
+    share_weight = Column(Integer, default=1)  # 执行资源的公平分配权重，权重越大可同时运行的爬虫越多
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
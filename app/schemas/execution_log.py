@@ -7,7 +7,7 @@ from app.schemas.spider import SpiderResponse
 class ExecutionLogBase(BaseModel):
     """执行日志基础模型"""
     spider_id: Optional[int] = None
-    status: str  # 'success', 'failed', 'running'
+    status: str  # 'success', 'failed', 'running', 'timeout', 'cancelled', 'skipped', 'coalesced'
     log_content: Optional[str] = None
     error_message: Optional[str] = None
 
@@ -31,7 +31,40 @@ class ExecutionLogResponse(ExecutionLogBase):
     id: int
     start_time: datetime
     end_time: Optional[datetime] = None
+    summary: Optional[str] = None
+    archived_at: Optional[datetime] = None
     spider: Optional[SpiderResponse] = None
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class ExecutionLogSummary(BaseModel):
+    """执行日志列表项，不包含输出内容"""
+    id: int
+    spider_id: Optional[int] = None
+    status: str
+    start_time: datetime
+    end_time: Optional[datetime] = None
+    summary: Optional[str] = None
+    archived_at: Optional[datetime] = None
+    spider: Optional[SpiderResponse] = None
+
+    class Config:
+        orm_mode = True
+
+
+class ExecutionMetricsResponse(BaseModel):
+    """执行资源统计响应模型"""
+    execution_log_id: int
+    wall_time_seconds: Optional[float] = None
+    cpu_user_seconds: Optional[float] = None
+    cpu_system_seconds: Optional[float] = None
+    peak_rss_bytes: Optional[int] = None
+    peak_process_count: Optional[int] = None
+    io_read_bytes: Optional[int] = None
+    io_write_bytes: Optional[int] = None
+    sample_count: Optional[int] = None
+
+    class Config:
+        orm_mode = True
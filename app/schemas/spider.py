@@ -9,6 +9,9 @@ class SpiderBase(BaseModel):
     description: Optional[str] = None
     script_path: str
     is_active: bool = True
+    timeout_seconds: Optional[int] = None
+    priority: Optional[str] = "normal"
+    overlap_policy: Optional[str] = "allow"
 
 
 class SpiderCreate(SpiderBase):
@@ -22,6 +25,9 @@ class SpiderUpdate(BaseModel):
     description: Optional[str] = None
     script_path: Optional[str] = None
     is_active: Optional[bool] = None
+    timeout_seconds: Optional[int] = None
+    priority: Optional[str] = None
+    overlap_policy: Optional[str] = None
 
 
 class SpiderResponse(SpiderBase):
@@ -0,0 +1,72 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.db.crud import environment_variable_crud
+from app.db.events import change_bus
+
+logger = logging.getLogger(__name__)
+
+
+class EnvironmentCache:
+    """按爬虫缓存合并后的环境变量
+
+    环境、环境变量或爬虫与环境的关联有变更提交时（通过数据变更事件）递增版本号，
+    版本号不一致的缓存视为失效。ttl 为 None 时只按版本号失效，缓存一直有效到下次变更，
+    即使调度间隔很长也能命中；工作节点等独立进程收不到其他进程的变更事件，
+    需要设置 ttl 秒的有效期作为兜底。ttl 为 0 时不缓存。
+    """
+
+    def __init__(self, ttl: Optional[float]):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = 0
+        self._entries: Dict[int, Tuple[int, float, Dict[str, str]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, events=None):
+        """使所有缓存失效，可直接作为数据变更事件的订阅回调"""
+        if events is not None and not any(e.kind == "environment" for e in events):
+            return
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def get(self, db, spider_id: int) -> Dict[str, str]:
+        """获取爬虫的环境变量，缓存未命中时查询数据库"""
+        now = time.monotonic()
+        with self._lock:
+            version = self._version
+            entry = self._entries.get(spider_id)
+            if entry and entry[0] == version and (self.ttl is None or now - entry[1] < self.ttl):
+                self.hits += 1
+                return dict(entry[2])
+            self.misses += 1
+
+        env_vars = environment_variable_crud.get_merged_for_spider(db, spider_id)
+        if self.ttl is None or self.ttl > 0:
+            with self._lock:
+                # 查询期间版本号变化说明数据已被修改，不写入缓存
+                if self._version == version:
+                    self._entries[spider_id] = (version, now, env_vars)
+        return dict(env_vars)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"version": self._version, "entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+environment_cache = EnvironmentCache(settings.ENV_CACHE_TTL)
+change_bus.subscribe(environment_cache.invalidate)
+
+
+def get_environment_variables(db, spider_id):
+    """获取爬虫的环境变量"""
+    try:
+        return environment_cache.get(db, spider_id)
+    except Exception as e:
+        logger.error(f"获取环境变量失败: {str(e)}")
+        return {}
@@ -0,0 +1,676 @@
+import asyncio
+import codecs
+import os
+import threading
+import time
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Deque, Dict, Optional
+
+from app.core.config import settings
+from app.db.crud import execution_log_crud, execution_metrics_crud, spider_crud, schedule_crud, run_queue_crud
+from app.models.database import get_db_session
+from app.services.log_stream import log_broadcaster
+from app.services.process_control import terminate_process_tree, reap_leftovers, spawn_process, wait_exited
+from app.services.resource_monitor import ResourceMonitor
+from app.services.environment_cache import get_environment_variables
+from app.services.warm_pool import WarmWorkerPool
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 优先级类别，数值越大越先执行
+PRIORITY_CLASSES = {"low": 0, "normal": 1, "high": 2}
+PRIORITY_NAMES = {value: name for name, value in PRIORITY_CLASSES.items()}
+
+
+@dataclass
+class RunRequest:
+    """一次待执行的爬虫运行请求"""
+    spider_id: int
+    enqueued_at: float = field(default_factory=time.monotonic)
+    schedule_id: Optional[int] = None  # 触发本次运行的调度任务ID，手动或队列外触发时为空
+    queue_item_id: Optional[int] = None  # 从运行队列领取的任务ID，本地调度时为空
+    # 以下字段在请求入队前由 resolve_run_class 填充
+    user_id: Optional[int] = None
+    priority: int = PRIORITY_CLASSES["normal"]
+    weight: int = 1
+
+
+@dataclass
+class PreparedRun:
+    """已创建执行日志、可以启动进程的一次运行"""
+    spider_name: str
+    log_id: int
+    script_path: str
+    env: dict
+    timeout: Optional[int] = None
+
+
+@dataclass
+class RunHandle:
+    """运行中的爬虫，用于取消"""
+    log_id: int
+    cancel_event: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class SpiderExecutor:
+    """爬虫执行引擎
+
+    在独立线程中运行一个事件循环，所有爬虫子进程都通过 spawn_process
+    在该循环中启动。运行请求先进入队列，再按全局并发上限和单个爬虫并发上限出队执行，
+    调度器线程只负责提交请求，不再被子进程阻塞。
+
+    出队顺序：先按优先级类别，同一类别内按用户的加权公平份额（运行中数量 / 用户权重）
+    选择占用最少的用户，再按入队时间先后。全局并发中保留 high_priority_reserved 个
+    只供高优先级运行使用，保证并发占满时高优先级的爬虫仍能按时启动。
+    """
+
+    def __init__(self, max_concurrency: int, per_spider_limit: int, spider_limits: Optional[Dict[int, int]] = None,
+                 high_priority_reserved: int = 0):
+        self.max_concurrency = max_concurrency
+        self.per_spider_limit = per_spider_limit
+        self.spider_limits = spider_limits or {}
+        self.high_priority_reserved = min(max(high_priority_reserved, 0), max_concurrency - 1)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        # 以下状态只在事件循环线程中修改，读取统计信息时通过锁获取快照
+        self._lock = threading.Lock()
+        self._queue: Deque[RunRequest] = deque()
+        self._running: Dict[int, int] = {}
+        self._running_total = 0
+        self._running_by_user: Dict[Optional[int], int] = {}
+        self._submitted: Dict[int, int] = {}
+        self._tasks = set()
+        self._waits: Deque[float] = deque(maxlen=1000)
+        self._user_waits: Dict[Optional[int], Deque[float]] = {}
+        self._user_weights: Dict[Optional[int], int] = {}
+        self._priority_waits: Dict[int, Deque[float]] = {}
+        # 启动路径的实测耗时：从开始启动到收到第一段输出（'warm' 为预热进程，'cold' 为新建进程），
+        # 以及新建进程时 spawn_process 本身的耗时
+        self._first_output: Dict[str, Deque[float]] = {"warm": deque(maxlen=200), "cold": deque(maxlen=200)}
+        self._cold_spawns: Deque[float] = deque(maxlen=200)
+        self._completed = 0
+        self._queue_items = set()
+        self._handles: Dict[int, RunHandle] = {}
+        self.warm_pool: Optional[WarmWorkerPool] = None
+        self.resource_monitor = ResourceMonitor(settings.RESOURCE_SAMPLE_INTERVAL) if settings.RESOURCE_ACCOUNTING else None
+
+    def start(self):
+        """启动执行引擎线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run_loop, name="spider-executor", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        logger.info(f"执行引擎已启动，全局并发上限: {self.max_concurrency}，单爬虫并发上限: {self.per_spider_limit}")
+
+    def enable_warm_pool(self, size: int, preload):
+        """启用预热进程池，之后的运行优先分派给预热进程"""
+        before_reap = self.resource_monitor.sample if self.resource_monitor else None
+        pool = WarmWorkerPool(resolve_python(), size, list(preload), before_reap)
+        asyncio.run_coroutine_threadsafe(pool.start(), self.loop).result()
+        self.warm_pool = pool
+
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def submit(self, spider_id: int, schedule_id: Optional[int] = None, queue_item_id: Optional[int] = None):
+        """提交一次爬虫运行（线程安全，可在任意线程调用）"""
+        if not self.loop or not self.loop.is_running():
+            raise RuntimeError("执行引擎尚未启动")
+        with self._lock:
+            # 请求进入事件循环之前也要计入，保证提交后立即查询 active_count 能看到这次运行
+            self._submitted[spider_id] = self._submitted.get(spider_id, 0) + 1
+            if queue_item_id is not None:
+                self._queue_items.add(queue_item_id)
+        request = RunRequest(spider_id, schedule_id=schedule_id, queue_item_id=queue_item_id)
+        self.loop.call_soon_threadsafe(self._classify, request)
+
+    def cancel(self, log_id: int) -> bool:
+        """取消一个运行中的爬虫（线程安全），返回该运行是否由本执行引擎负责"""
+        with self._lock:
+            handle = self._handles.get(log_id)
+        if handle is None:
+            return False
+        self.loop.call_soon_threadsafe(handle.cancel_event.set)
+        return True
+
+    def active_queue_items(self):
+        """获取本执行引擎中尚未结束的运行队列任务ID"""
+        with self._lock:
+            return list(self._queue_items)
+
+    def active_count(self, spider_id: int) -> int:
+        """获取爬虫已提交但尚未结束的运行数（包括排队中和运行中）"""
+        with self._lock:
+            return self._submitted.get(spider_id, 0) + self._running.get(spider_id, 0) + sum(
+                1 for request in self._queue if request.spider_id == spider_id
+            )
+
+    def free_slots(self) -> int:
+        """剩余可接收的运行数量（全局并发上限减去运行中和排队中的数量）"""
+        with self._lock:
+            return max(self.max_concurrency - self._running_total - len(self._queue), 0)
+
+    def _classify(self, request: RunRequest):
+        """查询请求所属用户、优先级和权重后再入队"""
+        task = self.loop.create_task(self._classify_and_enqueue(request))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _classify_and_enqueue(self, request: RunRequest):
+        try:
+            request.user_id, request.priority, request.weight = await asyncio.to_thread(
+                resolve_run_class, request.spider_id, request.schedule_id
+            )
+        except Exception as e:
+            logger.error(f"获取爬虫ID {request.spider_id} 的优先级失败，按普通优先级执行: {str(e)}")
+        self._enqueue(request)
+
+    def _enqueue(self, request: RunRequest):
+        with self._lock:
+            self._submitted[request.spider_id] -= 1
+            if not self._submitted[request.spider_id]:
+                del self._submitted[request.spider_id]
+            self._user_weights[request.user_id] = request.weight
+            self._queue.append(request)
+        self._dispatch()
+
+    def _limit_for(self, spider_id: int) -> int:
+        return self.spider_limits.get(spider_id, self.per_spider_limit)
+
+    def _pick(self) -> Optional[RunRequest]:
+        """选出下一个可以执行的请求，调用方需持有锁"""
+        shared_full = self._running_total >= self.max_concurrency - self.high_priority_reserved
+        best, best_key = None, None
+        for candidate in self._queue:
+            if self._running.get(candidate.spider_id, 0) >= self._limit_for(candidate.spider_id):
+                continue
+            if shared_full and candidate.priority < PRIORITY_CLASSES["high"]:
+                continue
+            share = self._running_by_user.get(candidate.user_id, 0) / max(candidate.weight, 1)
+            key = (-candidate.priority, share, candidate.enqueued_at)
+            if best_key is None or key < best_key:
+                best, best_key = candidate, key
+        return best
+
+    def _dispatch(self):
+        """在并发上限内，按优先级和用户公平份额取出可以执行的请求"""
+        with self._lock:
+            while self._running_total < self.max_concurrency:
+                request = self._pick()
+                if request is None:
+                    break
+                self._queue.remove(request)
+                self._running[request.spider_id] = self._running.get(request.spider_id, 0) + 1
+                self._running_by_user[request.user_id] = self._running_by_user.get(request.user_id, 0) + 1
+                self._running_total += 1
+                wait = time.monotonic() - request.enqueued_at
+                self._waits.append(wait)
+                self._user_waits.setdefault(request.user_id, deque(maxlen=200)).append(wait)
+                self._priority_waits.setdefault(request.priority, deque(maxlen=200)).append(wait)
+                task = self.loop.create_task(self._execute(request))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, request: RunRequest):
+        try:
+            await self.run_spider(request)
+        except Exception as e:
+            logger.error(f"执行爬虫时发生错误: {str(e)}")
+        finally:
+            if request.queue_item_id is not None:
+                await asyncio.to_thread(complete_queue_item, request.queue_item_id)
+            with self._lock:
+                self._running[request.spider_id] -= 1
+                if not self._running[request.spider_id]:
+                    del self._running[request.spider_id]
+                self._running_by_user[request.user_id] -= 1
+                if not self._running_by_user[request.user_id]:
+                    del self._running_by_user[request.user_id]
+                self._running_total -= 1
+                self._completed += 1
+                self._queue_items.discard(request.queue_item_id)
+            self._dispatch()
+
+    async def run_spider(self, request: RunRequest):
+        """执行一次爬虫运行：创建日志、启动进程、流式记录输出，并处理超时和取消"""
+        spider_id = request.spider_id
+        prepared = None
+        process = None
+        writer = None
+        try:
+            prepared = await asyncio.to_thread(prepare_run, spider_id, request.schedule_id, request.queue_item_id)
+            if prepared is None:
+                return
+            handle = RunHandle(prepared.log_id)
+            with self._lock:
+                self._handles[prepared.log_id] = handle
+
+            # 执行脚本并以流的方式捕获输出
+            launch_started = time.perf_counter()
+            process = await self.warm_pool.launch(prepared.script_path, prepared.env) if self.warm_pool else None
+            launch_path = "warm"
+            if process is None:
+                launch_path = "cold"
+                process = await spawn_process(
+                    resolve_python(), prepared.script_path, env=prepared.env,
+                    # 进程树的内存峰值只来自 /proc 采样，回收前再采样一次
+                    before_reap=self.resource_monitor.sample if self.resource_monitor else None
+                )
+                with self._lock:
+                    self._cold_spawns.append(time.perf_counter() - launch_started)
+            if self.resource_monitor:
+                self.resource_monitor.track(process.pid, exclude_existing=launch_path == "warm")
+            writer = LogWriter(prepared.log_id, settings.LOG_FLUSH_BYTES, settings.LOG_FLUSH_INTERVAL)
+            writer.start()
+            pumps = asyncio.ensure_future(asyncio.gather(
+                pump_stream(process.stdout, "stdout", writer),
+                pump_stream(process.stderr, "stderr", writer),
+            ))
+
+            outcome = await self._wait_for_exit(process, pumps, handle, prepared.timeout)
+            if outcome:
+                await terminate_process_tree(process, settings.RUN_KILL_GRACE_SECONDS)
+            await wait_exited(process)
+            # 主进程退出后，残留的后代进程可能仍持有输出管道，稍等片刻后连同进程组一起结束
+            try:
+                await asyncio.wait_for(asyncio.shield(pumps), settings.RUN_KILL_GRACE_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            # 爬虫进程回收后仍存活的后代进程不在其 rusage 中，结束它们之前再采样一次
+            if self.resource_monitor:
+                await asyncio.to_thread(self.resource_monitor.sample)
+            await reap_leftovers(process)
+            await pumps
+            await process.wait()
+            await writer.close()
+            if writer.first_output_at is not None:
+                with self._lock:
+                    self._first_output[launch_path].append(writer.first_output_at - launch_started)
+            if self.resource_monitor:
+                metrics = self.resource_monitor.untrack(process.pid, getattr(process, "rusage", None))
+                if metrics:
+                    await asyncio.to_thread(save_metrics, prepared.log_id, metrics)
+
+            # 更新执行日志
+            if outcome == "timeout":
+                await asyncio.to_thread(finish_run, prepared.log_id, "timeout", None, f"运行超过 {prepared.timeout} 秒，已终止进程组")
+                logger.error(f"爬虫运行超时: {prepared.spider_name} (ID: {spider_id})")
+            elif outcome == "cancelled":
+                await asyncio.to_thread(finish_run, prepared.log_id, "cancelled", None, "运行已被取消，已终止进程组")
+                logger.info(f"爬虫运行已取消: {prepared.spider_name} (ID: {spider_id})")
+            elif process.returncode == 0:
+                await asyncio.to_thread(finish_run, prepared.log_id, "success")
+                logger.info(f"爬虫执行成功: {prepared.spider_name} (ID: {spider_id})")
+            else:
+                await asyncio.to_thread(finish_run, prepared.log_id, "failed")
+                logger.error(f"爬虫执行失败: {prepared.spider_name} (ID: {spider_id})，返回码: {process.returncode}")
+
+        except Exception as e:
+            logger.error(f"执行爬虫时发生错误: {str(e)}")
+            if process and process.returncode is None:
+                await terminate_process_tree(process, 0)
+            if self.resource_monitor and process:
+                self.resource_monitor.untrack(process.pid)
+            if writer:
+                await writer.close()
+            # 如果已创建日志条目，则更新它
+            if prepared is not None:
+                await asyncio.to_thread(finish_run, prepared.log_id, "failed", None, str(e))
+        finally:
+            if prepared is not None:
+                with self._lock:
+                    self._handles.pop(prepared.log_id, None)
+
+    async def _wait_for_exit(self, process, pumps, handle: RunHandle, timeout: Optional[int]) -> Optional[str]:
+        """等待进程退出，返回 None 表示正常退出，否则返回 timeout 或 cancelled"""
+        waiter = asyncio.ensure_future(wait_exited(process))
+        cancelled = asyncio.ensure_future(handle.cancel_event.wait())
+        deadline = self.loop.time() + timeout if timeout else None
+        pending = {waiter, pumps}
+        try:
+            while waiter in pending:
+                remaining = deadline - self.loop.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return "timeout"
+                done, _ = await asyncio.wait(pending | {cancelled}, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if cancelled in done:
+                    return "cancelled"
+                # 输出结束时进程通常尚未被回收，再采样一次以获得最终的CPU和I/O
+                if pumps in done and self.resource_monitor:
+                    await asyncio.to_thread(self.resource_monitor.sample)
+                pending -= done
+            return None
+        finally:
+            waiter.cancel()
+            cancelled.cancel()
+
+    def stats(self) -> dict:
+        """获取执行队列的统计信息"""
+        now = time.monotonic()
+        with self._lock:
+            waits = sorted(self._waits)
+            queued_waits = [now - r.enqueued_at for r in self._queue]
+
+            # 按用户统计排队等待，观察公平分配的效果
+            users = {}
+            for user_id in set(self._user_waits) | set(self._running_by_user) | {r.user_id for r in self._queue}:
+                user_waits = sorted(self._user_waits.get(user_id, ()))
+                queued = [r for r in self._queue if r.user_id == user_id]
+                users[str(user_id)] = {
+                    "weight": self._user_weights.get(user_id, 1),
+                    "running": self._running_by_user.get(user_id, 0),
+                    "queued": len(queued),
+                    "oldest_wait_seconds": max((now - r.enqueued_at for r in queued), default=0.0),
+                    "wait_p50_seconds": _percentile(user_waits, 0.5),
+                    "wait_p95_seconds": _percentile(user_waits, 0.95),
+                }
+            priorities = {}
+            for priority, name in PRIORITY_NAMES.items():
+                priority_waits = sorted(self._priority_waits.get(priority, ()))
+                priorities[name] = {
+                    "queued": sum(1 for r in self._queue if r.priority == priority),
+                    "wait_p50_seconds": _percentile(priority_waits, 0.5),
+                    "wait_p95_seconds": _percentile(priority_waits, 0.95),
+                }
+
+            return {
+                "max_concurrency": self.max_concurrency,
+                "per_spider_limit": self.per_spider_limit,
+                "running": self._running_total,
+                "running_by_spider": dict(self._running),
+                "queue_depth": len(self._queue),
+                "oldest_wait_seconds": max(queued_waits) if queued_waits else 0.0,
+                "completed": self._completed,
+                "wait_p50_seconds": _percentile(waits, 0.5),
+                "wait_p95_seconds": _percentile(waits, 0.95),
+                "wait_max_seconds": waits[-1] if waits else 0.0,
+                "high_priority_reserved": self.high_priority_reserved,
+                "by_user": users,
+                "by_priority": priorities,
+                "launch": self._launch_stats(),
+                "warm_pool": self.warm_pool.stats() if self.warm_pool else None,
+            }
+
+    def _launch_stats(self) -> dict:
+        """两种启动路径的实测耗时，调用方需持有锁
+
+        first_output 从开始启动（分派给预热进程或新建进程）计到收到脚本的第一段输出，
+        包含脚本自身开始输出之前的耗时，两种路径之差即预热节省的启动时间。
+        没有任何输出的运行不计入。
+        """
+        paths = {}
+        for path, values in self._first_output.items():
+            ordered = sorted(values)
+            paths[path] = {
+                "runs": len(ordered),
+                "first_output_avg_seconds": sum(ordered) / len(ordered) if ordered else 0.0,
+                "first_output_p50_seconds": _percentile(ordered, 0.5),
+                "first_output_p95_seconds": _percentile(ordered, 0.95),
+            }
+        cold_spawns = list(self._cold_spawns)
+        saved = None
+        if paths["warm"]["runs"] and paths["cold"]["runs"]:
+            saved = paths["cold"]["first_output_avg_seconds"] - paths["warm"]["first_output_avg_seconds"]
+        return {
+            **paths,
+            "cold_spawn_avg_seconds": sum(cold_spawns) / len(cold_spawns) if cold_spawns else 0.0,
+            "warm_saved_seconds_per_run": saved,
+        }
+
+    def shutdown(self, timeout: float = 10.0):
+        """关闭执行引擎，等待正在运行的任务结束"""
+        if not self.loop or not self.loop.is_running():
+            return
+
+        async def _drain():
+            if self._tasks:
+                await asyncio.wait(list(self._tasks), timeout=timeout)
+            # 超时仍未结束的运行，取消并终止其进程组
+            if self._tasks:
+                for handle in list(self._handles.values()):
+                    handle.cancel_event.set()
+                await asyncio.wait(list(self._tasks), timeout=settings.RUN_KILL_GRACE_SECONDS * 2 + 1)
+            if self.warm_pool:
+                await self.warm_pool.close()
+            if self.resource_monitor:
+                self.resource_monitor.close()
+
+        try:
+            asyncio.run_coroutine_threadsafe(_drain(), self.loop).result(timeout + settings.RUN_KILL_GRACE_SECONDS * 2 + 2)
+        except Exception as e:
+            logger.warning(f"等待运行中的爬虫结束超时: {str(e)}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        logger.info("执行引擎已关闭")
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def resolve_python() -> str:
+    """获取执行爬虫脚本使用的Python解释器"""
+    venv_python = os.path.abspath(os.path.join(os.getcwd(), '.venv', 'Scripts', 'python.exe'))
+    if not os.path.exists(venv_python):
+        logger.warning(f"虚拟环境Python解释器未找到: {venv_python}")
+        venv_python = 'python'
+    return venv_python
+
+
+def resolve_run_class(spider_id, schedule_id=None):
+    """获取一次运行的所属用户、优先级和用户权重，返回 (user_id, priority, weight)"""
+    db = get_db_session()
+    try:
+        run_class = spider_crud.get_run_class(db, spider_id, schedule_id)
+    finally:
+        db.close()
+    if run_class is None:
+        return None, PRIORITY_CLASSES["normal"], 1
+    user_id, priority, weight = run_class
+    return user_id, PRIORITY_CLASSES.get(priority, PRIORITY_CLASSES["normal"]), weight
+
+
+def prepare_run(spider_id, schedule_id=None, queue_item_id=None) -> Optional[PreparedRun]:
+    """创建执行日志并准备运行参数，无需执行时返回 None"""
+    db = get_db_session()
+    try:
+        spider = spider_crud.get(db, spider_id)
+        if not spider or not spider.is_active:
+            logger.warning(f"爬虫ID {spider_id} 不存在或未激活，跳过执行")
+            return None
+
+        # 创建执行日志
+        log_data = {
+            "spider_id": spider_id,
+            "start_time": datetime.now(),
+            "status": "running",
+        }
+        log_entry = execution_log_crud.create(db, obj_in=log_data)
+        if queue_item_id is not None:
+            run_queue_crud.attach_log(db, queue_item_id, log_entry.id)
+        logger.info(f"开始执行爬虫: {spider.name} (ID: {spider_id})")
+
+        # 获取环境变量
+        env_vars = get_environment_variables(db, spider_id)
+        env = os.environ.copy()
+        env.update(env_vars)
+
+        script_path = os.path.abspath(spider.script_path)
+        if not os.path.exists(script_path):
+            error_msg = f"爬虫脚本不存在: {script_path}"
+            update_log(db, log_entry.id, "failed", error_message=error_msg)
+            return None
+
+        # 超时时间：调度任务配置优先，其次是爬虫配置，最后是全局默认值，0 或空表示不限制
+        schedule = schedule_crud.get(db, schedule_id) if schedule_id is not None else None
+        timeout = (schedule.timeout_seconds if schedule else None) or spider.timeout_seconds or settings.RUN_DEFAULT_TIMEOUT
+
+        return PreparedRun(spider.name, log_entry.id, script_path, env, timeout or None)
+    finally:
+        db.close()
+
+
+def finish_run(log_id, status, log_content=None, error_message=None):
+    """在新的数据库会话中更新执行日志，并通知订阅者运行结束"""
+    db = get_db_session()
+    try:
+        update_log(db, log_id, status, log_content=log_content, error_message=error_message)
+    finally:
+        db.close()
+    log_broadcaster.publish(log_id, {
+        "type": "update",
+        "data": {"id": log_id, "status": status, "end_time": datetime.now().isoformat(), "error_message": error_message}
+    })
+
+
+class LogWriter:
+    """爬虫输出的批量写入器
+
+    子进程的 stdout/stderr 按块读取后先放入缓冲区，累计到 LOG_FLUSH_BYTES 或距离上次写入超过
+    LOG_FLUSH_INTERVAL 秒时追加到执行日志，并推送给 WebSocket 订阅者。缓冲区写满时读取方会等待
+    写入完成，从而通过管道反压子进程，服务端内存占用与输出总量无关。
+    """
+
+    def __init__(self, log_id: int, flush_bytes: int, flush_interval: float):
+        self.log_id = log_id
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self._buffers = {"stdout": [], "stderr": []}
+        self._size = 0
+        self._lock = asyncio.Lock()
+        self._ticker: Optional[asyncio.Task] = None
+        self.first_output_at: Optional[float] = None  # 收到第一段输出的时间（perf_counter）
+
+    def start(self):
+        self._ticker = asyncio.get_running_loop().create_task(self._tick())
+
+    async def _tick(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def write(self, stream: str, text: str):
+        if not text:
+            return
+        if self.first_output_at is None:
+            self.first_output_at = time.perf_counter()
+        self._buffers[stream].append(text)
+        self._size += len(text)
+        if self._size >= self.flush_bytes:
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._size:
+                return
+            stdout = ''.join(self._buffers["stdout"])
+            stderr = ''.join(self._buffers["stderr"])
+            self._buffers = {"stdout": [], "stderr": []}
+            self._size = 0
+            await asyncio.to_thread(append_output, self.log_id, stdout, stderr)
+            log_broadcaster.publish(self.log_id, {
+                "type": "append",
+                "data": {"id": self.log_id, "log_content": stdout, "error_message": stderr}
+            })
+
+    async def close(self):
+        if self._ticker:
+            self._ticker.cancel()
+        await self.flush()
+
+
+def append_output(log_id, log_content, error_message):
+    """在新的数据库会话中追加执行日志输出"""
+    db = get_db_session()
+    try:
+        execution_log_crud.append_output(db, log_id, log_content=log_content, error_message=error_message)
+    except Exception as e:
+        logger.error(f"追加执行日志失败: {str(e)}")
+    finally:
+        db.close()
+
+
+async def pump_stream(stream: asyncio.StreamReader, name: str, writer: LogWriter):
+    """按块读取子进程输出并写入日志，不在内存中累积完整输出"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    while True:
+        chunk = await stream.read(settings.LOG_READ_CHUNK_SIZE)
+        if not chunk:
+            await writer.write(name, decoder.decode(b'', final=True))
+            break
+        await writer.write(name, decoder.decode(chunk))
+
+
+def save_metrics(log_id, metrics):
+    """在新的数据库会话中保存运行的资源统计"""
+    db = get_db_session()
+    try:
+        execution_metrics_crud.create(db, obj_in=dict(metrics, execution_log_id=log_id))
+    except Exception as e:
+        logger.error(f"保存资源统计失败: {str(e)}")
+    finally:
+        db.close()
+
+
+def complete_queue_item(item_id, status="done"):
+    """在新的数据库会话中结束运行队列任务"""
+    db = get_db_session()
+    try:
+        run_queue_crud.complete(db, item_id, status)
+    except Exception as e:
+        logger.error(f"更新运行队列任务失败: {str(e)}")
+    finally:
+        db.close()
+
+
+def update_log(db, log_id, status, log_content=None, error_message=None):
+    """结束执行日志，log_content 作为最后一段输出追加，error_message 作为结束时的说明"""
+    try:
+        if log_content:
+            execution_log_crud.append_output(db, log_id, log_content=log_content)
+        execution_log_crud.finish(db, log_id, status, message=error_message)
+    except Exception as e:
+        logger.error(f"更新执行日志失败: {str(e)}")
+
+
+# 全局执行引擎实例
+_executor = None
+
+
+def init_executor():
+    """初始化执行引擎"""
+    global _executor
+    if _executor is None:
+        _executor = SpiderExecutor(
+            max_concurrency=settings.EXECUTOR_MAX_CONCURRENCY,
+            per_spider_limit=settings.EXECUTOR_PER_SPIDER_LIMIT,
+            spider_limits=settings.EXECUTOR_SPIDER_LIMITS,
+            high_priority_reserved=settings.EXECUTOR_HIGH_PRIORITY_RESERVED,
+        )
+        _executor.start()
+        if settings.WARM_POOL_SIZE > 0:
+            _executor.enable_warm_pool(settings.WARM_POOL_SIZE, settings.WARM_POOL_PRELOAD)
+    return _executor
+
+
+def get_executor():
+    """获取执行引擎实例"""
+    if _executor is None:
+        raise RuntimeError("执行引擎尚未初始化")
+    return _executor
@@ -0,0 +1,189 @@
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.crud import execution_log_crud
+from app.models import ExecutionLog
+from app.models.database import get_db_session, engine
+
+logger = logging.getLogger(__name__)
+
+# 每次增量整理归还的页数，分多次执行以免长时间持有写锁
+VACUUM_STEP_PAGES = 1000
+
+METRIC_FIELDS = (
+    "wall_time_seconds", "cpu_user_seconds", "cpu_system_seconds", "peak_rss_bytes",
+    "peak_process_count", "io_read_bytes", "io_write_bytes", "sample_count",
+)
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+class LogRetention:
+    """执行日志保留策略
+
+    1. 开始时间早于 full_days 天的日志：连同完整输出和资源统计写入按月划分的归档文件
+       （archive_dir/execution_logs-YYYY-MM.jsonl.gz），然后删除输出，只保留摘要；
+    2. 开始时间早于 summary_days 天的日志：从数据库删除；
+    3. 增量整理数据库，把删除数据空出的页归还给文件系统。
+
+    每批日志在单独的短事务中处理，不会长时间阻塞其他写入。归档文件先写入并落盘再提交数据库，
+    中途失败时重新运行可能在归档中留下重复的记录（按 id 去重即可），不会丢失数据。
+    """
+
+    def __init__(self, full_days: int = None, summary_days: int = None, archive_dir: str = None, batch_size: int = None):
+        self.full_days = settings.LOG_RETENTION_FULL_DAYS if full_days is None else full_days
+        self.summary_days = settings.LOG_RETENTION_SUMMARY_DAYS if summary_days is None else summary_days
+        self.archive_dir = Path(archive_dir or settings.LOG_ARCHIVE_DIR)
+        self.batch_size = batch_size or settings.LOG_RETENTION_BATCH_SIZE
+        self.scheduler = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.full_days or self.summary_days)
+
+    def start_scheduler(self):
+        """启动定时清理任务，未配置保留天数时不启动"""
+        if self.scheduler is None and self.enabled:
+            self.scheduler = BackgroundScheduler()
+            self.scheduler.add_job(self.run, 'interval', hours=settings.LOG_RETENTION_INTERVAL_HOURS)
+            self.scheduler.start()
+            logger.info("执行日志保留策略定时任务已启动")
+
+    def stop_scheduler(self):
+        """停止定时清理任务"""
+        if self.scheduler and self.scheduler.running:
+            self.scheduler.shutdown()
+            self.scheduler = None
+            logger.info("执行日志保留策略定时任务已停止")
+
+    def run(self) -> Dict[str, int]:
+        """执行一次归档、删除和增量整理，返回处理结果"""
+        report = {"archived": 0, "deleted": 0, "reclaimed_bytes": 0, "free_bytes": 0}
+        if not self.enabled:
+            return report
+        try:
+            now = datetime.now()
+            # 删除前必须先归档，保留完整输出的天数不能超过保留摘要的天数
+            full_days = min(days for days in (self.full_days, self.summary_days) if days)
+            report["archived"] = self.archive_before(now - timedelta(days=full_days))
+            if self.summary_days:
+                report["deleted"] = self.delete_before(now - timedelta(days=self.summary_days))
+            report["reclaimed_bytes"], report["free_bytes"] = self.incremental_vacuum()
+            logger.info(
+                f"执行日志保留策略完成：归档 {report['archived']} 条，删除 {report['deleted']} 条，"
+                f"归还 {report['reclaimed_bytes']} 字节，剩余可复用空间 {report['free_bytes']} 字节"
+            )
+        except Exception as e:
+            logger.error(f"执行日志保留策略运行失败: {str(e)}")
+        return report
+
+    def archive_before(self, before: datetime) -> int:
+        """分批归档开始时间早于 before 的日志并删除其输出，返回归档的条数"""
+        total = 0
+        db = get_db_session()
+        try:
+            while True:
+                logs = execution_log_crud.get_unarchived_before(db, before, self.batch_size)
+                if not logs:
+                    break
+                for log in logs:
+                    execution_log_crud.load_output(db, log)
+                self.write_archive(logs)
+                execution_log_crud.mark_archived(db, [log.id for log in logs])
+                db.expunge_all()
+                total += len(logs)
+        finally:
+            db.close()
+        return total
+
+    def delete_before(self, before: datetime) -> int:
+        """分批删除开始时间早于 before 的已归档日志，返回删除的条数"""
+        total = 0
+        db = get_db_session()
+        try:
+            while True:
+                deleted = execution_log_crud.delete_archived_before(db, before, self.batch_size)
+                if not deleted:
+                    break
+                total += deleted
+        finally:
+            db.close()
+        return total
+
+    def write_archive(self, logs: List[ExecutionLog]):
+        """把日志按开始月份追加到归档文件（每次追加一个 gzip 成员，整个文件仍可直接解压读取）"""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        by_month: Dict[str, List[str]] = {}
+        for log in logs:
+            record = {
+                "id": log.id,
+                "spider_id": log.spider_id,
+                "status": log.status,
+                "start_time": _isoformat(log.start_time),
+                "end_time": _isoformat(log.end_time),
+                "summary": log.summary,
+                "log_content": log.log_content,
+                "error_message": log.error_message,
+                "metrics": {field: getattr(log.metrics, field) for field in METRIC_FIELDS} if log.metrics else None,
+            }
+            by_month.setdefault(log.start_time.strftime("%Y-%m"), []).append(json.dumps(record, ensure_ascii=False))
+
+        for month, lines in by_month.items():
+            path = self.archive_dir / f"execution_logs-{month}.jsonl.gz"
+            with open(path, "ab") as f:
+                f.write(gzip.compress(("\n".join(lines) + "\n").encode("utf-8")))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def incremental_vacuum(self):
+        """分步归还空闲页，返回 (归还的字节数, 剩余空闲字节数)
+
+        数据库未启用增量整理（auto_vacuum 不是 INCREMENTAL）时不归还，空闲页留给之后的写入复用。
+        """
+        if engine.dialect.name != "sqlite":
+            return 0, 0
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            page_size = conn.execute(text("PRAGMA page_size")).scalar()
+            page_count = conn.execute(text("PRAGMA page_count")).scalar()
+            if conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2:
+                free_pages = conn.execute(text("PRAGMA freelist_count")).scalar()
+                # 每归还一页返回一个空行，要取完结果才会执行完整的一步。SQLAlchemy 把该语句视为
+                # 不返回结果，只会执行第一步（归还一页），因此直接使用 DB-API 游标
+                cursor = conn.connection.cursor()
+                try:
+                    while free_pages:
+                        cursor.execute(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})")
+                        cursor.fetchall()
+                        remaining = conn.execute(text("PRAGMA freelist_count")).scalar()
+                        if remaining >= free_pages:
+                            break
+                        free_pages = remaining
+                finally:
+                    cursor.close()
+            else:
+                logger.warning("数据库未启用增量整理，执行一次 python -m app.db.maintenance vacuum 后生效")
+            reclaimed = (page_count - conn.execute(text("PRAGMA page_count")).scalar()) * page_size
+            free = conn.execute(text("PRAGMA freelist_count")).scalar() * page_size
+        return reclaimed, free
+
+
+def init_log_retention():
+    """初始化执行日志保留策略，配置了保留天数时启动定时任务
+
+    Returns:
+        执行日志保留策略实例
+    """
+    retention = LogRetention()
+    retention.start_scheduler()
+    return retention
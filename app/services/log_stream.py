@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LogBroadcaster:
+    """执行日志广播器
+
+    执行引擎运行在独立的事件循环线程中，而 WebSocket 连接属于 uvicorn 的事件循环。
+    广播器负责把执行引擎产生的日志片段线程安全地转发到订阅方所在的事件循环，
+    并且只转发有订阅者的日志，避免无人观看时的额外开销。
+    """
+
+    def __init__(self, max_pending: int = 100):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._listeners: List[Tuple[asyncio.AbstractEventLoop, Callable[[int, dict], Awaitable[None]]]] = []
+        self._watched: Dict[int, int] = {}
+        self._pending = 0
+
+    def add_listener(self, loop: asyncio.AbstractEventLoop, callback: Callable[[int, dict], Awaitable[None]]):
+        """注册一个监听者，callback 会在 loop 所在线程中以协程方式执行"""
+        with self._lock:
+            if (loop, callback) not in self._listeners:
+                self._listeners.append((loop, callback))
+
+    def watch(self, log_id: int):
+        """标记某个日志有订阅者"""
+        with self._lock:
+            self._watched[log_id] = self._watched.get(log_id, 0) + 1
+
+    def unwatch(self, log_id: int):
+        """取消某个日志的订阅"""
+        with self._lock:
+            count = self._watched.get(log_id, 0) - 1
+            if count > 0:
+                self._watched[log_id] = count
+            else:
+                self._watched.pop(log_id, None)
+
+    def is_watched(self, log_id: int) -> bool:
+        with self._lock:
+            return log_id in self._watched
+
+    def publish(self, log_id: int, message: dict):
+        """发布日志消息（线程安全，可在任意线程调用）"""
+        with self._lock:
+            if log_id not in self._watched:
+                return
+            # 订阅方消费过慢时丢弃新消息，保证服务端内存不随输出量增长
+            if self._pending >= self.max_pending:
+                return
+            listeners = [(loop, callback) for loop, callback in self._listeners if not loop.is_closed()]
+            self._pending += len(listeners)
+
+        for loop, callback in listeners:
+            try:
+                future = asyncio.run_coroutine_threadsafe(callback(log_id, message), loop)
+                future.add_done_callback(self._on_delivered)
+            except RuntimeError:
+                self._on_delivered(None)
+
+    def _on_delivered(self, future):
+        with self._lock:
+            self._pending -= 1
+        if future is not None and not future.cancelled() and future.exception():
+            logger.warning(f"推送日志更新失败: {future.exception()}")
+
+
+# 全局日志广播器实例
+log_broadcaster = LogBroadcaster()
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+from typing import Callable, List, Optional
+
+from app.services.resource_monitor import PROC_ROOT, read_stat
+
+logger = logging.getLogger(__name__)
+
+
+class ChildProcess:
+    """由执行器自行回收的子进程，接口与 asyncio.subprocess.Process 中用到的部分一致
+
+    asyncio 用 os.waitpid 回收子进程，拿不到退出时的资源使用统计。这里由一个等待线程调用
+    os.wait4 回收，rusage 包含进程本身以及它已回收的所有后代进程的 CPU 时间和块 I/O。
+    before_reap 在进程退出后、回收前于等待线程中调用，此时进程仍以僵尸进程保留在 /proc 中。
+    """
+
+    def __init__(self, popen: subprocess.Popen, stdin, stdout, stderr, before_reap: Optional[Callable[[], None]] = None):
+        self.pid = popen.pid
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode: Optional[int] = None
+        self.rusage = None
+        self._popen = popen
+        self._before_reap = before_reap
+        self._loop = asyncio.get_running_loop()
+        self._exited = self._loop.create_future()
+        threading.Thread(target=self._reap, name=f"reap-{self.pid}", daemon=True).start()
+
+    def _reap(self):
+        if self._before_reap is not None:
+            try:
+                os.waitid(os.P_PID, self.pid, os.WEXITED | os.WNOWAIT)
+                self._before_reap()
+            except ChildProcessError:
+                pass
+            except Exception as e:
+                logger.warning(f"进程 {self.pid} 回收前的回调失败: {str(e)}")
+        try:
+            _, status, rusage = os.wait4(self.pid, 0)
+            returncode = os.waitstatus_to_exitcode(status)
+        except ChildProcessError:
+            rusage, returncode = None, 255
+        try:
+            self._loop.call_soon_threadsafe(self._set_exited, returncode, rusage)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+    def _set_exited(self, returncode: int, rusage):
+        self.returncode = returncode
+        self.rusage = rusage
+        # 进程已被回收，避免 Popen 再次回收
+        self._popen.returncode = returncode
+        if not self._exited.done():
+            self._exited.set_result(returncode)
+
+    async def wait(self) -> int:
+        return await asyncio.shield(self._exited)
+
+    def send_signal(self, sig: int):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+
+async def spawn_process(*args: str, env: Optional[dict] = None, stdin: bool = False,
+                        before_reap: Optional[Callable[[], None]] = None):
+    """以新会话启动子进程，通过管道读取其标准输出和标准错误，stdin 为 True 时同时接管标准输入
+
+    POSIX 系统上返回 ChildProcess，进程退出后可从 rusage 取得资源使用统计，before_reap 在回收前调用；
+    Windows 上退回 asyncio.create_subprocess_exec，没有 rusage，也不调用 before_reap。
+    """
+    pipe_stdin = subprocess.PIPE if stdin else None
+    if sys.platform == "win32":
+        return await asyncio.create_subprocess_exec(
+            *args, stdin=pipe_stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            env=env, start_new_session=True
+        )
+
+    loop = asyncio.get_running_loop()
+    popen = subprocess.Popen(
+        args, stdin=pipe_stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        env=env, start_new_session=True
+    )
+    try:
+        readers = []
+        for pipe in (popen.stdout, popen.stderr):
+            reader = asyncio.StreamReader(loop=loop)
+            await loop.connect_read_pipe(lambda reader=reader: asyncio.StreamReaderProtocol(reader, loop=loop), pipe)
+            readers.append(reader)
+        writer = None
+        if stdin:
+            transport, protocol = await loop.connect_write_pipe(
+                lambda: asyncio.StreamReaderProtocol(asyncio.StreamReader(loop=loop), loop=loop), popen.stdin
+            )
+            writer = asyncio.StreamWriter(transport, protocol, None, loop)
+    except BaseException:
+        popen.kill()
+        await asyncio.to_thread(popen.wait)
+        raise
+    return ChildProcess(popen, writer, readers[0], readers[1], before_reap)
+
+
+def session_processes(session_id: int) -> List[int]:
+    """获取属于指定会话的所有进程ID（爬虫以新会话启动，会话ID等于爬虫进程ID）"""
+    if not os.path.isdir(PROC_ROOT):
+        return []
+    pids = []
+    for name in os.listdir(PROC_ROOT):
+        if not name.isdigit():
+            continue
+        try:
+            if read_stat(int(name))[1] == session_id:
+                pids.append(int(name))
+        except (OSError, ValueError, IndexError):
+            continue
+    return pids
+
+
+def signal_process_tree(pid: int, sig: int):
+    """向爬虫进程所在的进程组及会话中的所有进程发送信号"""
+    try:
+        os.killpg(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+    for member in session_processes(pid):
+        try:
+            os.kill(member, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+async def wait_exited(process: asyncio.subprocess.Process, timeout: Optional[float] = None, interval: float = 0.2) -> bool:
+    """等待进程本身退出，返回是否已退出
+
+    process.wait() 要等到所有输出管道关闭才返回，而后代进程可能继续持有管道，
+    因此这里直接轮询进程的返回码。
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout is not None else None
+    while process.returncode is None:
+        if deadline is not None and loop.time() >= deadline:
+            return False
+        await asyncio.sleep(interval)
+    return True
+
+
+async def terminate_process_tree(process: asyncio.subprocess.Process, grace: float):
+    """终止爬虫进程及其所有后代进程：先发送 SIGTERM，超过 grace 秒仍未退出则发送 SIGKILL"""
+    if sys.platform == "win32":
+        # Windows 没有进程组信号，使用 taskkill 结束整个进程树
+        await asyncio.to_thread(
+            subprocess.run, ["taskkill", "/F", "/T", "/PID", str(process.pid)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        return
+
+    await asyncio.to_thread(signal_process_tree, process.pid, signal.SIGTERM)
+    if not await wait_exited(process, grace):
+        logger.warning(f"进程 {process.pid} 在 {grace} 秒内未退出，强制结束")
+    await asyncio.to_thread(signal_process_tree, process.pid, signal.SIGKILL)
+
+
+async def reap_leftovers(process: asyncio.subprocess.Process):
+    """爬虫进程退出后，结束仍残留在其会话中的后代进程（如未关闭的浏览器）"""
+    if sys.platform == "win32":
+        return
+    leftovers = await asyncio.to_thread(session_processes, process.pid)
+    if leftovers:
+        logger.warning(f"爬虫进程 {process.pid} 已退出，结束残留的 {len(leftovers)} 个后代进程")
+        await asyncio.to_thread(signal_process_tree, process.pid, signal.SIGKILL)
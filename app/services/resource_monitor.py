@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROC_ROOT = "/proc"
+
+
+class TreeUsage:
+    """一个爬虫进程树的资源使用情况
+
+    进程树包含爬虫进程本身以及它启动的所有后代进程（如 Selenium 拉起的 Chrome）。
+    最终的 CPU 时间和块 I/O 取爬虫进程被回收时的 rusage，其中已包含它回收过的所有后代进程；
+    脱离父进程链的后代（父进程先退出，被挂到 init 下）不会由爬虫进程回收，仍按最后一次采样的值累加。
+    /proc 采样只用于运行期间的内存和进程数峰值；拿不到 rusage 时才按采样值估算 CPU 和 I/O。
+    """
+
+    def __init__(self, root_pid: int, baseline: Tuple[float, float] = (0.0, 0.0)):
+        self.root_pid = root_pid
+        self.started = time.monotonic()
+        self.baseline = baseline
+        self.peak_rss = 0
+        self.peak_processes = 0
+        self.samples = 0
+        # 每个进程最后一次采样的值，CPU 和 I/O 都包含该进程已回收的子进程
+        self.cpu: Dict[int, Tuple[float, float]] = {}
+        self.io: Dict[int, Tuple[int, int]] = {}
+        self.parents: Dict[int, int] = {}
+        # 最后一次采样时只能按会话ID归入本树的进程
+        self.detached: Set[int] = set()
+
+    def result(self, rusage=None) -> dict:
+        if rusage is not None:
+            cpu = [(rusage.ru_utime, rusage.ru_stime)]
+            io = [(rusage.ru_inblock * 512, rusage.ru_oublock * 512)]
+            cpu += [value for pid, value in self.cpu.items() if pid in self.detached]
+            io += [value for pid, value in self.io.items() if pid in self.detached]
+        else:
+            cpu, io = list(self.cpu.values()), list(self.io.values())
+        return {
+            "wall_time_seconds": time.monotonic() - self.started,
+            "cpu_user_seconds": max(sum(user for user, _ in cpu) - self.baseline[0], 0.0),
+            "cpu_system_seconds": max(sum(system for _, system in cpu) - self.baseline[1], 0.0),
+            "peak_rss_bytes": self.peak_rss,
+            "peak_process_count": self.peak_processes,
+            "io_read_bytes": sum(read for read, _ in io),
+            "io_write_bytes": sum(write for _, write in io),
+            "sample_count": self.samples,
+        }
+
+
+def read_stat(pid: int):
+    """读取 /proc/<pid>/stat，返回 (ppid, session, utime, stime, cutime, cstime, rss_pages)
+
+    cutime 和 cstime 是该进程已回收的子进程累计的 CPU 时间，单位均为时钟滴答。
+    """
+    with open(f"{PROC_ROOT}/{pid}/stat", "rb") as f:
+        data = f.read().decode("utf-8", errors="replace")
+    # 进程名可能包含空格和括号，从最后一个右括号之后开始解析
+    fields = data[data.rindex(")") + 2:].split()
+    return (int(fields[1]), int(fields[3]), int(fields[11]), int(fields[12]),
+            int(fields[13]), int(fields[14]), int(fields[21]))
+
+
+def _read_io(pid: int) -> Optional[Tuple[int, int]]:
+    try:
+        values = {}
+        with open(f"{PROC_ROOT}/{pid}/io") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                values[key] = int(value)
+        return values.get("read_bytes", 0), values.get("write_bytes", 0)
+    except (OSError, ValueError):
+        return None
+
+
+class ResourceMonitor:
+    """进程树资源采样器
+
+    所有运行中的爬虫共享一个采样循环，每个周期只扫描一次 /proc，再把进程归入各自的进程树：
+    既包括父进程链指向爬虫进程的后代，也包括会话ID等于爬虫进程的进程（爬虫以新会话启动，
+    父进程退出后被重新挂到 init 下的 Chrome 子进程也能统计到）。
+    没有 /proc 的系统不做采样，只记录墙钟时间和爬虫进程被回收时的 rusage。
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.available = os.path.isdir(PROC_ROOT) and hasattr(os, "sysconf")
+        self._clock_ticks = os.sysconf("SC_CLK_TCK") if self.available else 100
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if self.available else 4096
+        self._lock = threading.Lock()
+        self._trees: Dict[int, TreeUsage] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def track(self, pid: int, exclude_existing: bool = False) -> TreeUsage:
+        """开始统计一个进程树，必须在事件循环中调用
+
+        exclude_existing 为 True 时扣除进程此前已使用的 CPU 时间（预热进程导入模块的耗时不计入本次运行）。
+        """
+        baseline = (0.0, 0.0)
+        if exclude_existing and self.available:
+            try:
+                _, _, utime, stime, cutime, cstime, _ = read_stat(pid)
+                baseline = ((utime + cutime) / self._clock_ticks, (stime + cstime) / self._clock_ticks)
+            except (OSError, ValueError, IndexError):
+                pass
+        usage = TreeUsage(pid, baseline)
+        with self._lock:
+            self._trees[pid] = usage
+        if self.available and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return usage
+
+    def untrack(self, pid: int, rusage=None) -> Optional[dict]:
+        """结束统计并返回结果，rusage 为爬虫进程被回收时 os.wait4 返回的资源使用统计"""
+        with self._lock:
+            usage = self._trees.pop(pid, None)
+        return usage.result(rusage) if usage else None
+
+    def close(self):
+        """停止采样循环"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self._trees:
+                try:
+                    await asyncio.to_thread(self.sample)
+                except Exception as e:
+                    logger.warning(f"采集进程资源失败: {str(e)}")
+
+    def sample(self):
+        """扫描一次 /proc 并更新所有进程树的统计"""
+        if not self.available:
+            return
+        with self._lock:
+            roots = set(self._trees)
+        if not roots:
+            return
+
+        stats = {}
+        for name in os.listdir(PROC_ROOT):
+            if not name.isdigit():
+                continue
+            try:
+                stats[int(name)] = read_stat(int(name))
+            except (OSError, ValueError, IndexError):
+                continue
+
+        def root_of(pid):
+            """返回 (所属进程树, 是否只能按会话ID归入)"""
+            current, seen = pid, set()
+            while current in stats and current not in seen:
+                if current in roots:
+                    return current, False
+                seen.add(current)
+                current = stats[current][0]
+            session = stats[pid][1]
+            return (session, True) if session in roots else (None, False)
+
+        members: Dict[int, list] = {root: [] for root in roots}
+        detached = set()
+        for pid in stats:
+            root, by_session = root_of(pid)
+            if root is not None:
+                members[root].append(pid)
+                if by_session:
+                    detached.add(pid)
+
+        with self._lock:
+            for root, pids in members.items():
+                usage = self._trees.get(root)
+                if usage is None:
+                    continue
+                alive = set(pids)
+                # 已消失且父进程仍在树中的进程由父进程回收，其用量已计入父进程的 cutime 和 I/O
+                for pid in [pid for pid in usage.cpu if pid not in alive and usage.parents.get(pid) in alive]:
+                    usage.cpu.pop(pid, None)
+                    usage.io.pop(pid, None)
+                    usage.parents.pop(pid, None)
+                    usage.detached.discard(pid)
+                rss = 0
+                for pid in pids:
+                    ppid, _, utime, stime, cutime, cstime, rss_pages = stats[pid]
+                    usage.cpu[pid] = ((utime + cutime) / self._clock_ticks, (stime + cstime) / self._clock_ticks)
+                    usage.parents[pid] = ppid
+                    if pid in detached:
+                        usage.detached.add(pid)
+                    else:
+                        usage.detached.discard(pid)
+                    rss += rss_pages * self._page_size
+                    io = _read_io(pid)
+                    if io is not None:
+                        usage.io[pid] = io
+                usage.peak_rss = max(usage.peak_rss, rss)
+                usage.peak_processes = max(usage.peak_processes, len(pids))
+                usage.samples += 1
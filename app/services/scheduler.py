@@ -1,244 +1,401 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
-from sqlalchemy.orm import Session
+from apscheduler.jobstores.memory import MemoryJobStore
 from app.models import Schedule, ExecutionLog, Spider, SpiderEnvironment, EnvironmentVariable
-from app.db.crud import schedule_crud, execution_log_crud, spider_crud
-from datetime import datetime
-import subprocess
-import os
+from app.db.crud import schedule_crud, execution_log_crud, spider_crud, run_queue_crud
+from app.db.events import ChangeEvent, change_bus
+from datetime import timedelta
 import logging
 import json
-import asyncio
-from app.models.database import get_db_session
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.models.database import get_db_session, engine
+from app.services.executor import get_executor, resolve_run_class
+from app.services.triggers import build_trigger
+from app.services.timeline import FireTimeline
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 爬虫上一次运行尚未结束时，新的触发如何处理
+OVERLAP_POLICIES = ("allow", "skip", "queue_one", "coalesce")
+OVERLAP_DRAIN_JOB_ID = "overlap_drain"
+TIMELINE_ROLL_JOB_ID = "timeline_roll"
+
+
+def job_id_for(spider_id, schedule_id):
+    """调度任务在 APScheduler 中的ID"""
+    return f"spider_{spider_id}_{schedule_id}"
+
+
+def job_options(schedule):
+    """根据调度配置生成 APScheduler 任务参数，未配置的项使用全局默认值"""
+    return {
+        "misfire_grace_time": schedule.misfire_grace_time if schedule.misfire_grace_time is not None else settings.SCHEDULER_MISFIRE_GRACE_TIME,
+        "coalesce": schedule.coalesce if schedule.coalesce is not None else settings.SCHEDULER_COALESCE,
+        "max_instances": schedule.max_instances or settings.SCHEDULER_MAX_INSTANCES,
+    }
+
 
 class SpiderScheduler:
-    def __init__(self, db: Session):
-        self.db = db
-        self.scheduler = BackgroundScheduler()
-        self.scheduler.start()
+    def __init__(self):
+        self.timeline = FireTimeline(timedelta(hours=settings.TIMELINE_HORIZON_HOURS), settings.TIMELINE_FIRES_PER_SCHEDULE)
+        # 调度任务持久化到数据库，重启后保留下次触发时间，停机期间错过的触发按 misfire 配置补跑
+        self.scheduler = BackgroundScheduler(
+            jobstores={
+                "default": SQLAlchemyJobStore(engine=engine, tablename="apscheduler_jobs"),
+                # 内部维护任务不需要持久化
+                "memory": MemoryJobStore(),
+            },
+            job_defaults={
+                "misfire_grace_time": settings.SCHEDULER_MISFIRE_GRACE_TIME,
+                "coalesce": settings.SCHEDULER_COALESCE,
+                "max_instances": settings.SCHEDULER_MAX_INSTANCES,
+            },
+        )
+        # 先以暂停状态启动，完成任务对账后再恢复，避免对账前触发过期任务
+        self.scheduler.start(paused=True)
+        self.scheduler.add_job(
+            drain_deferred_runs, "interval", seconds=settings.OVERLAP_CHECK_INTERVAL,
+            id=OVERLAP_DRAIN_JOB_ID, jobstore="memory", replace_existing=True, coalesce=True,
+        )
+        self.scheduler.add_job(
+            self.timeline.roll, "interval", seconds=settings.TIMELINE_REFRESH_INTERVAL,
+            id=TIMELINE_ROLL_JOB_ID, jobstore="memory", replace_existing=True, coalesce=True,
+        )
+        # 调度任务和爬虫的变更由数据变更事件驱动，在独立线程中批量同步
+        self._changes: "queue.Queue[Optional[List[ChangeEvent]]]" = queue.Queue()
+        self._sync_thread = threading.Thread(target=self._sync_loop, name="schedule-sync", daemon=True)
+        self._sync_thread.start()
+        change_bus.subscribe(self._on_changes)
         logger.info("调度器已启动")
 
     def load_schedules(self):
-        """从数据库加载所有活跃的调度任务"""
+        """将持久化的调度任务与数据库中活跃的调度配置对账，只增删改有差异的任务"""
+        db = get_db_session()
         try:
-            active_schedules = schedule_crud.get_active_schedules(self.db)
-            for schedule in active_schedules:
-                self.add_job(schedule)
-            logger.info(f"已加载 {len(active_schedules)} 个调度任务")
+            desired = {
+                job_id_for(spider.id, schedule.id): (schedule, spider)
+                for schedule, spider in schedule_crud.get_active_with_spider(db)
+            }
+            existing = {job.id: job for job in self.scheduler.get_jobs(jobstore="default")}
+
+            removed = 0
+            for job_id in existing.keys() - desired.keys():
+                self.scheduler.remove_job(job_id)
+                removed += 1
+
+            added = updated = 0
+            for job_id, (schedule, spider) in desired.items():
+                job = existing.get(job_id)
+                if job is None:
+                    try:
+                        self._add_scheduler_job(schedule, spider)
+                        added += 1
+                    except Exception as e:
+                        logger.error(f"添加调度任务失败: {str(e)}")
+                elif not self._job_matches(job, schedule):
+                    self._sync_job(job, schedule)
+                    updated += 1
+
+            logger.info(f"已加载 {len(desired)} 个调度任务（新增 {added}，更新 {updated}，移除 {removed}）")
+            self.timeline.rebuild(desired.values())
         except Exception as e:
             logger.error(f"加载调度任务失败: {str(e)}")
+        finally:
+            db.close()
+            self.scheduler.resume()
+
+    def _job_matches(self, job, schedule):
+        """判断已持久化的任务是否与调度配置一致"""
+        options = job_options(schedule)
+        return (
+            tuple(job.args) == (schedule.spider_id, schedule.id)
+            and str(job.trigger) == str(build_trigger(schedule))
+            and job.misfire_grace_time == options["misfire_grace_time"]
+            and job.coalesce == options["coalesce"]
+            and job.max_instances == options["max_instances"]
+        )
 
-    def add_job(self, schedule):
-        """添加一个调度任务"""
-        try:
-            spider = spider_crud.get(self.db, schedule.spider_id)
-            if not spider or not spider.is_active:
-                logger.warning(f"爬虫ID {schedule.spider_id} 不存在或未激活，跳过添加调度任务")
+    def _sync_job(self, job, schedule):
+        """更新已持久化任务的触发器和补跑配置"""
+        trigger = build_trigger(schedule)
+        if str(job.trigger) != str(trigger):
+            job.reschedule(trigger)
+        job.modify(args=[schedule.spider_id, schedule.id], **job_options(schedule))
+        logger.info(f"已更新调度任务: {job.id}, cron表达式: {schedule.cron_expression}")
+
+    def _add_scheduler_job(self, schedule, spider):
+        # 任务参数只包含ID，运行时在执行线程中创建独立的数据库会话
+        job_id = job_id_for(spider.id, schedule.id)
+        self.scheduler.add_job(
+            run_spider_job,  # 使用独立的函数而不是实例方法
+            build_trigger(schedule),
+            id=job_id,
+            args=[spider.id, schedule.id],
+            replace_existing=True,
+            **job_options(schedule)
+        )
+        logger.info(f"已添加调度任务: {job_id}, cron表达式: {schedule.cron_expression}")
+
+    def _on_changes(self, events):
+        """数据变更事件回调，在提交事务的线程中调用，只把事件放入待同步队列"""
+        events = [e for e in events if e.kind in ("schedule", "spider")]
+        if events:
+            self._changes.put(events)
+
+    def _sync_loop(self):
+        """同步线程：合并一段时间内的变更事件，批量应用到调度器"""
+        while True:
+            events = self._changes.get()
+            if events is None:
+                return
+            time.sleep(settings.SCHEDULER_SYNC_DEBOUNCE)
+            batch = list(events)
+            stopping = False
+            while True:
+                try:
+                    more = self._changes.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    stopping = True
+                    break
+                batch.extend(more)
+            try:
+                self.apply_changes(batch)
+            except Exception as e:
+                logger.error(f"同步调度任务失败: {str(e)}")
+            if stopping:
                 return
 
-            job_id = f"spider_{spider.id}_{schedule.id}"
-            # 检查任务是否已存在
-            if self.scheduler.get_job(job_id):
-                self.scheduler.remove_job(job_id)
-                logger.info(f"已移除现有任务: {job_id}")
-
-            # 添加新任务，不再传递self.db，而是传递spider_id
-            self.scheduler.add_job(
-                run_spider_job,  # 使用独立的函数而不是实例方法
-                CronTrigger.from_crontab(schedule.cron_expression),
-                id=job_id,
-                args=[spider.id],
-                replace_existing=True
-            )
-            logger.info(f"已添加调度任务: {job_id}, cron表达式: {schedule.cron_expression}")
-        except Exception as e:
-            logger.error(f"添加调度任务失败: {str(e)}")
+    def apply_changes(self, events: List[ChangeEvent]):
+        """把一批变更事件应用到调度器：一次查询取出受影响的调度任务，只增删改有差异的任务"""
+        schedule_ids = {e.id for e in events if e.kind == "schedule"}
+        spider_ids = {e.id for e in events if e.kind == "spider"}
+        if not schedule_ids and not spider_ids:
+            return
 
-    def remove_job(self, schedule_id):
-        """移除一个调度任务"""
+        db = get_db_session()
         try:
-            schedule = schedule_crud.get(self.db, schedule_id)
-            if not schedule:
-                logger.warning(f"调度任务ID {schedule_id} 不存在")
-                return
+            rows = schedule_crud.get_with_spider(db, schedule_ids, spider_ids)
+            # 任务可能因为调度任务改属其他爬虫而换了ID，按参数中的调度ID匹配已有任务
+            affected = schedule_ids | {schedule.id for schedule, _ in rows}
+            jobs = {
+                job.args[1]: job for job in self.scheduler.get_jobs(jobstore="default")
+                if len(job.args) > 1 and job.args[1] in affected
+            }
+
+            upserts, removed = [], set(schedule_ids - {schedule.id for schedule, _ in rows})
+            added = updated = dropped = 0
+            for schedule, spider in rows:
+                job = jobs.pop(schedule.id, None)
+                if not schedule.is_active or spider is None or not spider.is_active:
+                    if job is not None:
+                        job.remove()
+                        dropped += 1
+                    removed.add(schedule.id)
+                    continue
+                if job is not None and job.id != job_id_for(spider.id, schedule.id):
+                    job.remove()
+                    job = None
+                try:
+                    if job is None:
+                        self._add_scheduler_job(schedule, spider)
+                        added += 1
+                    elif not self._job_matches(job, schedule):
+                        # 整体替换任务只需写一次任务存储，比 reschedule 加 modify 少一次写入
+                        self._add_scheduler_job(schedule, spider)
+                        updated += 1
+                    upserts.append((schedule, spider))
+                except Exception as e:
+                    logger.error(f"同步调度任务 {schedule.id} 失败: {str(e)}")
+
+            # 剩余的是已被删除的调度任务
+            for schedule_id, job in jobs.items():
+                job.remove()
+                dropped += 1
+                removed.add(schedule_id)
+
+            self.timeline.apply(upserts, removed)
+            logger.info(f"已同步 {len(events)} 个变更事件（新增 {added}，更新 {updated}，移除 {dropped}）")
+        finally:
+            db.close()
+
+    def sync_schedules(self, schedule_ids):
+        """立即同步指定调度任务的配置到调度器"""
+        self.apply_changes([ChangeEvent("schedule", schedule_id, "upsert") for schedule_id in schedule_ids])
 
-            job_id = f"spider_{schedule.spider_id}_{schedule.id}"
-            if self.scheduler.get_job(job_id):
-                self.scheduler.remove_job(job_id)
-                logger.info(f"已移除调度任务: {job_id}")
-            else:
-                logger.warning(f"调度任务 {job_id} 不存在于调度器中")
-        except Exception as e:
-            logger.error(f"移除调度任务失败: {str(e)}")
+    def shutdown(self):
+        """关闭调度器"""
+        change_bus.unsubscribe(self._on_changes)
+        self._changes.put(None)
+        self._sync_thread.join(timeout=5)
+        if self.scheduler.running:
+            self.scheduler.shutdown()
+            logger.info("调度器已关闭")
 
-    def update_job(self, schedule_id):
-        """更新一个调度任务"""
-        try:
-            schedule = schedule_crud.get(self.db, schedule_id)
-            if not schedule:
-                logger.warning(f"调度任务ID {schedule_id} 不存在")
-                return
 
-            # 如果调度任务不再活跃，则移除它
-            if not schedule.is_active:
-                self.remove_job(schedule_id)
-                return
+def spider_active_runs(db, spider_id) -> int:
+    """统计爬虫尚未结束的运行数：本机执行引擎中已提交的、运行队列中的以及日志中运行中的"""
+    active = execution_log_crud.count_running(db, spider_id)
+    if settings.EXECUTION_BACKEND == "queue":
+        # 已被领取的任务同时有一条运行中的日志，这里只补充还在排队的部分
+        active = max(active, run_queue_crud.count_active(db, spider_id))
+    else:
+        active = max(active, get_executor().active_count(spider_id))
+    return active
 
-            # 否则，重新添加它（会替换现有的）
-            self.add_job(schedule)
-        except Exception as e:
-            logger.error(f"更新调度任务失败: {str(e)}")
 
-    def get_environment_variables(self, spider_id):
-        """获取爬虫的环境变量"""
+class OverlapGuard:
+    """按爬虫的重叠策略决定一次触发是立即运行、跳过还是延后
+
+    - allow: 不做限制，直接提交（执行引擎仍按单爬虫并发上限排队）
+    - skip: 上一次运行未结束时跳过本次触发
+    - queue_one: 最多延后一次触发，等上一次运行结束后执行，其余触发跳过
+    - coalesce: 未结束期间的多次触发合并为一次，保留最新的一次
+
+    被跳过或合并的触发只写一条 skipped/coalesced 状态的执行日志，不启动进程。
+    延后的触发保存在内存中，由调度器的维护任务定期检查并提交。
+
+    同一爬虫的触发从检查运行中的数量到提交完成一直持有该爬虫的锁，在不同调度线程中
+    同时触发时不会都认为没有运行中的而同时启动。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 爬虫ID -> 被延后触发的调度ID
+        self._deferred: Dict[int, Optional[int]] = {}
+        self._spider_locks: Dict[int, threading.Lock] = {}
+
+    def _spider_lock(self, spider_id) -> threading.Lock:
+        with self._lock:
+            return self._spider_locks.setdefault(spider_id, threading.Lock())
+
+    def fire(self, spider_id, schedule_id=None):
+        """处理一次调度触发：按重叠策略检查，需要立即运行时提交"""
+        with self._spider_lock(spider_id):
+            if self.admit(spider_id, schedule_id):
+                dispatch_run(spider_id, schedule_id)
+
+    def admit(self, spider_id, schedule_id=None) -> bool:
+        """判断本次触发是否应立即提交，调用方需持有该爬虫的锁直到提交完成"""
+        db = get_db_session()
         try:
-            from app.db.crud import spider_environment_crud, environment_variable_crud
-            # 获取爬虫关联的环境
-            spider_envs = spider_environment_crud.get_by_spider(self.db, spider_id)
-            env_vars = {}
-
-            # 获取每个环境的变量
-            for se in spider_envs:
-                variables = environment_variable_crud.get_by_environment(self.db, se.environment_id)
-                for var in variables:
-                    env_vars[var.key] = var.value
-
-            return env_vars
+            spider = spider_crud.get(db, spider_id)
+            policy = (spider.overlap_policy if spider else None) or "allow"
+            if policy == "allow":
+                return True
+
+            with self._lock:
+                deferred = spider_id in self._deferred
+            if not deferred and not spider_active_runs(db, spider_id):
+                return True
+
+            if policy == "skip":
+                execution_log_crud.record_status(db, spider_id, "skipped", "上一次运行尚未结束，按重叠策略跳过本次触发")
+                logger.info(f"爬虫ID {spider_id} 上一次运行尚未结束，跳过本次触发")
+                return False
+
+            with self._lock:
+                replaced = spider_id in self._deferred
+                if policy == "queue_one" and replaced:
+                    status, message = "skipped", "已有一次触发在等待执行，按重叠策略跳过本次触发"
+                else:
+                    self._deferred[spider_id] = schedule_id
+                    status, message = "coalesced", "等待期间有新的触发，本次触发已合并到最新一次"
+            if replaced:
+                execution_log_crud.record_status(db, spider_id, status, message)
+                logger.info(f"爬虫ID {spider_id} 的一次触发已按重叠策略{'跳过' if status == 'skipped' else '合并'}")
+            else:
+                logger.info(f"爬虫ID {spider_id} 上一次运行尚未结束，延后本次触发")
+            return False
         except Exception as e:
-            logger.error(f"获取环境变量失败: {str(e)}")
-            return {}
+            # 检查失败时不阻止运行，保持调度的可用性
+            logger.error(f"检查爬虫重叠策略失败: {str(e)}")
+            return True
+        finally:
+            db.close()
+
+    def drain(self):
+        """提交上一次运行已结束的延后触发"""
+        with self._lock:
+            pending = dict(self._deferred)
+        if not pending:
+            return
+        db = get_db_session()
+        try:
+            for spider_id in pending:
+                with self._spider_lock(spider_id):
+                    if spider_active_runs(db, spider_id):
+                        continue
+                    with self._lock:
+                        if spider_id not in self._deferred:
+                            continue
+                        # 取出时使用最新的调度ID（coalesce 策略下可能已被替换）
+                        schedule_id = self._deferred.pop(spider_id)
+                    logger.info(f"爬虫ID {spider_id} 上一次运行已结束，执行延后的触发")
+                    dispatch_run(spider_id, schedule_id)
+        finally:
+            db.close()
 
-    def shutdown(self):
-        """关闭调度器"""
-        if self.scheduler.running:
-            self.scheduler.shutdown()
-            logger.info("调度器已关闭")
+    def deferred(self) -> Dict[int, Optional[int]]:
+        with self._lock:
+            return dict(self._deferred)
+
+
+overlap_guard = OverlapGuard()
 
 
 # 独立的爬虫执行函数，不依赖于SpiderScheduler实例
-def run_spider_job(spider_id):
-    """执行爬虫脚本（同步版本）"""
-    asyncio.run(run_spider_async(spider_id))
-
-
-async def run_spider_async(spider_id):
-    """异步执行爬虫脚本"""
-    # 创建新的数据库会话
-    db = get_db_session()
-    try:
-        # 获取爬虫信息
-        spider = spider_crud.get(db, spider_id)
-        if not spider or not spider.is_active:
-            logger.warning(f"爬虫ID {spider_id} 不存在或未激活，跳过执行")
-            return
+def run_spider_job(spider_id, schedule_id=None):
+    """调度触发入口：按重叠策略检查后提交运行，调度器线程立即返回"""
+    overlap_guard.fire(spider_id, schedule_id)
 
-        # 创建执行日志
-        log_data = {
-            "spider_id": spider_id,
-            "start_time": datetime.now(),
-            "status": "running",
-        }
-        log_entry = execution_log_crud.create(db, obj_in=log_data)
-        logger.info(f"开始执行爬虫: {spider.name} (ID: {spider_id})")
-
-        # 获取环境变量
-        env_vars = get_environment_variables(db, spider_id)
-        env = os.environ.copy()
-        env.update(env_vars)
-
-        # 执行爬虫脚本
-        script_path = os.path.abspath(spider.script_path)
-        if not os.path.exists(script_path):
-            error_msg = f"爬虫脚本不存在: {script_path}"
-            update_log(db, log_entry.id, "failed", error_message=error_msg)
-            return
 
-        # 获取虚拟环境python路径
-        venv_python = os.path.abspath(os.path.join(os.getcwd(), '.venv', 'Scripts', 'python.exe'))
-        if not os.path.exists(venv_python):
-            logger.warning(f"虚拟环境Python解释器未找到: {venv_python}")
-            venv_python = 'python'
-
-        # 执行脚本并捕获输出
-        process = subprocess.Popen(
-            [venv_python, script_path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            env=env,
-            text=True
-        )
-        stdout, stderr = process.communicate()
-
-        # 更新执行日志
-        if process.returncode == 0:
-            update_log(db, log_entry.id, "success", log_content=stdout)
-            logger.info(f"爬虫执行成功: {spider.name} (ID: {spider_id})")
-        else:
-            update_log(db, log_entry.id, "failed", log_content=stdout, error_message=stderr)
-            logger.error(f"爬虫执行失败: {spider.name} (ID: {spider_id})\n错误: {stderr}")
-
-    except Exception as e:
-        logger.error(f"执行爬虫时发生错误: {str(e)}")
-        # 如果已创建日志条目，则更新它
-        if 'log_entry' in locals() and log_entry:
-            update_log(db, log_entry.id, "failed", error_message=str(e))
-    finally:
-        # 关闭数据库会话
-        db.close()
-
-
-def update_log(db, log_id, status, log_content=None, error_message=None):
-    """更新执行日志"""
-    try:
-        update_data = {
-            "status": status,
-            "end_time": datetime.now()
-        }
-        if log_content:
-            update_data["log_content"] = log_content
-        if error_message:
-            update_data["error_message"] = error_message
-
-        execution_log_crud.update(db, db_obj=execution_log_crud.get(db, log_id), obj_in=update_data)
-    except Exception as e:
-        logger.error(f"更新执行日志失败: {str(e)}")
-
-
-def get_environment_variables(db, spider_id):
-    """获取爬虫的环境变量"""
-    try:
-        from app.db.crud import spider_environment_crud, environment_variable_crud
-        # 获取爬虫关联的环境
-        spider_envs = spider_environment_crud.get_by_spider(db, spider_id)
-        env_vars = {}
-
-        # 获取每个环境的变量
-        for se in spider_envs:
-            variables = environment_variable_crud.get_by_environment(db, se.environment_id)
-            for var in variables:
-                env_vars[var.key] = var.value
-
-        return env_vars
-    except Exception as e:
-        logger.error(f"获取环境变量失败: {str(e)}")
-        return {}
+def drain_deferred_runs():
+    """调度器维护任务：提交被延后的触发"""
+    overlap_guard.drain()
+
+
+def dispatch_run(spider_id, schedule_id=None):
+    """将爬虫运行提交到执行引擎或运行队列"""
+    if settings.EXECUTION_BACKEND == "queue":
+        _, priority, _ = resolve_run_class(spider_id, schedule_id)
+        db = get_db_session()
+        try:
+            run_queue_crud.enqueue(db, spider_id, schedule_id, priority=priority)
+        finally:
+            db.close()
+        return
+    get_executor().submit(spider_id, schedule_id=schedule_id)
 
 
 # 全局调度器实例
 _scheduler = None
 
 
-def init_scheduler(db_session):
-    """初始化调度器"""
+def init_scheduler():
+    """初始化调度器
+
+    调度器在多个线程中访问数据库，每次访问都创建独立的会话，不共享调用方的会话。
+    """
     global _scheduler
     if _scheduler is None:
-        _scheduler = SpiderScheduler(db_session)
+        if settings.EXECUTION_BACKEND == "local":
+            # 本机执行时，服务重启前未结束的运行已随进程一起中断
+            db = get_db_session()
+            try:
+                interrupted = execution_log_crud.mark_interrupted(db)
+            finally:
+                db.close()
+            if interrupted:
+                logger.warning(f"已将 {interrupted} 条中断的运行日志标记为失败")
+        _scheduler = SpiderScheduler()
         _scheduler.load_schedules()
     return _scheduler
 
@@ -2,9 +2,9 @@ import os
 import re
 import logging
 from pathlib import Path
-from sqlalchemy.orm import Session
 from app.db.crud import spider_crud
 from app.models import Spider
+from app.models.database import get_db_session
 from apscheduler.schedulers.background import BackgroundScheduler
 
 # 配置日志
@@ -14,13 +14,11 @@ logger = logging.getLogger(__name__)
 class ScriptScanner:
     """脚本扫描器，用于自动扫描scripts目录下的Python文件并更新到数据库中"""
     
-    def __init__(self, db_session: Session):
+    def __init__(self):
         """初始化脚本扫描器
-        
-        Args:
-            db_session: 数据库会话
+
+        定时扫描在调度器的线程中运行，每次扫描使用独立的数据库会话。
         """
-        self.db = db_session
         self.scripts_dir = Path("scripts")
         self.scheduler = None
     
@@ -42,6 +40,7 @@ class ScriptScanner:
     
     def scan_scripts(self):
         """扫描脚本目录，更新数据库中的脚本信息"""
+        db = get_db_session()
         try:
             logger.info(f"开始扫描脚本目录: {self.scripts_dir}")
             
@@ -50,10 +49,10 @@ class ScriptScanner:
             logger.info(f"找到 {len(script_files)} 个Python脚本文件")
             
             # 获取数据库中已有的脚本记录
-            existing_spiders = spider_crud.get_multi(self.db)
-            existing_paths = {spider.script_path for spider in existing_spiders}
+            existing_paths = {script_path for (script_path,) in db.query(Spider.script_path)}
             
-            # 处理每个脚本文件
+            # 处理每个脚本文件，新脚本收集后一次批量写入
+            new_spiders_data = []
             for script_file in script_files:
                 script_path = str(script_file.absolute())
                 
@@ -74,8 +73,10 @@ class ScriptScanner:
                     "user_id": 1  # 默认用户ID，可以根据实际情况调整
                 }
                 
-                # 保存到数据库
-                new_spider = spider_crud.create(self.db, obj_in=spider_data)
+                new_spiders_data.append(spider_data)
+
+            # 保存到数据库（一个事务）
+            for new_spider in spider_crud.create_many(db, new_spiders_data, returning=True):
                 logger.info(f"已添加新爬虫: {new_spider.name} (ID: {new_spider.id})")
             
             logger.info("脚本扫描完成")
@@ -83,6 +84,8 @@ class ScriptScanner:
         except Exception as e:
             logger.error(f"扫描脚本目录失败: {str(e)}")
             return False
+        finally:
+            db.close()
     
     def extract_script_metadata(self, script_file: Path) -> dict:
         """从脚本文件中提取元数据
@@ -135,16 +138,13 @@ class ScriptScanner:
             }
 
 # 初始化脚本扫描器
-def init_script_scanner(db_session: Session):
+def init_script_scanner():
     """初始化脚本扫描器
     
-    Args:
-        db_session: 数据库会话
-        
     Returns:
         初始化后的脚本扫描器实例
     """
-    scanner = ScriptScanner(db_session)
+    scanner = ScriptScanner()
     # 立即执行一次扫描
     scanner.scan_scripts()
     # 启动定时扫描任务
@@ -0,0 +1,165 @@
+import bisect
+import heapq
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from apscheduler.triggers.base import BaseTrigger
+
+from app.services.triggers import build_trigger
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TimelineSchedule:
+    """时间线中一个调度任务的信息"""
+    schedule_id: int
+    spider_id: int
+    spider_name: str
+    trigger: BaseTrigger
+    last_fire: Optional[datetime] = None  # 已计算到的最后一次触发时间
+
+
+class FireTimeline:
+    """活跃调度任务的未来触发时间索引
+
+    为每个调度任务预先计算未来 horizon 内最多 per_schedule 次触发时间，所有触发按时间
+    保存在一个有序列表中，查询某个时间段时用二分查找定位，不需要逐个解析 cron 表达式。
+    调度任务增删改时只更新受影响任务的条目（新条目排序后与原列表归并）；
+    roll() 定期丢弃已过去的条目并向后补齐。
+    """
+
+    def __init__(self, horizon: timedelta, per_schedule: int):
+        self.horizon = horizon
+        self.per_schedule = per_schedule
+        self._lock = threading.Lock()
+        self._entries: List[Tuple[datetime, int]] = []  # (触发时间, 调度ID)，按时间排序
+        self._schedules: Dict[int, TimelineSchedule] = {}
+        self._counts: Dict[int, int] = {}
+        self.built_until: Optional[datetime] = None
+
+    def _compute(self, item: TimelineSchedule, until: datetime, limit: int) -> List[datetime]:
+        times = []
+        previous = item.last_fire
+        now = previous or datetime.now().astimezone()
+        while len(times) < limit:
+            fire_time = item.trigger.get_next_fire_time(previous, now)
+            if fire_time is None or fire_time > until:
+                break
+            times.append(fire_time)
+            previous = now = fire_time
+        if times:
+            item.last_fire = times[-1]
+        return times
+
+    def _extend(self, item: TimelineSchedule, until: datetime) -> List[Tuple[datetime, int]]:
+        """计算调度任务需要补充的触发条目（未排序合并）"""
+        limit = self.per_schedule - self._counts.get(item.schedule_id, 0)
+        if limit <= 0:
+            return []
+        times = self._compute(item, until, limit)
+        self._counts[item.schedule_id] = self._counts.get(item.schedule_id, 0) + len(times)
+        return [(fire_time, item.schedule_id) for fire_time in times]
+
+    def _merge(self, new_entries: List[Tuple[datetime, int]]):
+        if new_entries:
+            new_entries.sort()
+            self._entries = list(heapq.merge(self._entries, new_entries))
+
+    def rebuild(self, schedules):
+        """根据 (调度, 爬虫) 列表重建整个时间线"""
+        until = datetime.now().astimezone() + self.horizon
+        with self._lock:
+            self._entries = []
+            self._schedules = {}
+            self._counts = {}
+            new_entries = []
+            for schedule, spider in schedules:
+                try:
+                    item = TimelineSchedule(schedule.id, spider.id, spider.name, build_trigger(schedule))
+                except ValueError as e:
+                    logger.warning(f"调度任务 {schedule.id} 的cron表达式无效，不加入时间线: {str(e)}")
+                    continue
+                self._schedules[schedule.id] = item
+                new_entries.extend(self._extend(item, until))
+            self._merge(new_entries)
+            self.built_until = until
+        logger.info(f"触发时间线已重建，调度任务: {len(self._schedules)}，触发次数: {len(self._entries)}")
+
+    def apply(self, upserts, removed_ids):
+        """批量更新：重新计算 (调度, 爬虫) 列表中调度任务的触发时间，并移除 removed_ids"""
+        until = datetime.now().astimezone() + self.horizon
+        items = []
+        for schedule, spider in upserts:
+            try:
+                items.append(TimelineSchedule(schedule.id, spider.id, spider.name, build_trigger(schedule)))
+            except ValueError as e:
+                logger.warning(f"调度任务 {schedule.id} 的cron表达式无效，不加入时间线: {str(e)}")
+        stale = set(removed_ids) | {schedule.id for schedule, _ in upserts}
+        with self._lock:
+            if any(self._counts.get(schedule_id) for schedule_id in stale):
+                self._entries = [entry for entry in self._entries if entry[1] not in stale]
+            for schedule_id in stale:
+                self._counts.pop(schedule_id, None)
+                self._schedules.pop(schedule_id, None)
+            new_entries = []
+            for item in items:
+                self._schedules[item.schedule_id] = item
+                new_entries.extend(self._extend(item, until))
+            self._merge(new_entries)
+
+    def roll(self):
+        """丢弃已过去的触发，并为每个调度任务向后补齐到 horizon"""
+        now = datetime.now().astimezone()
+        until = now + self.horizon
+        with self._lock:
+            index = bisect.bisect_left(self._entries, (now, -1))
+            for _, schedule_id in self._entries[:index]:
+                self._counts[schedule_id] -= 1
+            del self._entries[:index]
+            new_entries = []
+            for item in self._schedules.values():
+                new_entries.extend(self._extend(item, until))
+            self._merge(new_entries)
+            self.built_until = until
+
+    def complete_until(self) -> Optional[datetime]:
+        """时间线完整覆盖到的时间：受 per_schedule 限制的调度任务只计算到其最后一次触发"""
+        with self._lock:
+            capped = [
+                item.last_fire for item in self._schedules.values()
+                if item.last_fire and self._counts.get(item.schedule_id, 0) >= self.per_schedule
+            ]
+            return min(capped + [self.built_until]) if self.built_until else None
+
+    def query(self, start: datetime, end: datetime) -> List[Tuple[datetime, TimelineSchedule]]:
+        """获取 [start, end) 内的所有触发"""
+        with self._lock:
+            low = bisect.bisect_left(self._entries, (start, -1))
+            high = bisect.bisect_left(self._entries, (end, -1))
+            return [(fire_time, self._schedules[schedule_id]) for fire_time, schedule_id in self._entries[low:high]]
+
+
+def predict_concurrency(fires: List[Tuple[datetime, float]], window_start: datetime) -> Tuple[int, Optional[datetime]]:
+    """按每次触发的预计运行时长，计算 window_start 之后同时运行数的峰值及其出现时间
+
+    window_start 之前触发、预计仍在运行的触发按从 window_start 开始计入。
+    """
+    events = []
+    for fire_time, duration in fires:
+        end = fire_time + timedelta(seconds=duration)
+        if end <= window_start:
+            continue
+        events.append((max(fire_time, window_start), 1))
+        events.append((end, -1))
+    # 同一时刻先结束再开始
+    events.sort(key=lambda event: (event[0], event[1]))
+    peak, peak_at, current = 0, None, 0
+    for moment, delta in events:
+        current += delta
+        if current > peak:
+            peak, peak_at = current, moment
+    return peak, peak_at
@@ -0,0 +1,153 @@
+import hashlib
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from apscheduler.triggers.cron import CronTrigger
+
+from app.core.config import settings
+
+# 各字段可用于 H 的取值范围：分、时、日、月、星期（日只取 1-28，保证每个月都会触发）
+HASH_FIELD_RANGES = [(0, 59), (0, 23), (1, 28), (1, 12), (0, 6)]
+_HASH_TOKEN = re.compile(r"^H(?:\((\d+)-(\d+)\))?(?:/(\d+))?$")
+
+
+def stable_hash(key: str) -> int:
+    """与进程无关的稳定哈希（内置 hash 对字符串是随机化的）"""
+    return int(hashlib.sha1(key.encode("utf-8")).hexdigest()[:12], 16)
+
+
+def expand_hash_expression(expr: str, key: Optional[str]) -> str:
+    """展开 cron 表达式中的 H 语法（与 Jenkins 相同），同一个 key 总是得到相同的结果
+
+    支持 H、H/步长、H(起-止)、H(起-止)/步长，可与普通取值混合使用逗号分隔，例如
+    "H * * * *" 在每小时内选一个固定分钟，"H/15 * * * *" 每 15 分钟一次但起点错开。
+    key 为 None 时 H 取范围的起点，即不错峰时的触发时间。
+    """
+    fields = expr.split()
+    if len(fields) != 5:
+        raise ValueError(f"cron表达式应包含 5 个字段，实际为 {len(fields)} 个")
+
+    expanded = []
+    for index, (field, (low, high)) in enumerate(zip(fields, HASH_FIELD_RANGES)):
+        parts = []
+        for part in field.split(","):
+            match = _HASH_TOKEN.match(part)
+            if not match:
+                parts.append(part)
+                continue
+            start, end, step = match.groups()
+            start = int(start) if start is not None else low
+            end = int(end) if end is not None else high
+            if start > end:
+                raise ValueError(f"H 的取值范围无效: {part}")
+            value = stable_hash(f"{key}:{index}") if key is not None else 0
+            if step:
+                step = int(step)
+                parts.append(f"{start + value % min(step, end - start + 1)}-{end}/{step}")
+            else:
+                parts.append(str(start + value % (end - start + 1)))
+        expanded.append(",".join(parts))
+    return " ".join(expanded)
+
+
+class OffsetCronTrigger(CronTrigger):
+    """在 cron 触发时间的基础上整体后移固定秒数的触发器
+
+    偏移是确定的（不同于 CronTrigger 的随机 jitter），重启后下次触发时间不变。
+    触发器会随任务持久化到数据库，偏移量一并写入序列化状态。
+    """
+
+    def __init__(self, offset: int = 0, **kwargs):
+        super().__init__(**kwargs)
+        self.offset = offset
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        shift = timedelta(seconds=self.offset)
+        previous = previous_fire_time - shift if previous_fire_time else None
+        next_fire_time = super().get_next_fire_time(previous, now - shift)
+        return next_fire_time + shift if next_fire_time else None
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state["offset"] = self.offset
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.offset = state.get("offset", 0)
+
+    def __str__(self):
+        return f"{super().__str__()}+{self.offset}s"
+
+
+def spread_offset(schedule) -> int:
+    """调度任务的确定性启动偏移秒数，未开启错峰时为 0"""
+    spread = schedule.spread_seconds if schedule.spread_seconds is not None else settings.SCHEDULER_DEFAULT_SPREAD_SECONDS
+    if not spread or spread <= 0:
+        return 0
+    return stable_hash(f"schedule:{schedule.id}:offset") % (spread + 1)
+
+
+def build_trigger(schedule) -> CronTrigger:
+    """根据调度配置创建触发器：展开 H 语法，并按 spread_seconds 错开启动时间"""
+    expr = expand_hash_expression(schedule.cron_expression, f"schedule:{schedule.id}")
+    offset = spread_offset(schedule)
+    if offset:
+        trigger = OffsetCronTrigger.from_crontab(expr)
+        trigger.offset = offset
+        return trigger
+    return CronTrigger.from_crontab(expr)
+
+
+def validate_cron_expression(expr: str) -> Optional[str]:
+    """校验 cron 表达式（支持 H 语法），有效时返回 None，否则返回错误信息"""
+    try:
+        CronTrigger.from_crontab(expand_hash_expression(expr, None))
+        return None
+    except ValueError as e:
+        return str(e)
+
+
+def fire_times(trigger: CronTrigger, start: datetime, end: datetime, limit: int = 10000) -> List[datetime]:
+    """计算触发器在 [start, end) 内的触发时间"""
+    times = []
+    previous = None
+    now = start
+    while len(times) < limit:
+        next_fire_time = trigger.get_next_fire_time(previous, now)
+        if next_fire_time is None or next_fire_time >= end:
+            break
+        times.append(next_fire_time)
+        previous = now = next_fire_time
+    return times
+
+
+def fire_histogram(schedules, start: datetime, end: datetime, bucket_seconds: int) -> Dict:
+    """统计时间窗口内各时间桶的触发次数，同时给出未错峰时的分布便于对比"""
+    bucket_count = max(int((end - start).total_seconds() // bucket_seconds), 1)
+    spread = [0] * bucket_count
+    unspread = [0] * bucket_count
+    for schedule in schedules:
+        trigger = build_trigger(schedule)
+        local_start = start.astimezone(trigger.timezone)
+        local_end = end.astimezone(trigger.timezone)
+        baseline = CronTrigger.from_crontab(expand_hash_expression(schedule.cron_expression, None))
+        for counts, t in ((spread, trigger), (unspread, baseline)):
+            for fire_time in fire_times(t, local_start, local_end):
+                index = int((fire_time - local_start).total_seconds() // bucket_seconds)
+                if 0 <= index < bucket_count:
+                    counts[index] += 1
+
+    return {
+        "start": start,
+        "end": end,
+        "bucket_seconds": bucket_seconds,
+        "total_fires": sum(spread),
+        "peak": max(spread),
+        "peak_without_spread": max(unspread),
+        "buckets": [
+            {"start": start + timedelta(seconds=i * bucket_seconds), "count": spread[i], "count_without_spread": unspread[i]}
+            for i in range(bucket_count)
+        ],
+    }
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, List, Optional
+
+from app.services.process_control import spawn_process
+from app.services.warm_worker import READY_MARKER
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "warm_worker.py")
+
+
+@dataclass
+class WarmWorker:
+    """一个已完成预热、等待分派的解释器进程"""
+    process: asyncio.subprocess.Process
+    ready_seconds: float
+    import_seconds: float
+
+
+class WarmWorkerPool:
+    """预热解释器进程池
+
+    预先启动 size 个已经导入常用模块的 Python 进程，每次运行从池中取出一个进程，
+    通过标准输入下发脚本路径和本次运行的环境变量，进程随后以 __main__ 身份执行脚本。
+    每个进程只执行一次，取出后立即在后台补充新的进程，保证运行之间互不影响。
+    必须在执行引擎的事件循环中使用。
+    """
+
+    def __init__(self, python: str, size: int, preload: List[str], before_reap: Optional[Callable[[], None]] = None):
+        self.python = python
+        self.size = size
+        self.preload = preload
+        # 预热进程退出后、回收前调用（用于最后一次资源采样）
+        self.before_reap = before_reap
+        self._idle: Deque[WarmWorker] = deque()
+        self._spawning = 0
+        self._closed = False
+        # 统计信息
+        self.dispatched = 0
+        self.cold_fallbacks = 0
+        self.spawn_failures = 0
+        self._ready_total = 0.0
+        self._ready_count = 0
+        self._dispatch_total = 0.0
+
+    async def start(self):
+        """启动进程池并等待首批进程就绪"""
+        self._spawning += self.size
+        await asyncio.gather(*(self._spawn() for _ in range(self.size)))
+        logger.info(f"预热进程池已启动，进程数: {len(self._idle)}，预加载模块: {','.join(self.preload)}")
+
+    def _replenish(self):
+        while not self._closed and len(self._idle) + self._spawning < self.size:
+            self._spawning += 1
+            asyncio.get_running_loop().create_task(self._spawn())
+
+    async def _spawn(self):
+        """启动一个预热进程，调用前需先增加 _spawning 计数"""
+        started = time.perf_counter()
+        process = None
+        try:
+            process = await spawn_process(
+                self.python, WORKER_SCRIPT, ",".join(self.preload), stdin=True, before_reap=self.before_reap
+            )
+            line = (await process.stdout.readline()).decode("utf-8", errors="replace")
+            if not line.startswith(READY_MARKER):
+                raise RuntimeError(f"预热进程未正常就绪: {line.strip()}")
+            info = json.loads(line[len(READY_MARKER):])
+            if info["failed"]:
+                logger.warning(f"预热进程无法导入模块: {','.join(info['failed'])}")
+            ready_seconds = time.perf_counter() - started
+            self._ready_total += ready_seconds
+            self._ready_count += 1
+            if self._closed:
+                process.kill()
+                return
+            self._idle.append(WarmWorker(process, ready_seconds, info["import_seconds"]))
+        except Exception as e:
+            self.spawn_failures += 1
+            logger.error(f"启动预热进程失败: {str(e)}")
+            if process and process.returncode is None:
+                process.kill()
+        finally:
+            self._spawning -= 1
+
+    async def launch(self, script_path: str, env: dict) -> Optional[asyncio.subprocess.Process]:
+        """把一次运行分派给预热进程，没有空闲进程时返回 None，由调用方走冷启动路径"""
+        started = time.perf_counter()
+        worker = None
+        while self._idle:
+            candidate = self._idle.popleft()
+            if candidate.process.returncode is None:
+                worker = candidate
+                break
+        self._replenish()
+        if worker is None:
+            self.cold_fallbacks += 1
+            return None
+
+        request = json.dumps({"script_path": script_path, "env": env}) + "\n"
+        worker.process.stdin.write(request.encode("utf-8"))
+        await worker.process.stdin.drain()
+        worker.process.stdin.close()
+        self.dispatched += 1
+        self._dispatch_total += time.perf_counter() - started
+        return worker.process
+
+    def stats(self) -> dict:
+        """获取进程池统计
+
+        avg_worker_ready_seconds 是预热进程在后台启动到就绪的耗时，不在运行的启动路径上；
+        运行实际的启动耗时（预热与冷启动的对比）见执行引擎统计中的 launch。
+        """
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "spawning": self._spawning,
+            "dispatched": self.dispatched,
+            "cold_fallbacks": self.cold_fallbacks,
+            "spawn_failures": self.spawn_failures,
+            "avg_worker_ready_seconds": self._ready_total / self._ready_count if self._ready_count else 0.0,
+            "avg_warm_dispatch_seconds": self._dispatch_total / self.dispatched if self.dispatched else 0.0,
+        }
+
+    async def close(self):
+        """关闭进程池，结束所有空闲进程"""
+        self._closed = True
+        while self._idle:
+            worker = self._idle.popleft()
+            if worker.process.returncode is None:
+                worker.process.kill()
+                await worker.process.wait()
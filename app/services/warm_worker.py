@@ -0,0 +1,53 @@
+"""
+预热解释器进程
+
+由预热进程池以脚本方式启动（不导入 app 包，避免污染爬虫脚本的运行环境）。
+启动后先导入常用模块，然后在标准输出写入一行就绪标记，
+再从标准输入读取一次运行请求，应用环境变量后在当前进程中执行爬虫脚本。
+每个进程只执行一次脚本，执行完成即退出。
+"""
+import importlib
+import json
+import os
+import runpy
+import sys
+import time
+
+READY_MARKER = "__WARM_WORKER_READY__"
+
+
+def preload(modules):
+    """导入常用模块，返回导入耗时和导入失败的模块"""
+    started = time.perf_counter()
+    failed = []
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            failed.append(name)
+    return time.perf_counter() - started, failed
+
+
+def main():
+    modules = [m for m in (sys.argv[1] if len(sys.argv) > 1 else "").split(",") if m]
+    import_seconds, failed = preload(modules)
+    sys.stdout.write(f"{READY_MARKER} {json.dumps({'import_seconds': import_seconds, 'failed': failed})}\n")
+    sys.stdout.flush()
+
+    line = sys.stdin.readline()
+    if not line:
+        return 0
+    request = json.loads(line)
+
+    # 按本次运行的配置替换环境变量和命令行参数
+    os.environ.clear()
+    os.environ.update(request["env"])
+    script_path = request["script_path"]
+    sys.argv = [script_path]
+    sys.path[0] = os.path.dirname(script_path)
+    runpy.run_path(script_path, run_name="__main__")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -106,7 +106,7 @@ async function loadDashboardData(doc = document) {
         document.getElementById('schedule-count').textContent = schedules.length;
         
         // 获取最近的执行日志（倒序排列）
-        const logsResponse = await fetch('/api/execution-logs/?limit=5');
+        const logsResponse = await fetch('/api/execution-logs/?limit=5&expand=spider');
         const logs = await logsResponse.json();
         
         // 计算成功率
@@ -871,7 +871,7 @@ async function loadLogs(page = 1) {
         const skip = (page - 1) * pageSize;
         
         // 获取日志数据
-        const response = await fetch(`/api/execution-logs/?skip=${skip}&limit=${pageSize}`);
+        const response = await fetch(`/api/execution-logs/?skip=${skip}&limit=${pageSize}&expand=spider`);
         const logs = await response.json();
         
         // 获取日志总数
@@ -0,0 +1,125 @@
+"""
+爬虫工作节点
+
+从运行队列中以限时租约领取任务并在本机执行，执行状态写回 execution_logs。
+运行中的任务定期发送心跳延长租约；节点崩溃后租约过期，任务会被其他节点重新领取。
+
+用法: python -m app.worker [--name NAME] [--concurrency N]
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+
+from app.core.config import settings
+from app.db.crud import run_queue_crud, execution_log_crud
+from app.models.database import init_db, get_db_session
+from app.services.environment_cache import environment_cache
+from app.services.executor import SpiderExecutor, update_log
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """工作节点，负责领取任务、维持租约并把任务交给本地执行引擎"""
+
+    def __init__(self, name: str, concurrency: int):
+        self.name = name
+        self.executor = SpiderExecutor(
+            max_concurrency=concurrency,
+            per_spider_limit=settings.EXECUTOR_PER_SPIDER_LIMIT,
+            spider_limits=settings.EXECUTOR_SPIDER_LIMITS,
+            high_priority_reserved=settings.EXECUTOR_HIGH_PRIORITY_RESERVED,
+        )
+        self._stopping = threading.Event()
+
+    def stop(self, *args):
+        logger.info(f"工作节点 {self.name} 正在停止")
+        self._stopping.set()
+
+    def run(self):
+        """启动执行引擎和心跳线程，然后循环领取任务，直到收到停止信号"""
+        self.executor.start()
+        if settings.WARM_POOL_SIZE > 0:
+            self.executor.enable_warm_pool(settings.WARM_POOL_SIZE, settings.WARM_POOL_PRELOAD)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="worker-heartbeat", daemon=True)
+        heartbeat.start()
+        logger.info(f"工作节点 {self.name} 已启动，并发上限: {self.executor.max_concurrency}")
+
+        while not self._stopping.is_set():
+            claimed = 0
+            try:
+                claimed = self.claim_once()
+            except Exception as e:
+                logger.error(f"领取任务失败: {str(e)}")
+            if not claimed:
+                self._stopping.wait(settings.WORKER_POLL_INTERVAL)
+
+        # 等待已领取的任务执行完毕，期间心跳线程继续维持租约
+        self.executor.shutdown(timeout=settings.WORKER_LEASE_SECONDS)
+        logger.info(f"工作节点 {self.name} 已停止")
+
+    def claim_once(self) -> int:
+        """按空闲并发数领取一批任务，返回领取数量"""
+        slots = self.executor.free_slots()
+        if not slots:
+            return 0
+        db = get_db_session()
+        try:
+            items = run_queue_crud.claim(db, self.name, settings.WORKER_LEASE_SECONDS, slots)
+            for item in items:
+                # 上一次尝试的节点已失联，先把遗留的执行日志标记为失败
+                if item.execution_log_id is not None:
+                    log = execution_log_crud.get(db, item.execution_log_id)
+                    if log and log.status == "running":
+                        update_log(db, log.id, "failed", error_message="工作节点租约过期，任务已重新排队")
+                if item.attempts > settings.WORKER_MAX_ATTEMPTS:
+                    logger.error(f"运行队列任务 {item.id} 超过最大尝试次数，放弃执行")
+                    run_queue_crud.complete(db, item.id, "failed")
+                    continue
+                self.executor.submit(item.spider_id, schedule_id=item.schedule_id, queue_item_id=item.id)
+                logger.info(f"已领取运行队列任务 {item.id}（爬虫ID {item.spider_id}，第 {item.attempts} 次尝试）")
+            return len(items)
+        finally:
+            db.close()
+
+    def _heartbeat_loop(self):
+        while self.executor.loop is not None and not self.executor.loop.is_closed():
+            item_ids = self.executor.active_queue_items()
+            if item_ids:
+                db = get_db_session()
+                try:
+                    run_queue_crud.heartbeat(db, self.name, item_ids, settings.WORKER_LEASE_SECONDS)
+                    # 取消请求通过运行队列下发给持有租约的节点
+                    for item in run_queue_crud.get_cancel_requested(db, self.name, item_ids):
+                        if item.execution_log_id is not None:
+                            self.executor.cancel(item.execution_log_id)
+                except Exception as e:
+                    logger.error(f"发送心跳失败: {str(e)}")
+                finally:
+                    db.close()
+            time.sleep(settings.WORKER_HEARTBEAT_INTERVAL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="爬虫工作节点")
+    parser.add_argument("--name", default=f"{socket.gethostname()}:{os.getpid()}", help="工作节点名称，默认使用主机名和进程号")
+    parser.add_argument("--concurrency", type=int, default=settings.EXECUTOR_MAX_CONCURRENCY, help="本节点的并发上限")
+    args = parser.parse_args()
+
+    init_db()
+    # 工作节点收不到 API 进程中的环境变量变更事件，缓存按有效期过期
+    environment_cache.ttl = settings.ENV_CACHE_WORKER_TTL
+    worker = Worker(args.name, args.concurrency)
+    signal.signal(signal.SIGINT, worker.stop)
+    signal.signal(signal.SIGTERM, worker.stop)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
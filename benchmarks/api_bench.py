@@ -0,0 +1,219 @@
+"""
+接口延迟基准测试
+
+在临时目录中使用独立的 SQLite 数据库启动服务（uvicorn），模拟多个看板同时轮询
+爬虫列表、执行日志列表和日志详情，同时以固定间隔请求一个不访问数据库的探测接口。
+探测接口的延迟反映事件循环是否被阻塞：路由在事件循环中同步访问数据库时，
+探测请求要排在数据库操作之后。只依赖本机，不访问网络。
+
+用法:
+    python -m benchmarks.api_bench [--clients 16] [--duration 20] [--logs 2000]
+                                   [--output result.json] [--baseline baseline.json]
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.scheduler_bench import REPO_ROOT, percentile
+
+# 轮询的接口，依次循环请求
+POLL_PATHS = [
+    "/api/spiders/?page=1&limit=20", "/api/execution-logs/?page=1&limit=50",
+    "/api/execution-logs/count", "/api/execution-logs/1", "/api/executor/stats",
+]
+PROBE_PATH = "/api/"
+
+# 指标名 -> 数值越大越好为 True
+METRICS = {
+    "probe_p50_seconds": False,
+    "probe_p99_seconds": False,
+    "poll_p50_seconds": False,
+    "poll_p99_seconds": False,
+    "requests_per_second": True,
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed(logs, log_size):
+    """创建执行日志，日志内容较大，使列表和详情接口有一定的数据库和序列化开销
+
+    输出与执行引擎写入时一样保存为压缩的输出块。
+    """
+    from app.db.crud import execution_log_crud
+    from app.models import Spider, ExecutionLog
+    from app.models.database import get_db_session
+
+    db = get_db_session()
+    try:
+        spider = Spider(name="bench-api", script_path="bench.py", user_id=1)
+        db.add(spider)
+        db.flush()
+        started = datetime.now() - timedelta(days=1)
+        entries = [
+            ExecutionLog(
+                spider_id=spider.id, status="success",
+                start_time=started + timedelta(seconds=i), end_time=started + timedelta(seconds=i + 1),
+            )
+            for i in range(logs)
+        ]
+        db.add_all(entries)
+        db.commit()
+        line = "".join(f"{i:06d} " for i in range(64)) + "\n"
+        content = (line * (log_size // len(line) + 1))[:log_size]
+        for entry in entries:
+            execution_log_crud.append_output(db, entry.id, content)
+    finally:
+        db.close()
+
+
+def poll(client, base_url, paths, stop, latencies, errors):
+    index = 0
+    while not stop.is_set():
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            response = client.get(base_url + path)
+            if response.status_code >= 400:
+                errors.append(f"{path}: {response.status_code}")
+        except Exception as e:
+            errors.append(f"{path}: {e}")
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+def probe(client, base_url, stop, interval, latencies, errors):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            client.get(base_url + PROBE_PATH)
+            latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            errors.append(f"{PROBE_PATH}: {e}")
+        time.sleep(interval)
+
+
+def measure(base_url, clients, duration):
+    import httpx
+
+    stop = threading.Event()
+    poll_latencies, probe_latencies, errors = [], [], []
+    with httpx.Client(timeout=30, limits=httpx.Limits(max_connections=clients + 1)) as client:
+        threads = [
+            threading.Thread(target=poll, args=(client, base_url, POLL_PATHS[i % len(POLL_PATHS):] + POLL_PATHS[:i % len(POLL_PATHS)], stop, poll_latencies, errors))
+            for i in range(clients)
+        ]
+        threads.append(threading.Thread(target=probe, args=(client, base_url, stop, 0.05, probe_latencies, errors)))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(poll_latencies),
+        "errors": len(errors),
+        "requests_per_second": len(poll_latencies) / elapsed,
+        "poll_p50_seconds": percentile(poll_latencies, 0.5),
+        "poll_p99_seconds": percentile(poll_latencies, 0.99),
+        "probe_p50_seconds": percentile(probe_latencies, 0.5),
+        "probe_p99_seconds": percentile(probe_latencies, 0.99),
+        "probe_max_seconds": max(probe_latencies) if probe_latencies else 0.0,
+    }
+
+
+def compare(result, baseline, tolerance):
+    """与基线比较，返回退化的指标列表"""
+    regressions = []
+    for name, higher_is_better in METRICS.items():
+        old, new = baseline.get(name), result.get(name)
+        if not old or new is None:
+            continue
+        ratio = new / old
+        if (ratio < 1 - tolerance) if higher_is_better else (ratio > 1 + tolerance):
+            regressions.append(f"{name}: {old:.6g} -> {new:.6g}")
+    return regressions
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="jobmetrics-api-bench-")
+    # 在导入 app 之前完成配置：数据库地址是相对路径，切换目录后即使用临时数据库；
+    # 临时目录中没有 scripts 目录，脚本扫描不会创建爬虫
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(workdir)
+    os.environ["EXECUTION_BACKEND"] = "local"
+
+    import uvicorn
+    from app.models.database import init_db
+
+    logging.getLogger().setLevel(logging.WARNING)
+    result = {"clients": args.clients, "duration": args.duration, "logs": args.logs}
+    server = thread = None
+    try:
+        init_db()
+        seed(args.logs, args.log_size)
+
+        import main
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        deadline = time.time() + 30
+        while not server.started and time.time() < deadline:
+            time.sleep(0.1)
+        if not server.started:
+            raise RuntimeError("服务启动超时")
+
+        result.update(measure(f"http://127.0.0.1:{port}", args.clients, args.duration))
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join(timeout=30)
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="接口延迟基准测试")
+    parser.add_argument("--clients", type=int, default=16, help="并发轮询的客户端数")
+    parser.add_argument("--duration", type=float, default=20, help="测试持续秒数")
+    parser.add_argument("--logs", type=int, default=2000, help="预先创建的执行日志条数")
+    parser.add_argument("--log-size", type=int, default=16 * 1024, help="每条日志内容的字节数")
+    parser.add_argument("--output", help="把结果写入 JSON 文件，可作为之后的基线")
+    parser.add_argument("--baseline", help="与基线结果比较")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的退化比例")
+    args = parser.parse_args()
+
+    result = run(args)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print("以下指标相对基线退化:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+调度链路基准测试
+
+在临时目录中使用独立的 SQLite 数据库和桩爬虫脚本，完整走一遍调度链路：
+批量创建调度任务 -> 调度器启动对账（首次和重启各一次）-> 等待整分钟由 cron 触发一批运行
+-> 统计触发到提交、触发到爬虫进程启动的延迟，以及吞吐、数据库写入延迟和内存占用。
+只依赖本机，不访问网络。
+
+用法:
+    python -m benchmarks.scheduler_bench [--schedules 10000] [--fire 200] [--concurrency 8]
+                                         [--output result.json] [--baseline baseline.json]
+
+指定 --baseline 时与之前保存的结果比较，任一指标退化超过 --tolerance 则以非零状态码退出。
+触发阶段需要等待下一个整分钟，一次完整运行通常需要 1-2 分钟。
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STUB_SCRIPT = 'import time\nprint(f"BENCH_START {time.time()}", flush=True)\n'
+
+# 指标名 -> 数值越大越好为 True
+METRICS = {
+    "seed_seconds": False,
+    "cold_start_seconds": False,
+    "warm_start_seconds": False,
+    "startup_rss_delta_bytes": False,
+    "startup_tracemalloc_peak_bytes": False,
+    "submit_lag_p95_seconds": False,
+    "start_lag_p50_seconds": False,
+    "start_lag_p95_seconds": False,
+    "runs_per_second": True,
+    "db_create_p95_seconds": False,
+    "db_append_p95_seconds": False,
+    "db_finish_p95_seconds": False,
+}
+
+
+def rss_bytes() -> int:
+    """当前进程的常驻内存"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def summarize(prefix, values):
+    return {
+        f"{prefix}_p50_seconds": percentile(values, 0.5),
+        f"{prefix}_p95_seconds": percentile(values, 0.95),
+        f"{prefix}_p99_seconds": percentile(values, 0.99),
+        f"{prefix}_max_seconds": max(values) if values else 0.0,
+    }
+
+
+def seed(db, script_path, schedules, fire):
+    """创建调度任务：fire 个每分钟触发的调度各属于一个爬虫，其余挂在一个不会在测试期间触发的爬虫下"""
+    from app.models import Spider, Schedule
+
+    started = time.perf_counter()
+    fire_spiders = [Spider(name=f"bench-fire-{i}", script_path=script_path, user_id=1) for i in range(fire)]
+    idle_spider = Spider(name="bench-idle", script_path=script_path, user_id=1)
+    db.add_all(fire_spiders + [idle_spider])
+    db.flush()
+    rows = [Schedule(spider_id=spider.id, cron_expression="* * * * *") for spider in fire_spiders]
+    rows += [Schedule(spider_id=idle_spider.id, cron_expression="0 0 1 1 *") for _ in range(schedules - fire)]
+    db.add_all(rows)
+    db.commit()
+    return time.perf_counter() - started, {spider.id for spider in fire_spiders}
+
+
+def start_scheduler():
+    """初始化调度器并完成对账，返回调度器实例和耗时"""
+    from app.services import scheduler as scheduler_module
+
+    scheduler_module._scheduler = None
+    started = time.perf_counter()
+    instance = scheduler_module.init_scheduler()
+    return instance, time.perf_counter() - started
+
+
+def measure_dispatch(instance, fire_spider_ids, timeout):
+    """等待下一个整分钟的触发，统计触发延迟和吞吐"""
+    from apscheduler.events import EVENT_JOB_EXECUTED
+    from app.db.crud import execution_log_crud
+    from app.models import ExecutionLog
+    from app.models.database import get_db_session
+
+    submit_lags = []
+
+    def on_executed(event):
+        if event.job_id.startswith("spider_"):
+            submit_lags.append(time.time() - event.scheduled_run_time.timestamp())
+
+    instance.scheduler.add_listener(on_executed, EVENT_JOB_EXECUTED)
+    now = time.time()
+    fire_at = now - now % 60 + 60
+    deadline = fire_at + timeout
+
+    db = get_db_session()
+    try:
+        finished = []
+        while time.time() < deadline:
+            time.sleep(1)
+            db.expire_all()
+            finished = db.query(ExecutionLog).filter(
+                ExecutionLog.spider_id.in_(fire_spider_ids), ExecutionLog.status != "running"
+            ).all()
+            if len(finished) >= len(fire_spider_ids):
+                break
+
+        start_lags = []
+        for log in finished:
+            execution_log_crud.load_output(db, log)
+            for line in (log.log_content or "").splitlines():
+                if line.startswith("BENCH_START "):
+                    start_lags.append(float(line.split()[1]) - fire_at)
+        last_end = max((log.end_time.timestamp() for log in finished if log.end_time), default=fire_at)
+        return {
+            "fired": len(fire_spider_ids),
+            "completed": len(finished),
+            "succeeded": sum(1 for log in finished if log.status == "success"),
+            "runs_per_second": len(finished) / max(last_end - fire_at, 1e-6),
+            **summarize("submit_lag", submit_lags),
+            **summarize("start_lag", start_lags),
+        }
+    finally:
+        instance.scheduler.remove_listener(on_executed)
+        db.close()
+
+
+def measure_db_writes(spider_id, count):
+    """测量执行日志的创建、追加输出和结束更新的单次耗时"""
+    from app.db.crud import execution_log_crud
+    from app.models.database import get_db_session
+    from app.services.executor import append_output, update_log
+
+    creates, appends, finishes = [], [], []
+    db = get_db_session()
+    try:
+        for _ in range(count):
+            started = time.perf_counter()
+            log = execution_log_crud.create(db, obj_in={"spider_id": spider_id, "start_time": datetime.now(), "status": "running"})
+            creates.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            append_output(log.id, "x" * 4096, None)
+            appends.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            update_log(db, log.id, "success")
+            finishes.append(time.perf_counter() - started)
+    finally:
+        db.close()
+    return {**summarize("db_create", creates), **summarize("db_append", appends), **summarize("db_finish", finishes)}
+
+
+def compare(result, baseline, tolerance):
+    """与基线比较，返回退化的指标列表"""
+    regressions = []
+    for name, higher_is_better in METRICS.items():
+        old, new = baseline.get(name), result.get(name)
+        if not old or new is None:
+            continue
+        ratio = new / old
+        if (ratio < 1 - tolerance) if higher_is_better else (ratio > 1 + tolerance):
+            regressions.append(f"{name}: {old:.6g} -> {new:.6g}")
+    return regressions
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="jobmetrics-bench-")
+    # 在导入 app 之前完成配置：数据库地址是相对路径，切换目录后即使用临时数据库
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(workdir)
+    os.environ.update({
+        "EXECUTION_BACKEND": "local",
+        "EXECUTOR_MAX_CONCURRENCY": str(args.concurrency),
+        "WARM_POOL_SIZE": str(args.warm_pool),
+        "SCHEDULER_MISFIRE_GRACE_TIME": "60",
+    })
+    script_path = os.path.join(workdir, "bench_stub.py")
+    with open(script_path, "w") as f:
+        f.write(STUB_SCRIPT)
+
+    from app.models.database import init_db, get_db_session
+    from app.services.executor import init_executor
+
+    logging.getLogger().setLevel(logging.WARNING)
+    result = {"schedules": args.schedules, "fire": args.fire, "concurrency": args.concurrency}
+    instance = executor = None
+    db = None
+    try:
+        init_db()
+        db = get_db_session()
+        result["seed_seconds"], fire_spider_ids = seed(db, script_path, args.schedules, args.fire)
+
+        rss_before = rss_bytes()
+        tracemalloc.start()
+        executor = init_executor()
+        instance, result["cold_start_seconds"] = start_scheduler()
+        result["startup_tracemalloc_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        result["startup_rss_delta_bytes"] = rss_bytes() - rss_before
+
+        # 模拟重启：调度任务已持久化，对账时应几乎没有写入
+        instance.shutdown()
+        instance, result["warm_start_seconds"] = start_scheduler()
+
+        result.update(measure_dispatch(instance, fire_spider_ids, args.timeout))
+        result.update(measure_db_writes(next(iter(fire_spider_ids)), args.db_writes))
+        result["final_rss_bytes"] = rss_bytes()
+    finally:
+        if instance is not None:
+            instance.shutdown()
+        if executor is not None:
+            executor.shutdown(timeout=10)
+        if db is not None:
+            db.close()
+        os.chdir(REPO_ROOT)
+        if args.keep:
+            print(f"临时目录已保留: {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="调度链路基准测试")
+    parser.add_argument("--schedules", type=int, default=10000, help="调度任务总数")
+    parser.add_argument("--fire", type=int, default=200, help="其中在测试期间触发的调度任务数")
+    parser.add_argument("--concurrency", type=int, default=8, help="执行引擎并发上限")
+    parser.add_argument("--warm-pool", type=int, default=0, help="预热进程池大小")
+    parser.add_argument("--db-writes", type=int, default=500, help="数据库写入延迟的采样次数")
+    parser.add_argument("--timeout", type=float, default=120, help="等待触发的运行全部结束的秒数")
+    parser.add_argument("--output", help="把结果写入 JSON 文件，可作为之后的基线")
+    parser.add_argument("--baseline", help="与基线结果比较")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的退化比例")
+    parser.add_argument("--keep", action="store_true", help="保留临时目录")
+    args = parser.parse_args()
+    if args.fire > args.schedules:
+        parser.error("--fire 不能大于 --schedules")
+
+    result = run(args)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print("以下指标相对基线退化:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 from fastapi import FastAPI
-from app.api.routes import index, spider, schedule, environment, admin, execution_log, websocket
+from app.api.routes import index, spider, schedule, environment, admin, execution_log, websocket, executor
 from contextlib import asynccontextmanager
-from app.models.database import init_db, get_db_session
+from app.models.database import init_db
+from app.services.executor import init_executor
 from app.services.scheduler import init_scheduler
 from app.services.script_scanner import init_script_scanner
+from app.services.log_retention import init_log_retention
 from app import setup_static_files
 
 @asynccontextmanager
@@ -11,18 +13,24 @@ async def lifespan(app: FastAPI):
     print("正在启动爬虫管理平台...")
     # 初始化数据库
     init_db()
-    # 获取数据库会话
-    db = get_db_session()
-    # 初始化调度器
-    scheduler = init_scheduler(db)
+    # 初始化执行引擎
+    spider_executor = init_executor()
+    # 初始化调度器（调度器和脚本扫描器在各自的线程中按需创建数据库会话）
+    scheduler = init_scheduler()
     # 初始化脚本扫描器
-    script_scanner = init_script_scanner(db)
+    script_scanner = init_script_scanner()
+    # 初始化执行日志保留策略（配置了保留天数时定时归档和清理）
+    log_retention = init_log_retention()
     print("爬虫管理平台启动完成")
     yield
+    # 停止执行日志保留策略
+    log_retention.stop_scheduler()
+    # 停止脚本扫描
+    script_scanner.stop_scheduler()
     # 关闭调度器
     scheduler.shutdown()
-    # 关闭数据库连接
-    db.close()
+    # 关闭执行引擎
+    spider_executor.shutdown()
     print("爬虫管理平台已关闭")
 
 app = FastAPI(
@@ -43,6 +51,7 @@ app.include_router(environment.router)
 app.include_router(admin.router)
 app.include_router(execution_log.router)
 app.include_router(websocket.router)
+app.include_router(executor.router)
 
 if __name__ == "__main__":
     import uvicorn
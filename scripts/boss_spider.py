@@ -28,6 +28,8 @@ USER_ID = 1  # 默认用户ID，根据实际情况调整
 
 class Boss:
     def __init__(self):
+        # 已读取的环境变量: 变量名 -> (ETag, 值)，再次读取时服务端未修改则返回 304
+        self._variable_cache = {}
         try:
             # 使用undetected_chromedriver自动下载匹配的驱动
             self.options = uc.ChromeOptions()
@@ -117,12 +119,10 @@ class Boss:
     def get_cookies(self):
         try:
             # 1. 尝试从API获取cookies
-            env_id = self._get_environment_id()
-            if env_id:
-                cookies_json = self._get_environment_variable(env_id, COOKIE_KEY)
-                if cookies_json:
-                    print("从环境变量API获取cookies成功")
-                    return json.loads(cookies_json)
+            cookies_json = self._get_environment_variable(ENVIRONMENT_NAME, COOKIE_KEY)
+            if cookies_json:
+                print("从环境变量API获取cookies成功")
+                return json.loads(cookies_json)
             
             # 2. 如果API获取失败，尝试从环境变量获取
             cookies_env = os.environ.get('BOSS_COOKIES')
@@ -180,56 +180,34 @@ class Boss:
             return None
 
     def _save_environment_variable(self, env_id, key, value, is_secret=False):
-        """保存环境变量"""
+        """保存环境变量（按变量名创建或更新）"""
         try:
-            # 1. 检查变量是否已存在
-            url = f"{API_BASE_URL}/api/environments/{env_id}/variables"
-            response = requests.get(url)
-            
-            variable_id = None
-            if response.status_code == 200:
-                variables = response.json()
-                for var in variables:
-                    if var.get("key") == key:
-                        variable_id = var.get("id")
-                        break
-            
-            # 2. 更新或创建变量
-            if variable_id:
-                # 更新已存在的变量
-                url = f"{API_BASE_URL}/api/environments/variables/{variable_id}"
-                payload = {
-                    "value": value,
-                    "is_secret": is_secret
-                }
-                response = requests.put(url, json=payload)
-                return response.status_code == 200
-            else:
-                # 创建新变量
-                url = f"{API_BASE_URL}/api/environments/variables"
-                payload = {
-                    "key": key,
-                    "value": value,
-                    "is_secret": is_secret,
-                    "environment_id": env_id
-                }
-                response = requests.post(url, json=payload)
-                return response.status_code == 201
+            url = f"{API_BASE_URL}/api/environments/{env_id}/variables:bulk"
+            payload = {
+                "variables": [{"key": key, "value": value, "is_secret": is_secret}]
+            }
+            response = requests.put(url, json=payload)
+            return response.status_code == 200
         except Exception as e:
             print(f"保存环境变量时出错: {str(e)}")
             return False
 
-    def _get_environment_variable(self, env_id, key):
-        """获取环境变量值"""
+    def _get_environment_variable(self, env_name, key):
+        """按环境名称和变量名获取环境变量值"""
         try:
-            url = f"{API_BASE_URL}/api/environments/{env_id}/variables"
-            response = requests.get(url)
+            url = f"{API_BASE_URL}/api/environments/by-name/{env_name}/variables/{key}"
+            headers = {}
+            cached = self._variable_cache.get(key)
+            if cached:
+                headers["If-None-Match"] = cached[0]
+            response = requests.get(url, params={"user_id": USER_ID}, headers=headers)
             
+            if response.status_code == 304 and cached:
+                return cached[1]
             if response.status_code == 200:
-                variables = response.json()
-                for var in variables:
-                    if var.get("key") == key:
-                        return var.get("value")
+                value = response.json().get("value")
+                self._variable_cache[key] = (response.headers.get("ETag"), value)
+                return value
             return None
         except Exception as e:
             print(f"获取环境变量时出错: {str(e)}")